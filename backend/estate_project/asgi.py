@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'estate_project.settings')
 
 application = get_asgi_application()
+
+# Build the search box suggestions while the worker starts, not on its first lookup
+from properties import autocomplete  # noqa: E402
+
+autocomplete.warm_up()
@@ -0,0 +1,176 @@
+"""
+Production serving of user uploads under MEDIA_ROOT.
+
+``serve`` answers conditional requests (ETag / Last-Modified) and single
+byte ranges, including ``If-Range``. The file is returned as a
+FileResponse over the open file, so WSGI servers with a file wrapper
+(gunicorn) push it with sendfile(); ranges keep the file descriptor
+exposed and cap the length, so only the requested bytes are sent.
+
+With MEDIA_ACCEL set, the body is not sent at all: the response carries
+an X-Accel-Redirect (Nginx) or X-Sendfile (Apache, lighttpd) header and
+the fronting server transfers the file, ranges included, while the
+Django worker moves on to the next request.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+
+ACCEL_HEADERS = {
+    'x-accel-redirect': 'X-Accel-Redirect',
+    'x-sendfile': 'X-Sendfile',
+}
+# Upload names are never reused (the storage appends a suffix), thumbnails
+# are revalidated with the ETag after a day
+MEDIA_MAX_AGE = 24 * 60 * 60
+# Read size when the server streams the file itself (no sendfile)
+BLOCK_SIZE = 256 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+class _RangeFile:
+    """
+    The open file positioned at the range start, readable up to its end.
+    fileno() stays available for sendfile(), which is bounded by the
+    Content-Length of the response.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def file_etag(stat):
+    """Strong validator from size and mtime, like Nginx, usable in If-Range"""
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive bounds of a single byte range, or None to send
+    the whole file (no header, several ranges or a malformed one). Raises
+    RangeNotSatisfiable when the range starts past the end of the file.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable
+        return max(0, size - length), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+def _if_range_passes(header, etag, last_modified):
+    """An If-Range validator must match exactly, otherwise the whole file is sent"""
+    if not header:
+        return True
+    header = header.strip()
+    if header.startswith(('"', 'W/')):
+        return header == etag
+    return parse_http_date_safe(header) == int(last_modified)
+
+
+def _accel_header():
+    mode = settings.MEDIA_ACCEL.lower()
+    if mode and mode not in ACCEL_HEADERS:
+        raise ImproperlyConfigured(
+            f'MEDIA_ACCEL must be one of {", ".join(ACCEL_HEADERS)} or empty, not {settings.MEDIA_ACCEL!r}'
+        )
+    return ACCEL_HEADERS.get(mode)
+
+
+def serve(request, path):
+    """Serve a file from MEDIA_ROOT"""
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Invalid path')
+    try:
+        stat = os.stat(fullpath)
+    except OSError:
+        stat = None
+    if stat is None or not os.path.isfile(fullpath):
+        raise Http404(f'"{path}" does not exist')
+
+    etag = file_etag(stat)
+    last_modified = stat.st_mtime
+    response = get_conditional_response(request, etag=etag, last_modified=int(last_modified))
+    if response is None:
+        content_type, _ = mimetypes.guess_type(path)
+        content_type = content_type or 'application/octet-stream'
+        accel_header = _accel_header()
+        if accel_header == 'X-Accel-Redirect':
+            response = HttpResponse(content_type=content_type)
+            response[accel_header] = settings.MEDIA_ACCEL_PREFIX.rstrip('/') + '/' + quote(path)
+        elif accel_header:
+            response = HttpResponse(content_type=content_type)
+            response[accel_header] = fullpath
+        else:
+            response = _file_response(request, fullpath, stat.st_size, content_type, etag, last_modified)
+        response['Accept-Ranges'] = 'bytes'
+        patch_cache_control(response, public=True, max_age=MEDIA_MAX_AGE)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def _file_response(request, fullpath, size, content_type, etag, last_modified):
+    byte_range = None
+    if _if_range_passes(request.META.get('HTTP_IF_RANGE'), etag, last_modified):
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    file = open(fullpath, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        response = FileResponse(_RangeFile(file, start, end - start + 1), content_type=content_type, status=206)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response.block_size = BLOCK_SIZE
+    return response
@@ -0,0 +1,233 @@
+"""
+Project-wide middleware.
+"""
+import random
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from . import perf, routers
+
+
+class PerformanceMiddleware:
+    """
+    Measure a sample of requests: total time, database query count and time
+    (execute wrappers on every connection), template rendering time (see
+    template_backends.TimedDjangoTemplates) and session loading. Sampled
+    responses get a ``Server-Timing`` header and feed the per-URL-name
+    histograms in perf.py.
+
+    Place it right after SessionMiddleware so the session load is measured
+    but the time spent in the outer middleware is not. Works in sync and
+    async chains: the measurements are context variables, so they follow
+    the request into sync_to_async threads.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.PERF_SAMPLE_RATE
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+
+        timings, token = perf.begin()
+        try:
+            self._time_session(request)
+            with self._timed_queries():
+                response = self.get_response(request)
+            values = timings.finish()
+        finally:
+            perf.end(token)
+        return self._report(request, response, values)
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+
+        timings, token = perf.begin()
+        try:
+            self._time_session(request)
+            # Connections are per thread: time the ones of the thread that
+            # runs this request's sync_to_async (ORM) calls
+            with await sync_to_async(self._timed_queries)():
+                response = await self.get_response(request)
+            values = timings.finish()
+        finally:
+            perf.end(token)
+        return self._report(request, response, values)
+
+    def _sampled(self):
+        return self.sample_rate and random.random() < self.sample_rate
+
+    def _timed_queries(self):
+        stack = ExitStack()
+        timer = perf.QueryTimer()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(timer))
+        return stack
+
+    def _report(self, request, response, values):
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={values["db"]:.1f};desc="{values["queries"]} queries"',
+            f'tpl;dur={values["tpl"]:.1f}',
+            f'session;dur={values["session"]:.1f}',
+            f'total;dur={values["total"]:.1f}',
+        ])
+        match = getattr(request, 'resolver_match', None)
+        perf.record(match.view_name if match else 'unresolved', values)
+        return response
+
+    def _time_session(self, request):
+        session = getattr(request, 'session', None)
+        if session is None:
+            return
+        load = session.load
+
+        def timed_load():
+            start = time.perf_counter()
+            try:
+                return load()
+            finally:
+                perf.add('session', (time.perf_counter() - start) * 1000)
+        session.load = timed_load
+
+
+LANGUAGE_COOKIE_SALT = 'estate_project.language'
+# Session key the language was stored under before the cookie
+LEGACY_SESSION_KEY = 'lang'
+
+
+def default_language():
+    return settings.LANGUAGE_CODE.split('-')[0]
+
+
+def language_from_header(header):
+    """Best supported language of an Accept-Language header, None if none"""
+    supported = dict(settings.LANGUAGES)
+    best, best_quality = None, 0.0
+    for part in header.split(','):
+        tag, _, params = part.partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                continue
+        code = tag.strip().lower().split('-')[0]
+        if code in supported and quality > best_quality:
+            best, best_quality = code, quality
+    return best
+
+
+def set_language_cookie(response, language):
+    response.set_signed_cookie(
+        settings.LANGUAGE_COOKIE_NAME, language, salt=LANGUAGE_COOKIE_SALT,
+        max_age=settings.LANGUAGE_COOKIE_AGE, path=settings.LANGUAGE_COOKIE_PATH,
+        domain=settings.LANGUAGE_COOKIE_DOMAIN, secure=settings.LANGUAGE_COOKIE_SECURE,
+        httponly=settings.LANGUAGE_COOKIE_HTTPONLY, samesite=settings.LANGUAGE_COOKIE_SAMESITE,
+    )
+
+
+class LanguageMiddleware(MiddlewareMixin):
+    """
+    Set ``request.language`` without reading the session: the signed cookie
+    written by set_language, else the Accept-Language header, else
+    LANGUAGE_CODE. Anonymous page views then never load (or create) a
+    session row.
+
+    Visitors whose choice is still in their session from before are read
+    once (only when they send a session cookie) and given the cookie.
+    """
+
+    def process_request(self, request):
+        supported = dict(settings.LANGUAGES)
+        request.language_from_session = False
+        language = request.get_signed_cookie(
+            settings.LANGUAGE_COOKIE_NAME, default=None, salt=LANGUAGE_COOKIE_SALT
+        )
+        if language not in supported and settings.SESSION_COOKIE_NAME in request.COOKIES:
+            language = getattr(request, 'session', {}).get(LEGACY_SESSION_KEY)
+            request.language_from_session = language in supported
+        if language not in supported:
+            language = language_from_header(request.META.get('HTTP_ACCEPT_LANGUAGE', '')) or default_language()
+        request.language = language
+
+    def process_response(self, request, response):
+        if getattr(request, 'language_from_session', False):
+            set_language_cookie(response, request.language)
+        # Without the cookie the page language follows the header
+        patch_vary_headers(response, ['Accept-Language'])
+        return response
+
+
+REPLICA_PIN_COOKIE_NAME = 'db_pin'
+
+
+class ReplicaPinMiddleware:
+    """
+    Read-your-writes for the replica router: requests that may write, or
+    that come within REPLICA_PIN_SECONDS of the client's last write, read
+    from the primary database.
+
+    A request whose view raised a database error after reading from a
+    replica that now fails its probe is run once more on the primary
+    instead of answering 500 until the next health check.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self.process_request(request)
+        response = self.get_response(request)
+        if routers.replica_failed():
+            routers.start_request(pinned=True)
+            response = self.get_response(request)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        self.process_request(request)
+        response = await self.get_response(request)
+        # The probes query the replicas
+        if await sync_to_async(routers.replica_failed)():
+            routers.start_request(pinned=True)
+            response = await self.get_response(request)
+        return self.process_response(request, response)
+
+    def process_request(self, request):
+        routers.start_request(
+            pinned=request.method not in ('GET', 'HEAD', 'OPTIONS') or REPLICA_PIN_COOKIE_NAME in request.COOKIES
+        )
+
+    def process_exception(self, request, exception):
+        # The exception is turned into a 500 response before __call__ sees it
+        if isinstance(exception, DatabaseError):
+            routers.database_error()
+
+    def process_response(self, request, response):
+        state = routers.finish_request()
+        if state is not None and state.wrote:
+            response.set_cookie(
+                REPLICA_PIN_COOKIE_NAME, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite='Lax',
+            )
+        return response
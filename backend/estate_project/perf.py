@@ -0,0 +1,182 @@
+"""
+Request performance measurements (see middleware.PerformanceMiddleware).
+
+The measurements of the request being handled are kept in a context
+variable so the database wrapper and the template backend can add to them.
+Sampled requests are aggregated into per-URL-name histograms stored in the
+cache: one counter per (time window, URL name, metric, bucket), so every
+process adds to the same histograms when the cache is shared. Reading
+merges the last PERF_WINDOWS windows into a rolling view.
+"""
+import contextvars
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Upper bounds of the histogram buckets (the last one is unbounded)
+TIME_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, math.inf)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, math.inf)
+
+METRICS = {
+    'total': TIME_BUCKETS_MS,
+    'db': TIME_BUCKETS_MS,
+    'queries': COUNT_BUCKETS,
+    'tpl': TIME_BUCKETS_MS,
+    'session': TIME_BUCKETS_MS,
+}
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+class Timings:
+    """Measurements of one request"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.values = dict.fromkeys(METRICS, 0)
+
+    def add(self, metric, value):
+        self.values[metric] += value
+
+    def finish(self):
+        self.values['total'] = (time.perf_counter() - self.start) * 1000
+        return self.values
+
+
+def begin():
+    """Start measuring the current request, returns a reset token"""
+    timings = Timings()
+    return timings, _current.set(timings)
+
+
+def end(token):
+    _current.reset(token)
+
+
+def add(metric, value):
+    """Add to a metric of the request being measured, if any"""
+    timings = _current.get()
+    if timings is not None:
+        timings.add(metric, value)
+
+
+def measuring():
+    return _current.get() is not None
+
+
+class QueryTimer:
+    """Database execute wrapper adding query count and time"""
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            add('db', (time.perf_counter() - start) * 1000)
+            add('queries', 1)
+
+
+def _window(now=None):
+    return int((now or time.time()) // settings.PERF_WINDOW_SECONDS)
+
+
+def _bucket(bounds, value):
+    for index, bound in enumerate(bounds):
+        if value <= bound:
+            return index
+    return len(bounds) - 1
+
+
+def _incr(key, delta, timeout):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # First hit in this window
+        if not cache.add(key, delta, timeout):
+            cache.incr(key, delta)
+
+
+def record(name, values):
+    """Add one sampled request to the histograms of its URL name"""
+    window = _window()
+    timeout = settings.PERF_WINDOW_SECONDS * (settings.PERF_WINDOWS + 1)
+    names_key = f'perf:{window}:names'
+    names = cache.get(names_key) or set()
+    if name not in names:
+        # Racy, a name dropped here is added back by its next sample
+        cache.set(names_key, names | {name}, timeout)
+
+    prefix = f'perf:{window}:{name}'
+    _incr(f'{prefix}:count', 1, timeout)
+    for metric, bounds in METRICS.items():
+        value = values[metric]
+        _incr(f'{prefix}:{metric}:{_bucket(bounds, value)}', 1, timeout)
+        # Sums in microseconds (or queries) so incr stays integral
+        _incr(f'{prefix}:{metric}:sum', round(value * 1000) if bounds is TIME_BUCKETS_MS else value, timeout)
+
+
+def _label(bound):
+    """JSON-safe bucket bound: 'inf' for the unbounded bucket"""
+    return 'inf' if math.isinf(bound) else bound
+
+
+def _quantile(bounds, counts, total, q):
+    """Upper bound of the bucket holding quantile q ('inf' past the last bound)"""
+    rank = q * total
+    seen = 0
+    for bound, count in zip(bounds, counts):
+        seen += count
+        if seen >= rank and count:
+            return _label(bound)
+    return _label(bounds[-1])
+
+
+def snapshot(now=None):
+    """
+    Rolling histograms of the last PERF_WINDOWS windows:
+    {url name: {'count': n, metric: {'mean', 'p50', 'p95', 'p99', 'buckets'}}}
+    Percentiles are bucket upper bounds, 'inf' for the overflow bucket.
+    """
+    current = _window(now)
+    windows = range(current - settings.PERF_WINDOWS + 1, current + 1)
+    names_by_window = cache.get_many([f'perf:{window}:names' for window in windows])
+    names = set().union(*names_by_window.values()) if names_by_window else set()
+
+    keys = []
+    for window in windows:
+        for name in names:
+            prefix = f'perf:{window}:{name}'
+            keys.append(f'{prefix}:count')
+            for metric, bounds in METRICS.items():
+                keys.append(f'{prefix}:{metric}:sum')
+                keys.extend(f'{prefix}:{metric}:{index}' for index in range(len(bounds)))
+    stored = cache.get_many(keys)
+
+    stats = {}
+    for name in sorted(names):
+        def total(suffix):
+            return sum(stored.get(f'perf:{window}:{name}:{suffix}', 0) for window in windows)
+
+        count = total('count')
+        if not count:
+            continue
+        entry = {'count': count}
+        for metric, bounds in METRICS.items():
+            counts = [total(f'{metric}:{index}') for index in range(len(bounds))]
+            metric_sum = total(f'{metric}:sum')
+            if bounds is TIME_BUCKETS_MS:
+                metric_sum /= 1000
+            entry[metric] = {
+                'mean': metric_sum / count,
+                'p50': _quantile(bounds, counts, count, 0.5),
+                'p95': _quantile(bounds, counts, count, 0.95),
+                'p99': _quantile(bounds, counts, count, 0.99),
+                'buckets': {
+                    str(_label(bound)): value
+                    for bound, value in zip(bounds, counts) if value
+                },
+            }
+        stats[name] = entry
+    return stats
@@ -0,0 +1,181 @@
+"""
+Read replica routing.
+
+Reads of the properties and users models go to one of the healthy
+aliases in settings.DATABASE_REPLICAS; writes, and every other app, use
+the primary ("default"). With no replicas configured the router does
+nothing.
+
+Replicas lag behind the primary, so a client that has just written
+(created or edited a listing, updated its profile) reads from the
+primary for REPLICA_PIN_SECONDS: estate_project.middleware.ReplicaPinMiddleware
+pins requests that are not GET/HEAD/OPTIONS or that carry the pin cookie,
+and sets the cookie on responses to requests that wrote to a routed model.
+
+Outside requests (commands, thumbnail workers) reads use the replicas
+too; code that reads what it has just written, or writes based on what
+it reads, uses pin_to_primary() or ``.using('default')``.
+
+Each replica is probed with ``SELECT 1`` at most every
+REPLICA_HEALTH_INTERVAL seconds per process; reads fall back to the
+primary while none answers. A request that fails with a database error
+after reading from a replica probes the replicas it used at once; those
+that fail are marked down and the middleware runs the request again on
+the primary (see replica_failed()).
+"""
+import contextvars
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.db.utils import ConnectionDoesNotExist
+
+ROUTED_APPS = frozenset({'properties', 'users'})
+PRIMARY = 'default'
+
+_routing = contextvars.ContextVar('replica_routing', default=None)
+
+
+class RoutingState:
+    """Per-request routing: pinned requests read from the primary"""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+        # Replicas read from, and whether a database error was raised
+        self.replicas = set()
+        self.failed = False
+
+
+@contextmanager
+def pin_to_primary():
+    """Read from the primary inside the block (read-after-write outside requests)"""
+    outer = _routing.get()
+    state = RoutingState(pinned=True)
+    token = _routing.set(state)
+    try:
+        yield
+    finally:
+        _routing.reset(token)
+        if outer is not None and state.wrote:
+            # Writes inside the block pin the rest of the request too
+            outer.pinned = outer.wrote = True
+
+
+def start_request(pinned):
+    _routing.set(RoutingState(pinned=pinned))
+
+
+def finish_request():
+    """The routing state of the request that ends"""
+    state = _routing.get()
+    _routing.set(None)
+    return state
+
+
+def database_error():
+    """Note a database error in the current request (see replica_failed)"""
+    state = _routing.get()
+    if state is not None:
+        state.failed = True
+
+
+def replica_failed():
+    """
+    Whether the current request failed because of a replica: after a
+    database error, the replicas it read from are probed and the failing
+    ones marked down. Requests that wrote are never reported, so running
+    them again cannot repeat their writes.
+    """
+    state = _routing.get()
+    if state is None or not state.failed or state.wrote or not state.replicas:
+        return False
+    failed = [alias for alias in state.replicas if not health.check(alias)]
+    for alias in failed:
+        health.mark_down(alias)
+    return bool(failed)
+
+
+class ReplicaHealth:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # alias -> (healthy, checked at)
+        self.status = {}
+
+    def healthy(self, alias):
+        status = self.status.get(alias)
+        if status is not None and time.monotonic() - status[1] < settings.REPLICA_HEALTH_INTERVAL:
+            return status[0]
+        # One probe at a time; other threads keep the last known status
+        if not self.lock.acquire(blocking=False):
+            return status is not None and status[0]
+        try:
+            healthy = self.check(alias)
+            self.status[alias] = (healthy, time.monotonic())
+        finally:
+            self.lock.release()
+        return healthy
+
+    def check(self, alias):
+        try:
+            connection = connections[alias]
+        except ConnectionDoesNotExist:
+            return False
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return True
+        except DatabaseError:
+            connection.close()
+            return False
+
+    def mark_down(self, alias):
+        """Skip a replica until the next probe, e.g. after a failed query"""
+        self.status[alias] = (False, time.monotonic())
+
+    def reset(self):
+        self.status.clear()
+
+
+health = ReplicaHealth()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not settings.DATABASE_REPLICAS or model._meta.app_label not in ROUTED_APPS:
+            return None
+        state = _routing.get()
+        if state is not None and state.pinned:
+            return PRIMARY
+        replicas = [alias for alias in settings.DATABASE_REPLICAS if health.healthy(alias)]
+        if not replicas:
+            return PRIMARY
+        alias = random.choice(replicas)
+        if state is not None:
+            state.replicas.add(alias)
+        return alias
+
+    def db_for_write(self, model, **hints):
+        if not settings.DATABASE_REPLICAS:
+            return None
+        if model._meta.app_label in ROUTED_APPS:
+            state = _routing.get()
+            if state is not None:
+                # The rest of the request, and the client for a while, read their write
+                state.pinned = state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive the schema from the primary
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -44,6 +44,9 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'estate_project.middleware.PerformanceMiddleware',
+    'estate_project.middleware.LanguageMiddleware',
+    'estate_project.middleware.ReplicaPinMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -55,7 +58,8 @@ ROOT_URLCONF = 'estate_project.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates with render timing for PerformanceMiddleware
+        'BACKEND': 'estate_project.template_backends.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -75,10 +79,50 @@ WSGI_APPLICATION = 'estate_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# SQLite in WAL mode with writers queued instead of failing with "database is
+# locked" (see estate_project/sqlite_backend/base.py for the OPTIONS)
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'estate_project.sqlite_backend',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'timeout': config('SQLITE_TIMEOUT', default=10, cast=float),
+        },
+    }
+}
+
+# Read replicas: comma separated paths of SQLite copies kept up to date outside
+# Django (Litestream, LiteFS), opened read-only as replica1, replica2, ...
+# estate_project.routers sends reads of the properties and users apps to them
+DATABASE_REPLICAS = []
+for number, replica_path in enumerate(config('DATABASE_REPLICAS', default='', cast=Csv()), 1):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'estate_project.sqlite_backend',
+        'NAME': f'file:{replica_path}?mode=ro',
+        'OPTIONS': {
+            **DATABASES['default']['OPTIONS'],
+            # The journal mode is the primary's to set
+            'pragmas': {'journal_mode': None},
+            'serialize_writes': False,
+            'transaction_mode': 'DEFERRED',
+        },
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['estate_project.routers.ReplicaRouter']
+# A client reads from the primary this long after its own write
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=10, cast=int)
+# Seconds between health probes of each replica
+REPLICA_HEALTH_INTERVAL = config('REPLICA_HEALTH_INTERVAL', default=5, cast=int)
+
+
+# Cache
+# Use a shared backend (Redis/Memcached) in production so counters and cached
+# pages are shared between worker processes
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='estatehub'),
     }
 }
 
@@ -114,6 +158,16 @@ TIME_ZONE = 'Africa/Cairo'
 
 USE_I18N = True
 
+# Site languages. The visitor's choice is kept in a signed cookie (see
+# estate_project.middleware.LanguageMiddleware), never in the session
+LANGUAGES = [
+    ('en', 'English'),
+    ('ar', 'العربية'),
+]
+LANGUAGE_COOKIE_NAME = 'lang'
+LANGUAGE_COOKIE_AGE = 365 * 24 * 60 * 60
+LANGUAGE_COOKIE_SAMESITE = 'Lax'
+
 USE_TZ = True
 
 
@@ -124,10 +178,29 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# collectstatic writes content-hashed names plus .gz/.br variants
+# (see estate_project/staticfiles.py)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'estate_project.staticfiles.CompressedManifestStaticFilesStorage'},
+}
+
+# Serve STATIC_ROOT from Django when DEBUG is off (precompressed, immutable
+# caching); disable when the web server or a CDN serves /static/
+SERVE_STATIC = config('SERVE_STATIC', default=True, cast=bool)
+
 # Media files (Uploads)
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Serve MEDIA_ROOT through estate_project.media.serve (Range and conditional
+# requests); disable when the web server serves /media/ itself
+SERVE_MEDIA = config('SERVE_MEDIA', default=True, cast=bool)
+# Let the fronting server send media bodies: 'x-accel-redirect' (Nginx, with an
+# internal location at MEDIA_ACCEL_PREFIX aliased to MEDIA_ROOT) or 'x-sendfile'
+MEDIA_ACCEL = config('MEDIA_ACCEL', default='')
+MEDIA_ACCEL_PREFIX = config('MEDIA_ACCEL_PREFIX', default='/protected-media/')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -156,6 +229,7 @@ if not DEBUG:
     # HTTPS settings
     SECURE_SSL_REDIRECT = True
     SESSION_COOKIE_SECURE = True
+    LANGUAGE_COOKIE_SECURE = True
     CSRF_COOKIE_SECURE = True
     
     # HSTS settings
@@ -180,6 +254,46 @@ THUMBNAIL_ALIASES = {
         'large': {'size': (800, 800), 'crop': True},
     },
 }
+# Renditions are generated in the background by a pool of this many threads
+THUMBNAIL_PIPELINE_WORKERS = config('THUMBNAIL_PIPELINE_WORKERS', default=2, cast=int)
+# WebP/AVIF encoding is CPU-bound and runs in a pool of this many processes
+IMAGE_ENCODER_PROCESSES = config('IMAGE_ENCODER_PROCESSES', default=2, cast=int)
+
+# Property listing
+# Approximate result counts are cached instead of running COUNT(*) per request
+LISTING_COUNT_CACHE_TIMEOUT = config('LISTING_COUNT_CACHE_TIMEOUT', default=300, cast=int)
+
+# Rendered listing pages for anonymous visitors; stale copies are served for
+# GRACE seconds while one request re-renders, LOCK bounds that render
+LISTING_PAGE_CACHE_TIMEOUT = config('LISTING_PAGE_CACHE_TIMEOUT', default=60, cast=int)
+LISTING_PAGE_CACHE_GRACE = config('LISTING_PAGE_CACHE_GRACE', default=300, cast=int)
+LISTING_PAGE_CACHE_LOCK_TIMEOUT = config('LISTING_PAGE_CACHE_LOCK_TIMEOUT', default=30, cast=int)
+
+# Property detail snapshots in the cache (versioned, so they can live long) and
+# in a per-process LRU of SIZE entries trusted for LOCAL_SECONDS
+PROPERTY_SNAPSHOT_TIMEOUT = config('PROPERTY_SNAPSHOT_TIMEOUT', default=86400, cast=int)
+PROPERTY_SNAPSHOT_LOCAL_SIZE = config('PROPERTY_SNAPSHOT_LOCAL_SIZE', default=1024, cast=int)
+PROPERTY_SNAPSHOT_LOCAL_SECONDS = config('PROPERTY_SNAPSHOT_LOCAL_SECONDS', default=5, cast=float)
+
+# Seconds between checks for catalog changes made by other processes; the
+# search box autocomplete index catches up with them in the background
+AUTOCOMPLETE_REFRESH_SECONDS = config('AUTOCOMPLETE_REFRESH_SECONDS', default=10, cast=int)
+
+# Property views are buffered in spool files and applied by `flush_view_counts`
+VIEW_COUNTER_SPOOL_DIR = config('VIEW_COUNTER_SPOOL_DIR', default=str(BASE_DIR / 'spool' / 'views'))
+VIEW_COUNTER_BUCKET_SECONDS = config('VIEW_COUNTER_BUCKET_SECONDS', default=30, cast=int)
+# Unflushed views are shown on pages for at most this long
+VIEW_COUNTER_PENDING_TIMEOUT = config('VIEW_COUNTER_PENDING_TIMEOUT', default=3600, cast=int)
+
+# Request performance sampling (Server-Timing header and per-URL histograms,
+# see estate_project/middleware.py); histograms cover PERF_WINDOWS windows
+PERF_SAMPLE_RATE = config('PERF_SAMPLE_RATE', default=0.05, cast=float)
+PERF_WINDOW_SECONDS = config('PERF_WINDOW_SECONDS', default=300, cast=int)
+PERF_WINDOWS = config('PERF_WINDOWS', default=12, cast=int)
+
+# Route the listing and detail pages to their async views; enable when
+# serving through asgi.py (under WSGI every async view call needs its own event loop)
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
 
 # Logging Configuration
 LOGGING = {
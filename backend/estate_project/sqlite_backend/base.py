@@ -0,0 +1,150 @@
+"""
+SQLite backend for running the site on db.sqlite3 with several workers.
+
+Every new connection switches the database to WAL (readers no longer
+wait for writers), relaxes fsync to synchronous=NORMAL (safe in WAL, a
+crash can only lose the last commits), maps the file in memory and
+enlarges the page cache. busy_timeout follows the standard ``timeout``
+option.
+
+SQLite allows one writer at a time. Transactions start deferred, so
+read-only atomic blocks never take the write lock and keep reading
+alongside writers; a block that writes first waits for the lock in
+SQLite's busy handler (busy_timeout). A block that reads and then writes
+cannot wait that way: once its snapshot is stale the upgrade fails at
+once with "database is locked". Such blocks use ``atomic_write()``,
+which starts with ``BEGIN IMMEDIATE`` to take the lock up front.
+Autocommit INSERT/UPDATE/DELETE statements, the bulk of the writes of
+the site (sessions, counters), also queue on a lock per database file
+within a process, so threads wait their turn instead of polling. That
+lock is only held while one statement runs, never across user code, so
+it cannot be taken twice by a thread or held by an open atomic block.
+
+OPTIONS:
+    timeout           seconds a writer waits for the lock (default 5)
+    pragmas           dict merged over PRAGMAS (None leaves one unset)
+    transaction_mode  DEFERRED (default), IMMEDIATE or EXCLUSIVE
+    serialize_writes  queue autocommit writes of this process (default True)
+"""
+import threading
+from contextlib import contextmanager, nullcontext
+
+from django.db import transaction
+from django.db.backends.sqlite3 import base
+from django.db.utils import OperationalError
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    # Negative sizes are in KiB: 64 MB per connection
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+DEFAULT_TIMEOUT = 5
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLAC')
+
+_write_locks = {}
+_write_locks_guard = threading.Lock()
+
+
+def write_lock(name):
+    """The process-wide writer lock of a database file"""
+    with _write_locks_guard:
+        return _write_locks.setdefault(str(name), threading.Lock())
+
+
+@contextmanager
+def atomic_write(using=None):
+    """
+    transaction.atomic() for a block that reads before it writes: on this
+    backend an outermost block starts with BEGIN IMMEDIATE
+    """
+    immediate = getattr(transaction.get_connection(using), 'begin_immediate', nullcontext)
+    with immediate(), transaction.atomic(using=using):
+        yield
+
+
+def _acquire(lock, timeout):
+    if not lock.acquire(timeout=timeout):
+        raise OperationalError('database is locked')
+
+
+class SerializedCursorWrapper(base.SQLiteCursorWrapper):
+    """Runs autocommit writes under the writer lock of the database"""
+
+    write_lock = None
+    timeout = DEFAULT_TIMEOUT
+
+    def _serialize(self, query):
+        # Transactions queue in SQLite's busy handler instead
+        return (
+            self.write_lock is not None
+            and not self.connection.in_transaction
+            and query.lstrip()[:6].upper() in WRITE_STATEMENTS
+        )
+
+    def execute(self, query, params=None):
+        if not self._serialize(query):
+            return super().execute(query, params)
+        _acquire(self.write_lock, self.timeout)
+        try:
+            return super().execute(query, params)
+        finally:
+            self.write_lock.release()
+
+    def executemany(self, query, param_list):
+        if not self._serialize(query):
+            return super().executemany(query, param_list)
+        _acquire(self.write_lock, self.timeout)
+        try:
+            return super().executemany(query, param_list)
+        finally:
+            self.write_lock.release()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        options = self.settings_dict['OPTIONS']
+        self.timeout = options.get('timeout', DEFAULT_TIMEOUT)
+        self.pragmas = {**PRAGMAS, **options.get('pragmas', {}), 'busy_timeout': int(self.timeout * 1000)}
+        self.begin_statement = f'BEGIN {options.get("transaction_mode", "DEFERRED").upper()}'
+        self.immediate = False
+        self.serialize_writes = options.get('serialize_writes', True)
+        self.write_lock = None
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        # Handled here; newer Django versions pop transaction_mode themselves
+        for option in ('pragmas', 'serialize_writes', 'transaction_mode'):
+            params.pop(option, None)
+        params.setdefault('timeout', self.timeout)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        # Keyed on the file actually opened: test runs rename the database
+        if self.serialize_writes:
+            self.write_lock = write_lock(conn_params['database'])
+        for name, value in self.pragmas.items():
+            if value is not None:
+                conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def create_cursor(self, name=None):
+        cursor = self.connection.cursor(factory=SerializedCursorWrapper)
+        cursor.write_lock, cursor.timeout = self.write_lock, self.timeout
+        return cursor
+
+    @contextmanager
+    def begin_immediate(self):
+        """Transactions started in this block take the write lock up front"""
+        previous, self.immediate = self.immediate, True
+        try:
+            yield
+        finally:
+            self.immediate = previous
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE' if self.immediate else self.begin_statement)
@@ -0,0 +1,140 @@
+"""
+Static asset pipeline: content-hashed names, precompressed variants and
+serving with far-future caching.
+
+``collectstatic`` writes every file under a name containing a hash of its
+content (ManifestStaticFilesStorage), then a ``.gz`` and, when the brotli
+package is installed, a ``.br`` sibling of each compressible hashed file.
+``serve`` picks the smallest variant the client accepts; hashed names
+never change content, so they are cached as immutable for a year.
+"""
+import gzip
+import mimetypes
+import os
+import posixpath
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.xml', '.map', '.html', '.ico')
+# Smaller files gain less than the Content-Encoding overhead
+MIN_COMPRESS_SIZE = 256
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+# Unhashed names (links from outside the templates) may change on deploy
+MUTABLE_MAX_AGE = 60 * 60
+
+# Accept-Encoding coding -> file suffix, best first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_immutable_names = None
+
+
+def compress(data):
+    """{suffix: bytes} of the precompressed variants worth keeping"""
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data, quality=11)
+    # Keep a variant only if it saves at least 5%
+    return {suffix: body for suffix, body in variants.items() if len(body) < len(data) * 0.95}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage that also writes .gz/.br variants of the
+    hashed files. Names missing from the manifest (before the first
+    collectstatic, e.g. in tests) resolve to their plain name.
+    """
+
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for hashed_name in set(self.hashed_files.values()):
+            if not hashed_name.endswith(COMPRESSIBLE_EXTENSIONS) or self.size(hashed_name) < MIN_COMPRESS_SIZE:
+                continue
+            with self.open(hashed_name) as f:
+                data = f.read()
+            for suffix, body in compress(data).items():
+                with open(self.path(hashed_name + suffix), 'wb') as f:
+                    f.write(body)
+
+
+def immutable_names():
+    """Content-hashed names from the manifest (loaded once per process)"""
+    global _immutable_names
+    if _immutable_names is None:
+        _immutable_names = frozenset(getattr(staticfiles_storage, 'hashed_files', {}).values())
+    return _immutable_names
+
+
+def accepted_encodings(header):
+    """Codings with a non-zero quality in an Accept-Encoding header"""
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def serve(request, path):
+    """Serve a collected static file from STATIC_ROOT"""
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        fullpath = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Invalid path')
+    if not os.path.isfile(fullpath):
+        raise Http404(f'"{path}" does not exist')
+
+    accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    encoding = None
+    for coding, suffix in ENCODINGS:
+        if coding in accepted and os.path.isfile(fullpath + suffix):
+            encoding, fullpath = coding, fullpath + suffix
+            break
+
+    stat = os.stat(fullpath)
+    immutable = path in immutable_names()
+    if not immutable and not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+        return HttpResponseNotModified()
+
+    content_type, _ = mimetypes.guess_type(path)
+    response = FileResponse(open(fullpath, 'rb'), content_type=content_type or 'application/octet-stream')
+    # FileResponse names the opened file (the .gz/.br variant) in an inline
+    # Content-Disposition, assets are not downloads
+    del response['Content-Disposition']
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    if encoding:
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ['Accept-Encoding'])
+    if immutable:
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=MUTABLE_MAX_AGE)
+    return response
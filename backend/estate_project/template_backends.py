@@ -0,0 +1,161 @@
+"""
+Django template backend with per-language template variants and render
+timing for perf.py.
+
+Templates branch on ``{% if language == 'ar' %}`` all over (cards,
+pagination links, the base layout). For each language in
+settings.LANGUAGES a compiled template is specialized once: every ``if``
+whose first condition compares the ``language`` variable with a string is
+replaced by the branch that language takes, including in the templates it
+extends. Renders with a ``language`` in their context use that variant,
+so no language conditional is evaluated at render time. Variants are
+cached on the compiled template, so they follow the cached loader
+(and its reloads in development).
+"""
+import copy
+import time
+
+from django.conf import settings
+from django.template import NodeList, TemplateDoesNotExist, Variable
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.template.defaulttags import IfNode
+from django.template.loader_tags import ExtendsNode
+
+from . import perf
+
+LANGUAGE_VARIABLE = 'language'
+
+
+def _language_test(condition):
+    """(operator, language) for ``language ==/!= 'xx'`` conditions, else None"""
+    if getattr(condition, 'id', None) not in ('==', '!='):
+        return None
+    variable, literal = condition.first.value, condition.second.value
+    if variable.filters or literal.filters:
+        return None
+    if not isinstance(variable.var, Variable) or variable.var.var != LANGUAGE_VARIABLE:
+        return None
+    if not isinstance(literal.var, str):
+        return None
+    return condition.id, literal.var
+
+
+def _fold_if(node, language):
+    """
+    The nodes an ``if`` reduces to for a language, or None when its first
+    condition does not test the language
+    """
+    condition, nodelist = node.conditions_nodelists[0]
+    test = _language_test(condition)
+    if test is None:
+        return None
+    operator, value = test
+    if (language == value) == (operator == '=='):
+        return _specialize_nodelist(nodelist, language)
+    remaining = node.conditions_nodelists[1:]
+    if not remaining:
+        return NodeList()
+    if remaining[0][0] is None:
+        # {% else %}
+        return _specialize_nodelist(remaining[0][1], language)
+    rest = copy.copy(node)
+    rest.conditions_nodelists = remaining
+    folded = _fold_if(rest, language)
+    if folded is not None:
+        return folded
+    return NodeList([_specialize_node(rest, language)])
+
+
+def _specialize_node(node, language):
+    """A copy of node with the language conditionals below it folded"""
+    node = copy.copy(node)
+    if isinstance(node, IfNode):
+        # IfNode.nodelist is a read-only view of these
+        node.conditions_nodelists = [
+            (condition, _specialize_nodelist(nodelist, language))
+            for condition, nodelist in node.conditions_nodelists
+        ]
+    else:
+        for name in node.child_nodelists:
+            nodelist = getattr(node, name, None)
+            if nodelist is not None:
+                setattr(node, name, _specialize_nodelist(nodelist, language))
+    if isinstance(node, ExtendsNode):
+        specialized = LanguageExtendsNode(node.nodelist, node.parent_name, node.template_dirs)
+        specialized.origin, specialized.token = node.origin, node.token
+        specialized.language = language
+        return specialized
+    return node
+
+
+def _specialize_nodelist(nodelist, language):
+    specialized = NodeList()
+    for node in nodelist:
+        folded = _fold_if(node, language) if isinstance(node, IfNode) else None
+        if folded is not None:
+            specialized.extend(folded)
+        else:
+            specialized.append(_specialize_node(node, language))
+    return specialized
+
+
+def language_conditionals(template):
+    """Number of ``if`` nodes testing the language left in a compiled template"""
+    return sum(
+        1 for node in template.nodelist.get_nodes_by_type(IfNode)
+        if any(_language_test(condition) for condition, _ in node.conditions_nodelists)
+    )
+
+
+def language_variant(template, language):
+    """Specialized copy of a compiled django.template.Template, cached on it"""
+    variants = template.__dict__.setdefault('_language_variants', {})
+    variant = variants.get(language)
+    if variant is None:
+        variant = copy.copy(template)
+        variant.nodelist = _specialize_nodelist(template.nodelist, language)
+        variants[language] = variant
+    return variant
+
+
+class LanguageExtendsNode(ExtendsNode):
+    """{% extends %} of a variant: the parent is rendered from its variant too"""
+
+    language = None
+
+    def find_template(self, template_name, context):
+        return language_variant(super().find_template(template_name, context), self.language)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        if not perf.measuring():
+            return self._render_variant(context, request)
+        start = time.perf_counter()
+        try:
+            return self._render_variant(context, request)
+        finally:
+            perf.add('tpl', (time.perf_counter() - start) * 1000)
+
+    def _render_variant(self, context, request):
+        language = context.get(LANGUAGE_VARIABLE) if context else None
+        if language not in dict(settings.LANGUAGES):
+            return super().render(context, request)
+        return Template(language_variant(self.template, language), self.backend).render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    DjangoTemplates rendering per-language variants, whose top-level
+    renders are timed; includes and inheritance happen inside them so
+    nothing is counted twice.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -2,20 +2,31 @@
 URL configuration for estate_project project.
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
+from . import media, staticfiles, views
 
 urlpatterns = [
+    # Before the admin so its catch-all view does not shadow it
+    path('admin/performance/', views.performance_stats, name='performance_stats'),
     path('admin/', admin.site.urls),
     path('', include('properties.urls')),
     path('users/', include('users.urls')),
 ]
 
-# Serve media files in development
+if settings.SERVE_MEDIA:
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.*)$' % settings.MEDIA_URL.lstrip('/'), media.serve),
+    ]
+
+# Serve static files in development
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
+elif settings.SERVE_STATIC:
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.*)$' % settings.STATIC_URL.lstrip('/'), staticfiles.serve),
+    ]
 
 # Custom error handlers
 handler404 = 'estate_project.views.custom_404'
@@ -1,16 +1,32 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.shortcuts import render
 
+from properties.views import get_language
+
+from . import perf
+
 def custom_404(request, exception):
     """Custom 404 error page"""
-    language = request.session.get('lang', 'en')
+    language = get_language(request)
     return render(request, '404.html', {'language': language}, status=404)
 
 def custom_500(request):
     """Custom 500 error page"""
-    language = request.session.get('lang', 'en')
+    language = get_language(request)
     return render(request, '500.html', {'language': language}, status=500)
 
 def custom_403(request, exception):
     """Custom 403 error page"""
-    language = request.session.get('lang', 'en')
+    language = get_language(request)
     return render(request, '403.html', {'language': language}, status=403)
+
+@staff_member_required
+def performance_stats(request):
+    """Rolling request histograms per URL name (staff only)"""
+    return JsonResponse({
+        'sample_rate': settings.PERF_SAMPLE_RATE,
+        'window_seconds': settings.PERF_WINDOW_SECONDS * settings.PERF_WINDOWS,
+        'views': perf.snapshot(),
+    })
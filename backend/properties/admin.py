@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Property, PropertyImage
+from .models import Property, PropertyImage, LocationFacet
 
 class PropertyImageInline(admin.TabularInline):
     model = PropertyImage
@@ -37,3 +37,9 @@ class PropertyImageAdmin(admin.ModelAdmin):
     list_display = ['property', 'order', 'created_at']
     list_filter = ['created_at']
     search_fields = ['property__title_en', 'property__title_ar']
+
+@admin.register(LocationFacet)
+class LocationFacetAdmin(admin.ModelAdmin):
+    list_display = ['location_en', 'location_ar', 'property_type', 'sale_type', 'count']
+    list_filter = ['property_type', 'sale_type']
+    search_fields = ['location_en', 'location_ar']
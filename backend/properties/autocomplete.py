@@ -0,0 +1,294 @@
+"""
+In-process prefix index for the search box type-ahead.
+
+The English and Arabic locations and titles of active properties are kept
+as distinct phrases, each with the number of properties using it. Every
+word start of a normalized phrase ('new cairo', 'cairo') is a key in one
+sorted list, so a prefix lookup is a bisect plus a short forward scan and
+never touches the database.
+
+The index is built on a background thread when a server process starts
+(warm_up, called from the WSGI/ASGI modules), or on the first lookup of
+processes that skipped it; lookups return no suggestions until it is
+ready. Saves and deletes in this process update it from the Property
+signals; changes made by other processes (or by bulk loaders that bypass
+signals) are picked up when the catalog version moves, at most every
+AUTOCOMPLETE_REFRESH_SECONDS, by a background thread that reloads only the
+rows updated since the last sync and the DeletedProperty tombstones written
+since then. Lookups keep answering from the current index meanwhile.
+Results are cached per prefix until the index changes.
+"""
+import bisect
+import datetime
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Max
+from django.utils import timezone
+
+from .caching import get_catalog_version
+from .models import DeletedProperty, Property
+from .search import TOKEN_RE, normalize
+
+logger = logging.getLogger(__name__)
+
+# Phrase kinds, in the order they are suggested
+KINDS = ('location', 'title')
+KIND_FIELDS = {
+    'location': ('location_en', 'location_ar'),
+    'title': ('title_en', 'title_ar'),
+}
+
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+# Keys looked at for one prefix, bounds the work for one-letter prefixes
+MAX_SCAN = 2000
+PREFIX_CACHE_SIZE = 1024
+# Rows updated this long before the last sync are reloaded again, so rows
+# committed late by long transactions are not missed
+REFRESH_OVERLAP = datetime.timedelta(seconds=60)
+# Tombstones are pruned after this long; an index that has not synced for
+# longer is rebuilt instead of refreshed
+TOMBSTONE_RETENTION = datetime.timedelta(days=1)
+
+
+def _phrases(property_obj):
+    """(kind, text) phrases a property contributes, none when inactive"""
+    if not property_obj.is_active:
+        return ()
+    return tuple(
+        (kind, text.strip())
+        for kind in KINDS
+        for text in (getattr(property_obj, field) for field in KIND_FIELDS[kind])
+        if text and text.strip()
+    )
+
+
+def _keys(phrase):
+    """Index keys of a phrase: the normalized text from every word start"""
+    text = normalize(phrase[1])
+    return {(text[match.start():], phrase) for match in TOKEN_RE.finditer(text)}
+
+
+class PrefixIndex:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.keys = []
+        self.counts = Counter()
+        self.by_property = {}
+        self.cache = OrderedDict()
+        self.version = None
+        self.high_water = None
+        self.synced_at = None
+        # Pks changed in this process while a refresh reads the database
+        self.touched = None
+        self.refresh_lock = threading.Lock()
+        self.refresh_thread = None
+        self.checked_at = 0.0
+
+    def _add(self, phrase):
+        self.counts[phrase] += 1
+        if self.counts[phrase] == 1:
+            for key in _keys(phrase):
+                bisect.insort(self.keys, key)
+
+    def _discard(self, phrase):
+        self.counts[phrase] -= 1
+        if self.counts[phrase] <= 0:
+            del self.counts[phrase]
+            for key in _keys(phrase):
+                position = bisect.bisect_left(self.keys, key)
+                if position < len(self.keys) and self.keys[position] == key:
+                    del self.keys[position]
+
+    def update(self, properties):
+        """Add, replace or drop the phrases of the given properties"""
+        with self.lock:
+            for property_obj in properties:
+                if self.touched is not None:
+                    self.touched.add(property_obj.pk)
+                phrases = _phrases(property_obj)
+                previous = self.by_property.get(property_obj.pk, ())
+                if phrases == previous:
+                    continue
+                for phrase in previous:
+                    self._discard(phrase)
+                for phrase in phrases:
+                    self._add(phrase)
+                if phrases:
+                    self.by_property[property_obj.pk] = phrases
+                else:
+                    self.by_property.pop(property_obj.pk, None)
+            self.cache.clear()
+
+    def remove(self, pks):
+        with self.lock:
+            for pk in pks:
+                if self.touched is not None:
+                    self.touched.add(pk)
+                for phrase in self.by_property.pop(pk, ()):
+                    self._discard(phrase)
+            self.cache.clear()
+
+    def build(self):
+        """Load every active property (one query) and sort the keys once"""
+        fields = ('pk', 'is_active', *KIND_FIELDS['location'], *KIND_FIELDS['title'])
+        version = get_catalog_version()
+        synced_at = timezone.now()
+        high_water = Property.objects.aggregate(latest=Max('updated_at'))['latest']
+        by_property = {}
+        counts = Counter()
+        for property_obj in Property.objects.filter(is_active=True).only(*fields).iterator(chunk_size=2000):
+            phrases = _phrases(property_obj)
+            if phrases:
+                by_property[property_obj.pk] = phrases
+                counts.update(phrases)
+        keys = sorted(key for phrase in counts for key in _keys(phrase))
+        with self.lock:
+            self.keys, self.counts, self.by_property = keys, counts, by_property
+            self.version, self.high_water, self.synced_at = version, high_water, synced_at
+            self.cache.clear()
+
+    def refresh(self):
+        """Catch up with changes made outside this process"""
+        version = get_catalog_version()
+        if version == self.version:
+            return
+        synced_at = timezone.now()
+        if self.high_water is None or self.synced_at < synced_at - TOMBSTONE_RETENTION:
+            # Empty catalog, or tombstones since the last sync may be pruned
+            self.build()
+            return
+        with self.lock:
+            self.touched = set()
+        try:
+            fields = ('pk', 'is_active', 'updated_at', *KIND_FIELDS['location'], *KIND_FIELDS['title'])
+            changed = list(Property.objects.filter(updated_at__gte=self.high_water - REFRESH_OVERLAP).only(*fields))
+            # Deletions leave no row behind, their tombstones do
+            deleted = set(
+                DeletedProperty.objects.filter(deleted_at__gte=self.synced_at - REFRESH_OVERLAP)
+                .values_list('property_id', flat=True)
+            )
+            with self.lock:
+                # Signals of this process ran after the reads, they are newer
+                touched, self.touched = self.touched, None
+                self.update([p for p in changed if p.pk not in touched])
+                self.remove([pk for pk in deleted if pk not in touched])
+                self.version, self.synced_at = version, synced_at
+                self.high_water = max([self.high_water, *(p.updated_at for p in changed)])
+        finally:
+            self.touched = None
+
+    def warm_up(self):
+        """Start build() on a thread unless the index is built or being built"""
+        if not self.refresh_lock.acquire(blocking=False):
+            return
+        if self.version is not None:
+            self.refresh_lock.release()
+            return
+        self._start(self.build, 'autocomplete-build')
+
+    def refresh_in_background(self):
+        """
+        Start refresh() on a thread when the catalog version moved, checked
+        at most every AUTOCOMPLETE_REFRESH_SECONDS; one refresh at a time
+        """
+        if time.monotonic() - self.checked_at < settings.AUTOCOMPLETE_REFRESH_SECONDS:
+            return
+        if not self.refresh_lock.acquire(blocking=False):
+            return
+        self.checked_at = time.monotonic()
+        if get_catalog_version() == self.version:
+            self.refresh_lock.release()
+            return
+        self._start(self.refresh, 'autocomplete-refresh')
+
+    def _start(self, target, name):
+        # Called with refresh_lock held, the thread releases it
+        self.refresh_thread = threading.Thread(target=self._run, args=(target,), name=name, daemon=True)
+        self.refresh_thread.start()
+
+    def _run(self, target):
+        try:
+            target()
+        except Exception:
+            logger.exception('Could not update the autocomplete index')
+        finally:
+            self.refresh_lock.release()
+            # The thread's own database connection
+            close_old_connections()
+
+    def lookup(self, prefix, limit=DEFAULT_LIMIT):
+        """
+        Phrases with a word starting with prefix, locations first and then
+        by number of properties. Returns [(kind, text, count)], empty until
+        the index is built.
+        """
+        prefix = ' '.join(TOKEN_RE.findall(normalize(prefix)))
+        if not prefix:
+            return []
+        if self.version is None:
+            self.warm_up()
+            return []
+        self.refresh_in_background()
+
+        cache_key = (prefix, limit)
+        with self.lock:
+            if cache_key in self.cache:
+                self.cache.move_to_end(cache_key)
+                return self.cache[cache_key]
+
+            matches = set()
+            start = bisect.bisect_left(self.keys, (prefix,))
+            for text, phrase in self.keys[start:start + MAX_SCAN]:
+                if not text.startswith(prefix):
+                    break
+                matches.add(phrase)
+            results = [
+                (kind, text, self.counts[kind, text])
+                for kind, text in sorted(
+                    matches, key=lambda phrase: (KINDS.index(phrase[0]), -self.counts[phrase], phrase[1])
+                )[:limit]
+            ]
+
+            self.cache[cache_key] = results
+            if len(self.cache) > PREFIX_CACHE_SIZE:
+                self.cache.popitem(last=False)
+        return results
+
+
+index = PrefixIndex()
+
+
+def record_deletions(pks):
+    """Tombstones for other processes, written in the transaction of the delete"""
+    DeletedProperty.objects.bulk_create([DeletedProperty(property_id=pk) for pk in pks])
+    DeletedProperty.objects.filter(deleted_at__lt=timezone.now() - TOMBSTONE_RETENTION).delete()
+
+
+def warm_up():
+    """Build the index in the background when a server process starts"""
+    index.warm_up()
+
+
+def is_ready():
+    return index.version is not None
+
+
+def update_properties(properties):
+    """Used by the save signal, a no-op until the index is built"""
+    if index.version is not None:
+        index.update(properties)
+
+
+def remove_properties(pks):
+    if index.version is not None:
+        index.remove(pks)
+
+
+def suggest(prefix, limit=DEFAULT_LIMIT):
+    return index.lookup(prefix, max(1, min(limit, MAX_LIMIT)))
@@ -0,0 +1,84 @@
+"""
+Small timing helpers shared by the benchmark management commands.
+"""
+import statistics
+import time
+
+# Listing query strings to benchmark, as sent by the filter form
+LISTING_SCENARIOS = [
+    ('all', ''),
+    ('type', 'type=Villa'),
+    ('sale type', 'sale_type=Rent'),
+    ('type + sale type', 'type=Apartment&sale_type=Rent'),
+    ('price range', 'min_price=1000000&max_price=2000000'),
+    ('type + price', 'type=Apartment&min_price=10000&max_price=500000'),
+    ('near', 'near=30.0444,31.2357&radius=10'),
+    ('map viewport', 'bbox=29.95,31.15,30.10,31.35'),
+]
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, round(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class QueryCounter:
+    """
+    Database execute wrapper counting queries. Unlike CaptureQueriesContext
+    it does not depend on DEBUG or the bounded queries_log.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def measure(func, repeat=50, warmup=3):
+    """Call func repeatedly and return the durations in milliseconds"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(samples):
+    """p50/p95/p99/mean of millisecond samples"""
+    return {
+        'p50': percentile(samples, 50),
+        'p95': percentile(samples, 95),
+        'p99': percentile(samples, 99),
+        'mean': statistics.fmean(samples) if samples else 0.0,
+    }
+
+
+def compare(baseline, current, threshold):
+    """
+    Compare two result dicts of {name: metrics}. Latency and memory may grow
+    by ``threshold`` (a fraction), query counts may not grow at all.
+    Returns a list of regression descriptions.
+    """
+    regressions = []
+    for name, metrics in current.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        for metric in ('p50', 'p95', 'memory_kb'):
+            if metric in before and metrics[metric] > before[metric] * (1 + threshold):
+                regressions.append(
+                    f'{name} {metric}: {before[metric]:.2f} -> {metrics[metric]:.2f} '
+                    f'(+{100 * (metrics[metric] / max(before[metric], 1e-9) - 1):.0f}%)'
+                )
+        if 'queries' in before and metrics['queries'] > before['queries']:
+            regressions.append(f'{name} queries: {before["queries"]} -> {metrics["queries"]}')
+    return regressions
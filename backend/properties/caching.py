@@ -0,0 +1,172 @@
+"""
+Rendered page cache for the property listing.
+
+Pages are cached per language and canonical query string under keys that
+embed the catalog version. The version is bumped by the Property and
+PropertyImage write signals, so an edit makes every cached page
+unreachable at once instead of letting stale pages live until they expire.
+
+Entries carry a soft expiry: once it passes, a single request (holding a
+short cache lock) re-renders the page while concurrent requests keep
+serving the stale copy, so a popular page expiring under load does not
+trigger a stampede of identical renders.
+"""
+import asyncio
+import functools
+import hashlib
+import time
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.http import urlencode
+
+from .filters import canonical_filters
+
+CATALOG_VERSION_KEY = 'catalog:version'
+
+# How long a request waits for another one rendering the same page
+LOCK_WAIT_SECONDS = 1.0
+LOCK_POLL_SECONDS = 0.05
+
+
+def get_catalog_version():
+    """
+    Current catalog version. Versions are timestamps (ns) so a cache flush
+    never brings back a version that was already used.
+    """
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(CATALOG_VERSION_KEY, version, None):
+            version = cache.get(CATALOG_VERSION_KEY, version)
+    return version
+
+
+def bump_catalog_version():
+    """
+    Invalidate every cached listing page. Deferred to the commit so pages
+    rendered before it cannot be cached under the new version.
+    """
+    transaction.on_commit(
+        lambda: cache.set(CATALOG_VERSION_KEY, time.time_ns(), None)
+    )
+
+
+def listing_cache_key(request, language):
+    params = canonical_filters(request.GET)
+    if request.GET.get('cursor'):
+        params.append(('cursor', request.GET['cursor']))
+    digest = hashlib.md5(f'{language}?{urlencode(params)}'.encode()).hexdigest()
+    return f'property_list:page:{get_catalog_version()}:{digest}'
+
+
+def _is_cacheable(request):
+    # Pages of logged-in users show their own navigation and edit links
+    return (
+        request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+        and not len(get_messages(request))
+    )
+
+
+def _store(key, response):
+    timeout = settings.LISTING_PAGE_CACHE_TIMEOUT
+    entry = (time.time() + timeout, response.content, response['Content-Type'])
+    # Kept past the soft expiry so stale copies can be served while re-rendering
+    cache.set(key, entry, timeout + settings.LISTING_PAGE_CACHE_GRACE)
+
+
+def _cached_response(entry, status):
+    response = HttpResponse(entry[1], content_type=entry[2])
+    response['X-Cache'] = status
+    return response
+
+
+def _lookup(request, language_func):
+    """
+    Cache lookup before rendering, returns (state, key, response):
+    'hit' with the cached (or stale) response to serve, 'render' when this
+    request renders and stores the page (it holds the lock), 'wait' when
+    another request is rendering it and 'bypass' for uncacheable requests.
+    """
+    if not _is_cacheable(request):
+        return 'bypass', None, None
+
+    key = listing_cache_key(request, language_func(request))
+    entry = cache.get(key)
+    if entry is not None:
+        if entry[0] > time.time():
+            return 'hit', key, _cached_response(entry, 'HIT')
+        if not cache.add(f'{key}:lock', 1, settings.LISTING_PAGE_CACHE_LOCK_TIMEOUT):
+            # Someone else is refreshing this page
+            return 'hit', key, _cached_response(entry, 'STALE')
+    elif not cache.add(f'{key}:lock', 1, settings.LISTING_PAGE_CACHE_LOCK_TIMEOUT):
+        return 'wait', key, None
+    return 'render', key, None
+
+
+def _stored(key, response):
+    if response.status_code == 200 and not response.streaming:
+        _store(key, response)
+        response['X-Cache'] = 'MISS'
+    return response
+
+
+def cache_listing_page(language_func):
+    """
+    Cache the decorated listing view's responses for anonymous visitors.
+    ``language_func(request)`` returns the language the page is rendered in.
+    Async views get an async wrapper that does not block the event loop
+    while waiting for another request's render.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @functools.wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                # Session, user and cache access are synchronous
+                state, key, response = await sync_to_async(_lookup)(request, language_func)
+                if state == 'hit':
+                    return response
+                if state == 'wait':
+                    deadline = time.monotonic() + LOCK_WAIT_SECONDS
+                    while time.monotonic() < deadline:
+                        await asyncio.sleep(LOCK_POLL_SECONDS)
+                        entry = await cache.aget(key)
+                        if entry is not None:
+                            return _cached_response(entry, 'HIT')
+                if state != 'render':
+                    return await view_func(request, *args, **kwargs)
+                try:
+                    response = await view_func(request, *args, **kwargs)
+                    await sync_to_async(_stored)(key, response)
+                finally:
+                    await cache.adelete(f'{key}:lock')
+                return response
+            return async_wrapper
+
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            state, key, response = _lookup(request, language_func)
+            if state == 'hit':
+                return response
+            if state == 'wait':
+                deadline = time.monotonic() + LOCK_WAIT_SECONDS
+                while time.monotonic() < deadline:
+                    time.sleep(LOCK_POLL_SECONDS)
+                    entry = cache.get(key)
+                    if entry is not None:
+                        return _cached_response(entry, 'HIT')
+            if state != 'render':
+                # Uncacheable, or the renderer is slow or died: render without caching
+                return view_func(request, *args, **kwargs)
+            try:
+                response = _stored(key, view_func(request, *args, **kwargs))
+            finally:
+                cache.delete(f'{key}:lock')
+            return response
+        return wrapper
+    return decorator
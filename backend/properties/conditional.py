@@ -0,0 +1,96 @@
+"""
+Conditional GET (ETag / Last-Modified) for the property pages.
+
+Validators are computed from cheap data (``Property.updated_at``, which the
+image signals also bump, and the catalog version) so a revalidation costs
+at most one small query and never renders a template.
+"""
+import datetime
+import functools
+import hashlib
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .caching import get_catalog_version
+from .filters import canonical_filters
+
+
+def make_etag(*parts):
+    """Strong ETag from the values a page depends on"""
+    return '"%s"' % hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def not_modified(request, etag, last_modified):
+    """
+    Return a 304 (or 412) response if the client's copy is still current,
+    otherwise None. ``last_modified`` is an aware datetime.
+    """
+    if request.method not in ('GET', 'HEAD') or len(get_messages(request)):
+        # Pending flash messages must be rendered
+        return None
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(last_modified.timestamp())
+    )
+    if response is not None:
+        add_validators(request, response, etag, last_modified)
+    return response
+
+
+def add_validators(request, response, etag, last_modified):
+    """Attach validators and make clients revalidate before reusing the page"""
+    if response.status_code not in (200, 304):
+        return response
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified.timestamp())
+    # Pages differ per language (cookie) and user
+    patch_vary_headers(response, ['Cookie'])
+    if request.user.is_authenticated:
+        patch_cache_control(response, no_cache=True, private=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+def page_validators(request, *parts):
+    """ETag for a page also varying on the user (owner-only links)"""
+    return make_etag(request.user.pk or '', *parts)
+
+
+def _listing_validators(request, language_func):
+    """(etag, last_modified, 304 response or None) of a listing page"""
+    version = get_catalog_version()
+    last_modified = datetime.datetime.fromtimestamp(version / 1e9, datetime.timezone.utc)
+    etag = page_validators(
+        request, version, language_func(request),
+        canonical_filters(request.GET), request.GET.get('cursor', '')
+    )
+    return etag, last_modified, not_modified(request, etag, last_modified)
+
+
+def conditional_listing(language_func):
+    """
+    Answer listing revalidations from the catalog version, a watermark that
+    changes on every property/image write, without touching the database.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @functools.wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                etag, last_modified, response = await sync_to_async(_listing_validators)(request, language_func)
+                if response is not None:
+                    return response
+                # request.user is loaded by now, add_validators does no I/O
+                return add_validators(request, await view_func(request, *args, **kwargs), etag, last_modified)
+            return async_wrapper
+
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            etag, last_modified, response = _listing_validators(request, language_func)
+            if response is not None:
+                return response
+            return add_validators(request, view_func(request, *args, **kwargs), etag, last_modified)
+        return wrapper
+    return decorator
@@ -0,0 +1,205 @@
+"""
+Write-behind view counter for property detail pages.
+
+A page view is one ``O_APPEND`` write of the property id to a spool file
+owned by the current process; spool files are rotated every
+VIEW_COUNTER_BUCKET_SECONDS. ``flush()`` (run by the ``flush_view_counts``
+command) applies closed spool files as batched ``F('views') + n`` updates
+and records each file in the ViewCountBatch ledger in the same
+transaction, so a crash at any point never loses or double-applies views.
+
+Pending increments are also mirrored in the cache, per property and
+bucket, so pages can show ``views`` including the not yet flushed hits.
+Only buckets whose spool files are still in the spool directory are
+counted: flush() deletes the files once their views are committed, and
+every process on the host sees that, even with a per-process cache. A
+crash between the commit and the deletion is only double counted until
+the next flush skips the files through the ledger and deletes them.
+The cache entries expire after VIEW_COUNTER_PENDING_TIMEOUT, so only the
+newest buckets younger than that are looked up (at most
+MAX_PENDING_BUCKETS, in case flushing falls behind), and the spool
+directory listing is reused for BUCKET_LISTING_SECONDS.
+"""
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Property, ViewCountBatch
+
+PENDING_KEY = 'property_views:pending:{}:{}'
+
+# Seconds after a bucket closes before its files are flushed, so a writer
+# that picked the bucket just before the boundary has finished writing
+FLUSH_GRACE_SECONDS = 2
+
+# How long applied spool file names are kept in the ledger
+LEDGER_RETENTION = timedelta(days=7)
+
+# Bounds the cache keys read per page when flush_view_counts falls behind
+MAX_PENDING_BUCKETS = 10
+# How long a listing of the spool directory is reused by this process
+BUCKET_LISTING_SECONDS = 1.0
+
+_lock = threading.Lock()
+_spool = None  # (pid, bucket, file descriptor) of the open spool file
+_listing = None  # (monotonic expiry, buckets with spool files)
+
+
+def _spool_dir():
+    path = Path(settings.VIEW_COUNTER_SPOOL_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _bucket(now):
+    return int(now // settings.VIEW_COUNTER_BUCKET_SECONDS)
+
+
+def _spool_fd(now):
+    """File descriptor of this process' spool file for the current bucket"""
+    global _spool
+    pid = os.getpid()
+    bucket = _bucket(now)
+    if _spool is None or _spool[:2] != (pid, bucket):
+        if _spool is not None and _spool[0] == pid:
+            os.close(_spool[2])
+        path = _spool_dir() / f'{bucket}-{pid}.spool'
+        _spool = (pid, bucket, os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644))
+    return _spool[2]
+
+
+def _cache_add(key, delta):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, settings.VIEW_COUNTER_PENDING_TIMEOUT):
+            cache.incr(key, delta)
+
+
+def record_view(pk):
+    """Record one view of a property without touching the database"""
+    now = time.time()
+    with _lock:
+        os.write(_spool_fd(now), f'{pk}\n'.encode())
+    _cache_add(PENDING_KEY.format(_bucket(now), pk), 1)
+
+
+def _listed_buckets():
+    global _listing
+    listing = _listing
+    if listing is None or listing[0] <= time.monotonic():
+        buckets = set()
+        with os.scandir(_spool_dir()) as entries:
+            for entry in entries:
+                if entry.name.endswith('.spool'):
+                    buckets.add(int(entry.name.split('-', 1)[0]))
+        listing = _listing = (time.monotonic() + BUCKET_LISTING_SECONDS, frozenset(buckets))
+    return listing[1]
+
+
+def unflushed_buckets(now=None):
+    """
+    Buckets that still have spool files, i.e. views not in the database yet,
+    newest first. Buckets whose cache entries expired are left out.
+    """
+    now = time.time() if now is None else now
+    oldest = _bucket(now - settings.VIEW_COUNTER_PENDING_TIMEOUT)
+    buckets = sorted((bucket for bucket in _listed_buckets() if bucket >= oldest), reverse=True)
+    return buckets[:MAX_PENDING_BUCKETS]
+
+
+def pending_views(pks):
+    """Views recorded but not flushed yet, as {pk: count}"""
+    keys = {
+        PENDING_KEY.format(bucket, pk): pk
+        for bucket in unflushed_buckets()
+        for pk in pks
+    }
+    pending = Counter()
+    for key, value in cache.get_many(keys).items():
+        pending[keys[key]] += value
+    return pending
+
+
+def merge_pending(properties):
+    """Add pending views to the ``views`` of already loaded properties"""
+    properties = list(properties)
+    pending = pending_views([p.pk for p in properties])
+    for property_obj in properties:
+        property_obj.views += pending.get(property_obj.pk, 0)
+    return properties
+
+
+def _read_spool(path):
+    counts = Counter()
+    with open(path, 'rb') as spool:
+        for line in spool:
+            line = line.strip()
+            # A torn last line after a crash is skipped
+            if line.isdigit():
+                counts[int(line)] += 1
+    return counts
+
+
+def _apply(counts):
+    # One UPDATE per distinct increment rather than one per property
+    by_delta = defaultdict(list)
+    for pk, delta in counts.items():
+        by_delta[delta].append(pk)
+    for delta, pks in by_delta.items():
+        Property.objects.filter(pk__in=pks).update(views=F('views') + delta)
+
+
+def flush(now=None, max_files=100):
+    """
+    Apply closed spool files to the database.
+    Returns (files applied, views applied).
+    """
+    global _listing
+    now = time.time() if now is None else now
+    bucket_seconds = settings.VIEW_COUNTER_BUCKET_SECONDS
+    closed = []
+    for path in sorted(_spool_dir().glob('*.spool')):
+        bucket = int(path.name.split('-', 1)[0])
+        if (bucket + 1) * bucket_seconds + FLUSH_GRACE_SECONDS <= now:
+            closed.append(path)
+
+    files = views = 0
+    for start in range(0, len(closed), max_files):
+        paths = closed[start:start + max_files]
+        names = [path.name for path in paths]
+        applied = set(ViewCountBatch.objects.using(DEFAULT_DB_ALIAS).filter(name__in=names).values_list('name', flat=True))
+
+        counts = Counter()
+        batches = []
+        for path in paths:
+            if path.name in applied:
+                # Applied before a crash, only the cleanup is missing
+                continue
+            file_counts = _read_spool(path)
+            counts.update(file_counts)
+            batches.append(ViewCountBatch(name=path.name, views=sum(file_counts.values())))
+
+        with transaction.atomic():
+            _apply(counts)
+            ViewCountBatch.objects.bulk_create(batches)
+
+        # Deleting the files drops their buckets from pending_views()
+        for path in paths:
+            path.unlink(missing_ok=True)
+        _listing = None
+
+        files += len(batches)
+        views += sum(counts.values())
+
+    ViewCountBatch.objects.filter(applied_at__lt=timezone.now() - LEDGER_RETENTION).delete()
+    return files, views
@@ -0,0 +1,58 @@
+"""
+CPU-heavy image encoding for modern formats (WebP, AVIF).
+
+This module only depends on Pillow so its functions can run in a process
+pool (including ``spawn`` workers that never set up Django).
+"""
+import io
+
+from PIL import Image, ImageOps, features
+
+# Encoder settings per format: (Pillow format name, MIME type, save options)
+FORMATS = {
+    'avif': ('AVIF', 'image/avif', {'quality': 55, 'speed': 6}),
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+}
+
+
+def available_formats():
+    """Modern formats the installed Pillow can encode, best first"""
+    return [name for name in FORMATS if features.check(name)]
+
+
+def resize(image, size, crop):
+    """Resize like easy_thumbnails: center crop to size, or fit inside it"""
+    if crop:
+        # easy_thumbnails never upscales, a small source is cropped to fit instead
+        scale = min(max(size[0] / image.width, size[1] / image.height), 1)
+        size = (min(size[0], round(image.width * scale)), min(size[1], round(image.height * scale)))
+        return ImageOps.fit(image, size, Image.LANCZOS)
+    image = image.copy()
+    image.thumbnail(size, Image.LANCZOS)
+    return image
+
+
+def encode(image, fmt):
+    """Encode a Pillow image to bytes in one of FORMATS"""
+    pil_format, _, options = FORMATS[fmt]
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def encode_variants(data, sizes, formats):
+    """
+    Decode source image bytes once and encode every size in every format.
+
+    ``sizes`` maps alias -> (size, crop). Returns {format: {alias: bytes}}.
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+    variants = {fmt: {} for fmt in formats}
+    for alias, (size, crop) in sizes.items():
+        resized = resize(image, size, crop)
+        for fmt in formats:
+            variants[fmt][alias] = encode(resized, fmt)
+    return variants
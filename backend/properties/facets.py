@@ -0,0 +1,103 @@
+"""
+Facet counts for the listing filters (locations, property and sale types).
+
+Counts of active properties are kept in the LocationFacet table, adjusted by
++1/-1 from the Property signals so reading the sidebar is a single query.
+"""
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import Property, LocationFacet
+
+# Property fields that determine the facet row
+FACET_FIELDS = ('location_en', 'location_ar', 'property_type', 'sale_type')
+
+
+def facet_key(property_obj):
+    """Facet row key for a property, None when it is not counted"""
+    if not property_obj.is_active:
+        return None
+    return tuple(getattr(property_obj, field) for field in FACET_FIELDS)
+
+
+def stored_facet_key(pk):
+    """Facet key of the property as currently stored in the primary database"""
+    row = Property.objects.using(DEFAULT_DB_ALIAS).filter(pk=pk).values_list('is_active', *FACET_FIELDS).first()
+    if row is None or not row[0]:
+        return None
+    return tuple(row[1:])
+
+
+def adjust(key, delta):
+    """Add delta to a facet row, creating it on first use"""
+    if key is None or not delta:
+        return
+    lookup = dict(zip(FACET_FIELDS, key))
+    if LocationFacet.objects.filter(**lookup).update(count=F('count') + delta):
+        return
+    try:
+        with transaction.atomic():
+            LocationFacet.objects.create(count=delta, **lookup)
+    except IntegrityError:
+        # Created concurrently, fall back to the update
+        LocationFacet.objects.filter(**lookup).update(count=F('count') + delta)
+
+
+def move(old_key, new_key):
+    """Move one property between facet rows"""
+    if old_key != new_key:
+        adjust(old_key, -1)
+        adjust(new_key, 1)
+
+
+def rebuild():
+    """Recompute all facet rows from the properties table"""
+    rows = (
+        Property.objects.using(DEFAULT_DB_ALIAS).filter(is_active=True)
+        .values(*FACET_FIELDS)
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    with transaction.atomic():
+        LocationFacet.objects.all().delete()
+        LocationFacet.objects.bulk_create(
+            [LocationFacet(count=row.pop('total'), **row) for row in rows],
+            batch_size=1000
+        )
+    return LocationFacet.objects.count()
+
+
+def _summarize(facets, language):
+    locations = {}
+    type_counts = {}
+    sale_type_counts = {}
+    for facet in facets:
+        name = facet.location_ar if language == 'ar' else facet.location_en
+        locations[name] = locations.get(name, 0) + facet.count
+        type_counts[facet.property_type] = type_counts.get(facet.property_type, 0) + facet.count
+        sale_type_counts[facet.sale_type] = sale_type_counts.get(facet.sale_type, 0) + facet.count
+
+    return {
+        'locations': sorted(locations.items()),
+        'property_types': [
+            (value, label, type_counts.get(value, 0))
+            for value, label in Property.PROPERTY_TYPE_CHOICES
+        ],
+        'sale_types': [
+            (value, label, sale_type_counts.get(value, 0))
+            for value, label in Property.SALE_TYPE_CHOICES
+        ],
+    }
+
+
+def get_facets(language='en'):
+    """
+    Filter sidebar data from a single read of the facet table:
+    locations with their counts, and counts per property and sale type.
+    """
+    return _summarize(LocationFacet.objects.filter(count__gt=0), language)
+
+
+async def aget_facets(language='en'):
+    """Async get_facets, for the ASGI views"""
+    return _summarize([facet async for facet in LocationFacet.objects.filter(count__gt=0)], language)
@@ -0,0 +1,67 @@
+"""
+Listing filters shared by the property list view and its caches.
+"""
+from django.db.models import Q
+
+from . import geo
+from .search import apply_search
+
+# Query parameters that affect the listing results
+FILTER_PARAMS = (
+    'type', 'sale_type', 'location', 'location_exact', 'search', 'min_price', 'max_price',
+    'near', 'radius', 'bbox',
+)
+
+# Radius (km) of `near` searches without `radius`
+DEFAULT_RADIUS_KM = 5
+
+
+def canonical_filters(params):
+    """Canonical (sorted, non-empty) listing filters from the query string"""
+    return sorted(
+        (key, params[key].strip())
+        for key in FILTER_PARAMS
+        if params.get(key, '').strip()
+    )
+
+
+def filter_properties(properties, params):
+    """Apply the listing query string filters to a Property queryset"""
+    property_type = params.get('type')
+    sale_type = params.get('sale_type')
+    location = params.get('location')
+    location_exact = params.get('location_exact')
+    search = params.get('search')
+    min_price = params.get('min_price')
+    max_price = params.get('max_price')
+    
+    if property_type:
+        properties = properties.filter(property_type=property_type)
+    if sale_type:
+        properties = properties.filter(sale_type=sale_type)
+    if location_exact:
+        # A facet of the sidebar: the exact name in either language, so the
+        # results match the count shown next to it
+        properties = properties.filter(Q(location_en=location_exact) | Q(location_ar=location_exact))
+    if search or location:
+        # Full-text index lookup, ranked by relevance when searching
+        properties = apply_search(properties, search=search, location=location)
+    if min_price:
+        properties = properties.filter(price__gte=min_price)
+    if max_price:
+        properties = properties.filter(price__lte=max_price)
+    
+    # Map viewport (south,west,north,east) and radius searches, invalid
+    # coordinates are ignored
+    bbox = geo.parse_bbox(params.get('bbox'))
+    if bbox:
+        properties = geo.within_bbox(properties, *bbox)
+    point = geo.parse_point(params.get('near'))
+    if point:
+        try:
+            radius = float(params.get('radius') or DEFAULT_RADIUS_KM)
+        except ValueError:
+            radius = DEFAULT_RADIUS_KM
+        # Nearest first
+        properties = geo.near(properties, *point, max(radius, 0))
+    return properties
@@ -11,7 +11,8 @@ class PropertyForm(forms.ModelForm):
             'title_en', 'title_ar',
             'description_en', 'description_ar',
             'location_en', 'location_ar',
-            'price', 'property_type', 'sale_type', 'phone'
+            'price', 'property_type', 'sale_type', 'phone',
+            'latitude', 'longitude'
         ]
         widgets = {
             'description_en': forms.Textarea(attrs={'rows': 4}),
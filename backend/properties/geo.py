@@ -0,0 +1,262 @@
+"""
+Coordinates, spatial index and radius/bounding-box search for properties.
+
+Every located property stores a geohash (Property.geo_cell) so a bounding
+box can be answered with a few indexed range scans on any backend. On
+SQLite builds with the R*Tree module an ``rtree`` virtual table keyed by
+the property id is used instead, kept in sync from the Property signals
+like the full-text index (search.py). Both are only prefilters: the exact
+latitude/longitude range and the haversine distance are checked in SQL.
+"""
+import csv
+import math
+import os
+
+from django.db import connection, DatabaseError, DEFAULT_DB_ALIAS
+from django.db.models import F, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+from .search import normalize
+
+RTREE_TABLE = 'properties_property_rtree'
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+MAX_RADIUS_KM = 200
+
+GEOHASH_PRECISION = 9
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+# Upper bound of the geohash cells a bounding box is covered with
+MAX_COVERING_CELLS = 16
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(__file__), 'data', 'gazetteer.csv')
+
+_rtree_available = None
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Standard base32 geohash of a point"""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    cell = []
+    bits = bit_count = 0
+    even = True
+    while len(cell) < precision:
+        value, bounds = (longitude, lng_range) if even else (latitude, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            bounds[0] = middle
+        else:
+            bounds[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            cell.append(GEOHASH_ALPHABET[bits])
+            bits = bit_count = 0
+    return ''.join(cell)
+
+
+def _cell_size(precision):
+    """(latitude, longitude) size in degrees of a geohash cell"""
+    lng_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def covering_cells(south, west, north, east):
+    """
+    The geohash prefixes (as few and as long as possible, at most
+    MAX_COVERING_CELLS) whose cells cover a bounding box
+    """
+    best = ['']
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        lat_size, lng_size = _cell_size(precision)
+        rows = math.floor(north / lat_size) - math.floor(south / lat_size) + 1
+        columns = math.floor(east / lng_size) - math.floor(west / lng_size) + 1
+        if rows * columns > MAX_COVERING_CELLS:
+            break
+        cells = set()
+        for row in range(rows):
+            latitude = min(south + row * lat_size, north)
+            for column in range(columns):
+                longitude = min(west + column * lng_size, east)
+                cells.add(encode_geohash(latitude, longitude, precision))
+        # Corners in case the stepping rounded past them
+        for latitude in (south, north):
+            for longitude in (west, east):
+                cells.add(encode_geohash(latitude, longitude, precision))
+        best = sorted(cells)
+    return best
+
+
+def rtree_available():
+    """Check (once per process) whether the R*Tree index table exists"""
+    global _rtree_available
+    if _rtree_available is None:
+        if connection.vendor != 'sqlite':
+            _rtree_available = False
+        else:
+            _rtree_available = RTREE_TABLE in connection.introspection.table_names()
+    return _rtree_available
+
+
+def create_index(schema_editor):
+    """Create the R*Tree table, returns False if the module is not compiled in"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return False
+    try:
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {RTREE_TABLE} '
+            f'USING rtree(id, min_lat, max_lat, min_lng, max_lng)'
+        )
+    except DatabaseError:
+        return False
+    return True
+
+
+def index_properties(properties):
+    """Add, move or drop R*Tree entries for the given properties"""
+    if not rtree_available():
+        return
+    properties = list(properties)
+    if not properties:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {RTREE_TABLE} WHERE id = %s', [(p.pk,) for p in properties])
+        cursor.executemany(
+            f'INSERT INTO {RTREE_TABLE} (id, min_lat, max_lat, min_lng, max_lng) VALUES (%s, %s, %s, %s, %s)',
+            [
+                (p.pk, p.latitude, p.latitude, p.longitude, p.longitude)
+                for p in properties if p.latitude is not None and p.longitude is not None
+            ]
+        )
+
+
+def remove_properties(pks):
+    if not rtree_available() or not pks:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {RTREE_TABLE} WHERE id = %s', [(pk,) for pk in pks])
+
+
+def rebuild_index(queryset, batch_size=2000):
+    """Rebuild the R*Tree from the located properties of a queryset"""
+    if not rtree_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {RTREE_TABLE}')
+    total = 0
+    batch = []
+    # The index lives on the primary, so does its source
+    queryset = queryset.using(DEFAULT_DB_ALIAS).filter(latitude__isnull=False, longitude__isnull=False)
+    for property_obj in queryset.only('pk', 'latitude', 'longitude').iterator(chunk_size=batch_size):
+        batch.append(property_obj)
+        if len(batch) >= batch_size:
+            index_properties(batch)
+            total += len(batch)
+            batch = []
+    index_properties(batch)
+    return total + len(batch)
+
+
+def geo_cell(property_obj):
+    """Geohash to store on a property, '' when it has no coordinates"""
+    if property_obj.latitude is None or property_obj.longitude is None:
+        return ''
+    return encode_geohash(property_obj.latitude, property_obj.longitude)
+
+
+def within_bbox(queryset, south, west, north, east):
+    """Filter a Property queryset to a bounding box (no antimeridian wrap)"""
+    if rtree_available():
+        prefilter = Q(pk__in=RawSQL(
+            f'SELECT id FROM {RTREE_TABLE} WHERE max_lat >= %s AND min_lat <= %s AND max_lng >= %s AND min_lng <= %s',
+            (south, north, west, east)
+        ))
+    else:
+        # Index range scans: 'abc' <= geo_cell < 'abc~' matches the prefix
+        prefilter = Q()
+        for cell in covering_cells(south, west, north, east):
+            prefilter |= Q(geo_cell__gte=cell, geo_cell__lt=cell + '~')
+    return queryset.filter(
+        prefilter,
+        latitude__range=(south, north),
+        longitude__range=(west, east),
+    )
+
+
+def distance_expression(latitude, longitude):
+    """Haversine distance in km from a point to Property coordinates"""
+    lat1 = math.radians(latitude)
+    d_lat = (Radians(F('latitude')) - Value(lat1)) / 2
+    d_lng = (Radians(F('longitude')) - Value(math.radians(longitude))) / 2
+    a = Power(Sin(d_lat), 2) + Value(math.cos(lat1)) * Cos(Radians(F('latitude'))) * Power(Sin(d_lng), 2)
+    return Value(2 * EARTH_RADIUS_KM) * ASin(Sqrt(a))
+
+
+def near(queryset, latitude, longitude, radius_km):
+    """
+    Filter to properties within radius_km of a point, annotated with
+    ``distance_km`` and ordered by it (the existing ordering breaks ties).
+    """
+    radius_km = min(radius_km, MAX_RADIUS_KM)
+    d_lat = radius_km / KM_PER_DEGREE
+    d_lng = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+    queryset = within_bbox(
+        queryset,
+        max(latitude - d_lat, -90), max(longitude - d_lng, -180),
+        min(latitude + d_lat, 90), min(longitude + d_lng, 180),
+    )
+    return queryset.annotate(
+        distance_km=distance_expression(latitude, longitude)
+    ).filter(distance_km__lte=radius_km).order_by('distance_km', *queryset.query.order_by)
+
+
+def parse_point(value):
+    """'lat,lng' -> (lat, lng), None when invalid"""
+    try:
+        latitude, longitude = (float(part) for part in value.split(','))
+    except (AttributeError, ValueError):
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    return latitude, longitude
+
+
+def parse_bbox(value):
+    """'south,west,north,east' -> tuple, None when invalid"""
+    try:
+        south, west, north, east = (float(part) for part in value.split(','))
+    except (AttributeError, ValueError):
+        return None
+    if not (-90 <= south <= north <= 90 and -180 <= west <= east <= 180):
+        return None
+    return south, west, north, east
+
+
+def load_gazetteer(path=GAZETTEER_PATH):
+    """Normalized English and Arabic place names -> (latitude, longitude)"""
+    places = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            point = (float(row['latitude']), float(row['longitude']))
+            for name in (row['name_en'], row['name_ar']):
+                places[normalize(name).strip()] = point
+    return places
+
+
+def geocode(location, gazetteer):
+    """
+    Look up a free-text location: the whole text first, then its comma
+    separated parts from the most specific ('Maadi, Cairo' -> Maadi).
+    """
+    if not location:
+        return None
+    candidates = [location, *location.replace('،', ',').split(',')]
+    for candidate in candidates:
+        point = gazetteer.get(normalize(candidate).strip())
+        if point:
+            return point
+    return None
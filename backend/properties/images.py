@@ -0,0 +1,33 @@
+"""
+Denormalized image data kept on Property.
+"""
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+
+from . import snapshots
+from .caching import bump_catalog_version
+from .models import Property, PropertyImage
+
+
+def refresh_cover(property_ids):
+    """
+    Point Property.cover_image (and its renditions) at the first image (by
+    order) of each given property. Also bumps updated_at and the catalog
+    version since the gallery changed. Reads from the primary, a replica
+    may not have the image just written yet.
+    """
+    for property_id in set(property_ids):
+        image, renditions, modern_renditions = (
+            PropertyImage.objects.using(DEFAULT_DB_ALIAS).filter(property_id=property_id)
+            .order_by('order', '-created_at')
+            .values_list('image', 'renditions', 'modern_renditions')
+            .first()
+        ) or ('', {}, {})
+        Property.objects.filter(pk=property_id).update(
+            cover_image=image,
+            cover_renditions=renditions,
+            cover_modern_renditions=modern_renditions,
+            updated_at=timezone.now()
+        )
+    snapshots.invalidate(set(property_ids))
+    bump_catalog_version()
@@ -0,0 +1,242 @@
+"""
+Bulk listing import from partner feeds (CSV or JSON lines).
+
+Rows are streamed from the file, validated with the PropertyForm rules and
+upserted on (source, external_id) in batches, one transaction per batch.
+Bulk queries skip the model signals, so each batch also updates the search
+and spatial indexes itself; facets and the page cache are refreshed once at the end by
+the ``import_properties`` command.
+
+Images are fetched (URLs) or copied (local paths) by a thread pool while
+the next batches are imported, see ImageFetcher.
+"""
+import csv
+import json
+import os
+import urllib.request
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.base import ContentFile
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+
+from estate_project.sqlite_backend.base import atomic_write
+
+from .forms import PropertyForm
+from .models import Property, PropertyImage
+from . import geo, images, search, snapshots
+
+# Feed columns besides the PropertyForm fields
+ID_COLUMN = 'external_id'
+IMAGES_COLUMN = 'images'
+ACTIVE_COLUMN = 'is_active'
+
+FORM_FIELDS = PropertyForm._meta.fields
+
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+
+
+def read_rows(path, fmt=None):
+    """
+    Yield (line number, row) from a CSV or JSON lines file. CSV rows are
+    dicts, where several images are separated with ``|``; JSON lines are
+    yielded as text and decoded by validate_row, so a malformed line is
+    one invalid row rather than the end of the import.
+    """
+    fmt = fmt or ('jsonl' if path.endswith(('.jsonl', '.ndjson', '.json')) else 'csv')
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        if fmt == 'csv':
+            for number, row in enumerate(csv.DictReader(f), start=2):
+                row[IMAGES_COLUMN] = [url for url in (row.get(IMAGES_COLUMN) or '').split('|') if url.strip()]
+                yield number, row
+        else:
+            for number, line in enumerate(f, start=1):
+                if line.strip():
+                    yield number, line
+
+
+def _is_true(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() not in ('0', 'false', 'no', 'n', '')
+
+
+def validate_row(row):
+    """
+    Validate one feed row (a dict or a JSON line), returns (values, image
+    locations) or raises ValueError with the errors.
+    """
+    if isinstance(row, str):
+        try:
+            row = json.loads(row)
+        except ValueError as e:
+            raise ValueError(f'invalid JSON: {e}')
+    if not isinstance(row, dict):
+        raise ValueError('a row must be a JSON object')
+
+    external_id = str(row.get(ID_COLUMN) or '').strip()
+    if not external_id:
+        raise ValueError(f'{ID_COLUMN} is required')
+
+    form = PropertyForm(data={field: row.get(field, '') for field in FORM_FIELDS})
+    if not form.is_valid():
+        errors = '; '.join(f'{field}: {" ".join(messages)}' for field, messages in form.errors.items())
+        raise ValueError(errors)
+
+    values = dict(form.cleaned_data, external_id=external_id)
+    values['is_active'] = _is_true(row.get(ACTIVE_COLUMN, True))
+    image_locations = row.get(IMAGES_COLUMN) or []
+    if isinstance(image_locations, str):
+        image_locations = [image_locations]
+    if not isinstance(image_locations, list) or not all(isinstance(location, str) for location in image_locations):
+        raise ValueError(f'{IMAGES_COLUMN} must be a list of URLs or paths')
+    return values, [location.strip() for location in image_locations]
+
+
+def upsert_batch(rows, source, owner):
+    """
+    Insert or update a batch of validated rows in one transaction.
+
+    ``rows`` is a list of (values, image locations). Returns (created,
+    updated, image jobs) where jobs are (property id, order, location) for
+    properties that have no images yet, so re-running a feed does not
+    duplicate galleries.
+    """
+    by_id = {values['external_id']: (values, locations) for values, locations in rows}
+    # bulk_update skips auto_now, updated_at is set so readers syncing on it see the change
+    update_fields = [*FORM_FIELDS, 'is_active', 'geo_cell', 'updated_at']
+    now = timezone.now()
+
+    # Reads the existing rows before writing: take the write lock up front
+    with atomic_write():
+        # Read from the primary: rows missing on a lagging replica would be inserted twice
+        existing = {
+            p.external_id: p
+            for p in Property.objects.using(DEFAULT_DB_ALIAS).filter(source=source, external_id__in=by_id)
+        }
+        to_create = []
+        to_update = []
+        for external_id, (values, _) in by_id.items():
+            property_obj = existing.get(external_id)
+            if property_obj is None:
+                property_obj = Property(owner=owner, source=source, **values)
+                to_create.append(property_obj)
+            else:
+                for field, value in values.items():
+                    setattr(property_obj, field, value)
+                property_obj.updated_at = now
+                to_update.append(property_obj)
+            property_obj.geo_cell = geo.geo_cell(property_obj)
+
+        created = Property.objects.bulk_create(to_create)
+        if to_update:
+            Property.objects.bulk_update(to_update, update_fields)
+        if len(created) and created[0].pk is None:
+            # Backends that do not return ids from bulk inserts
+            created = list(Property.objects.using(DEFAULT_DB_ALIAS).filter(
+                source=source, external_id__in=[p.external_id for p in created]
+            ))
+        search.index_properties([*created, *to_update])
+        snapshots.invalidate(p.pk for p in to_update)
+        geo.index_properties([*created, *to_update])
+
+        with_images = set(
+            PropertyImage.objects.using(DEFAULT_DB_ALIAS).filter(property__in=to_update)
+            .values_list('property_id', flat=True)
+        )
+
+    jobs = [
+        (property_obj.pk, order, location)
+        for property_obj in [*created, *to_update]
+        if property_obj.pk not in with_images
+        for order, location in enumerate(by_id[property_obj.external_id][1])
+    ]
+    return len(created), len(to_update), jobs
+
+
+def fetch_image(location, base_dir=None):
+    """Read image bytes from an http(s) URL or a local path"""
+    if location.startswith(('http://', 'https://')):
+        with urllib.request.urlopen(location, timeout=30) as response:
+            data = response.read(MAX_IMAGE_BYTES + 1)
+    else:
+        path = os.path.join(base_dir or '', location)
+        with open(path, 'rb') as f:
+            data = f.read(MAX_IMAGE_BYTES + 1)
+    if len(data) > MAX_IMAGE_BYTES:
+        raise ValueError(f'{location} is larger than {MAX_IMAGE_BYTES} bytes')
+    return data
+
+
+def _store_image(property_id, order, location, base_dir):
+    """Fetch one image into media storage, returns the PropertyImage to create"""
+    data = fetch_image(location, base_dir)
+    field = PropertyImage._meta.get_field('image')
+    basename = os.path.basename(location.split('?')[0]) or f'{property_id}_{order}.jpg'
+    name = field.storage.save(field.generate_filename(None, basename), ContentFile(data))
+    return PropertyImage(property_id=property_id, order=order, image=name)
+
+
+class ImageFetcher:
+    """
+    Fetch images on a thread pool and insert the PropertyImage rows in
+    bulk from the importing thread.
+
+    Each submit() carries a mark (the rows read so far); ``checkpoint`` is
+    the last mark whose images, and those of every earlier submit, are
+    all stored or failed, i.e. where a resumed import may start.
+    """
+
+    def __init__(self, workers, base_dir=None, on_error=None):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='import-images')
+        self.base_dir = base_dir
+        self.on_error = on_error
+        self.pending = []
+        self.max_pending = workers * 8
+        self.marks = deque()
+        self.checkpoint = None
+        self.stored = 0
+        self.failed = 0
+
+    def submit(self, jobs, mark=None):
+        for property_id, order, location in jobs:
+            future = self.executor.submit(_store_image, property_id, order, location, self.base_dir)
+            self.pending.append((future, location, mark))
+        self.marks.append(mark)
+        if len(self.pending) > self.max_pending:
+            # Backpressure: do not let downloads pile up behind the import
+            self.collect(wait=True)
+        else:
+            self.collect(wait=False)
+
+    def collect(self, wait):
+        ready = []
+        remaining = []
+        for future, location, mark in self.pending:
+            if wait or future.done():
+                try:
+                    ready.append(future.result())
+                except Exception as e:
+                    self.failed += 1
+                    if self.on_error:
+                        self.on_error(location, e)
+            else:
+                remaining.append((future, location, mark))
+        self.pending = remaining
+        if ready:
+            # Bulk insert skips the image signals: covers are refreshed here
+            # and renditions come from `generate_thumbnails`
+            PropertyImage.objects.bulk_create(ready)
+            images.refresh_cover([image.property_id for image in ready])
+            self.stored += len(ready)
+
+        # Marks are submitted in order, so everything before the oldest
+        # pending download is complete
+        oldest = self.pending[0][2] if self.pending else None
+        while self.marks and (oldest is None or self.marks[0] != oldest):
+            self.checkpoint = self.marks.popleft()
+
+    def close(self):
+        self.collect(wait=True)
+        self.executor.shutdown()
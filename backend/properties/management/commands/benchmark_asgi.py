@@ -0,0 +1,213 @@
+import asyncio
+import importlib
+import io
+import json
+import platform
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+
+import django
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import override_settings
+from django.urls import clear_url_caches, reverse
+from django.utils import timezone
+
+from properties.benchmarks import LISTING_SCENARIOS, summarize
+from properties.models import Property
+
+# (handler, views routed by the URLconf)
+MODES = {
+    'wsgi': ('wsgi', False),
+    'asgi-sync': ('asgi', False),
+    'asgi-async': ('asgi', True),
+}
+HOST = 'testserver'
+
+
+def _route_async_views(enabled):
+    """Re-import the URLconfs so they pick the views for ASYNC_VIEWS"""
+    import estate_project.urls
+    import properties.urls
+
+    with override_settings(ASYNC_VIEWS=enabled):
+        importlib.reload(properties.urls)
+        importlib.reload(estate_project.urls)
+    clear_url_caches()
+
+
+def _split(url):
+    path, _, query = url.partition('?')
+    return path, query
+
+
+def run_wsgi(urls, concurrency):
+    """
+    Call the WSGI handler from a pool of `concurrency` threads, like a
+    threaded WSGI server. Returns (latencies in ms, errors, elapsed seconds).
+    """
+    handler = WSGIHandler()
+
+    def request(url):
+        path, query = _split(url)
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+            'SERVER_NAME': HOST, 'SERVER_PORT': '443', 'HTTP_HOST': HOST, 'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': '127.0.0.1', 'wsgi.input': io.BytesIO(), 'wsgi.url_scheme': 'https',
+            'wsgi.errors': io.StringIO(), 'wsgi.multithread': True, 'wsgi.multiprocess': False,
+        }
+        status = []
+        start = time.perf_counter()
+        response = handler(environ, lambda s, headers, exc_info=None: status.append(s))
+        try:
+            b''.join(response)
+        finally:
+            response.close()
+        return (time.perf_counter() - start) * 1000, status[0].startswith('200')
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(request, urls))
+    elapsed = time.perf_counter() - start
+    connections.close_all()
+    return [ms for ms, _ in results], sum(not ok for _, ok in results), elapsed
+
+
+def run_asgi(urls, concurrency):
+    """
+    Drive the ASGI handler from `concurrency` client tasks on one event
+    loop, like a single uvicorn/daphne worker. Same return value as run_wsgi.
+    """
+    handler = ASGIHandler()
+
+    async def request(url):
+        path, query = _split(url)
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'https', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+            'root_path': '', 'headers': [(b'host', HOST.encode())],
+            'client': ('127.0.0.1', 50000), 'server': (HOST, 443),
+        }
+        sent = asyncio.Event()
+        received = []
+
+        async def receive():
+            if not received:
+                received.append(True)
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            # The client stays connected until the response is sent
+            await sent.wait()
+            return {'type': 'http.disconnect'}
+
+        status = []
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+            elif not message.get('more_body'):
+                sent.set()
+
+        start = time.perf_counter()
+        await handler(scope, receive, send)
+        return (time.perf_counter() - start) * 1000, status[0] == 200
+
+    async def main():
+        queue = iter(urls)
+        results = []
+
+        async def client():
+            for url in queue:
+                results.append(await request(url))
+
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return results
+
+    start = time.perf_counter()
+    results = asyncio.run(main())
+    elapsed = time.perf_counter() - start
+    connections.close_all()
+    return [ms for ms, _ in results], sum(not ok for _, ok in results), elapsed
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare requests/s and tail latency of the read views served through the WSGI '
+        'handler (threads) and the ASGI handler (sync and async views) at high concurrency'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=64, help='Concurrent clients')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per mode')
+        parser.add_argument(
+            '--modes', default=','.join(MODES),
+            help=f'Comma separated modes to run: {", ".join(MODES)}'
+        )
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument(
+            '--with-cache', action='store_true',
+            help='Keep the configured cache (by default a dummy cache measures full renders)'
+        )
+
+    def handle(self, *args, **options):
+        modes = [mode for mode in options['modes'].split(',') if mode]
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f'Unknown modes: {", ".join(sorted(unknown))}')
+        # Client threads use their own connections, so the data must be committed
+        detail_pks = list(
+            Property.objects.filter(is_active=True).order_by('-views').values_list('pk', flat=True)[:20]
+        )
+        if not detail_pks:
+            raise CommandError('No active listings, run generate_synthetic_data first')
+
+        overrides = {'ALLOWED_HOSTS': [HOST]}
+        if not options['with_cache']:
+            overrides['CACHES'] = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+        results = {}
+        with override_settings(**overrides):
+            list_url = reverse('property_list')
+            pages = [f'{list_url}?{query}' for _, query in LISTING_SCENARIOS]
+            pages += [reverse('property_detail', args=[pk]) for pk in detail_pks]
+            urls = list(islice(cycle(pages), options['requests']))
+
+            for mode in modes:
+                handler, async_views = MODES[mode]
+                _route_async_views(async_views)
+                run = run_wsgi if handler == 'wsgi' else run_asgi
+                # Warm up caches, connections and templates
+                run(pages, min(options['concurrency'], len(pages)))
+                samples, errors, elapsed = run(urls, options['concurrency'])
+                results[mode] = {
+                    **summarize(samples),
+                    'requests_per_second': len(samples) / elapsed,
+                    'errors': errors,
+                }
+                self.stdout.write(f'{mode}: {len(samples)} requests in {elapsed:.1f}s')
+        _route_async_views(settings.ASYNC_VIEWS)
+
+        self.stdout.write(f'\n{"Mode":<12} {"req/s":>8} {"p50":>8} {"p95":>8} {"p99":>8} {"errors":>7}')
+        for mode, metrics in results.items():
+            self.stdout.write(
+                f'{mode:<12} {metrics["requests_per_second"]:>8.1f} {metrics["p50"]:>8.2f} '
+                f'{metrics["p95"]:>8.2f} {metrics["p99"]:>8.2f} {metrics["errors"]:>7}'
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({
+                    'meta': {
+                        'date': timezone.now().isoformat(),
+                        'python': platform.python_version(),
+                        'django': django.get_version(),
+                        'database': connection.vendor,
+                        'concurrency': options['concurrency'],
+                        'cache': options['with_cache'],
+                    },
+                    'results': results,
+                }, f, indent=2)
+            self.stdout.write(f'Results written to {options["output"]}')
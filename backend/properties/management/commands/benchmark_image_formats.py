@@ -0,0 +1,109 @@
+import io
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+from django.core.management.base import BaseCommand
+from PIL import Image, ImageDraw, ImageFilter
+from properties import encoders
+
+
+def _sample_image(seed, size=(1600, 1200)):
+    """Photo-like synthetic image: gradient sky, shapes, mild noise and blur"""
+    rng = random.Random(seed)
+    image = Image.linear_gradient('L').resize(size).convert('RGB')
+    image = Image.merge('RGB', [band.point(lambda v, k=rng.uniform(0.4, 1): int(v * k)) for band in image.split()])
+    draw = ImageDraw.Draw(image)
+    for _ in range(40):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        w, h = rng.randrange(40, 400), rng.randrange(40, 400)
+        draw.rectangle([x, y, x + w, y + h], fill=tuple(rng.randrange(256) for _ in range(3)))
+    noise = Image.effect_noise(size, 24).convert('RGB')
+    image = Image.blend(image, noise, 0.15).filter(ImageFilter.GaussianBlur(1.2))
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=92)
+    return buffer.getvalue()
+
+
+def _encode_all(data, sizes, formats):
+    """Encode one source in JPEG (easy_thumbnails default quality) and the modern formats"""
+    variants = encoders.encode_variants(data, sizes, formats)
+    with Image.open(io.BytesIO(data)) as source:
+        source = source.convert('RGB')
+        jpeg = {}
+        for alias, (size, crop) in sizes.items():
+            buffer = io.BytesIO()
+            encoders.resize(source, size, crop).save(buffer, 'JPEG', quality=85)
+            jpeg[alias] = buffer.getvalue()
+    variants['jpeg'] = jpeg
+    return {fmt: sum(len(content) for content in encoded.values()) for fmt, encoded in variants.items()}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark WebP/AVIF rendition sizes and encode throughput against JPEG'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--images', type=int, default=12, help='Number of source images')
+        parser.add_argument(
+            '--processes', type=int, default=multiprocessing.cpu_count(),
+            help='Process pool size for the parallel run'
+        )
+        parser.add_argument(
+            '--use-media', action='store_true',
+            help='Use existing PropertyImage files instead of synthetic images'
+        )
+
+    def handle(self, *args, **options):
+        # Imported here: pool workers import this module without Django set up
+        from properties import thumbnails
+        from properties.models import PropertyImage
+
+        count = options['images']
+        if options['use_media']:
+            sources = []
+            for image in PropertyImage.objects.order_by('-id')[:count]:
+                with image.image.open('rb') as f:
+                    sources.append(f.read())
+        else:
+            sources = [_sample_image(seed) for seed in range(count)]
+        if not sources:
+            self.stdout.write(self.style.WARNING('No source images'))
+            return
+
+        sizes = thumbnails.alias_sizes()
+        formats = encoders.available_formats()
+        self.stdout.write(
+            f'{len(sources)} sources, aliases {", ".join(sizes)}, formats jpeg, {", ".join(formats)}'
+        )
+
+        # Single process: bytes per format and per-core throughput
+        start = time.perf_counter()
+        totals = {}
+        for data in sources:
+            for fmt, size in _encode_all(data, sizes, formats).items():
+                totals[fmt] = totals.get(fmt, 0) + size
+        serial = time.perf_counter() - start
+
+        jpeg = totals['jpeg']
+        self.stdout.write('\nFormat    Total KB   vs JPEG')
+        for fmt in ['jpeg', *formats]:
+            saving = 100 * (1 - totals[fmt] / jpeg)
+            self.stdout.write(f'{fmt:<8} {totals[fmt] / 1024:>9.1f}   {saving:>6.1f}%')
+
+        # Process pool
+        processes = max(1, options['processes'])
+        with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('spawn')) as pool:
+            # Warm up the workers so process start-up is not measured
+            list(pool.map(_encode_all, sources[:processes], [sizes] * processes, [formats] * processes))
+            start = time.perf_counter()
+            list(pool.map(_encode_all, sources, [sizes] * len(sources), [formats] * len(sources)))
+            parallel = time.perf_counter() - start
+
+        self.stdout.write(
+            f'\nSerial:   {len(sources) / serial:.2f} images/s ({serial:.2f}s) on 1 core'
+        )
+        self.stdout.write(
+            f'Parallel: {len(sources) / parallel:.2f} images/s ({parallel:.2f}s) on {processes} processes, '
+            f'{len(sources) / parallel / processes:.2f} images/s per core'
+        )
@@ -0,0 +1,263 @@
+import http.client
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.urls import Resolver404, resolve
+
+from estate_project import media
+from properties.benchmarks import summarize
+
+# mode -> (MEDIA_ACCEL, the proxy offers wsgi.file_wrapper)
+MODES = {
+    'stream': ('', False),
+    'sendfile': ('', True),
+    'accel': ('x-accel-redirect', False),
+}
+HOST = 'testserver'
+RANGE_LENGTH = 1024 * 1024
+# Client read size
+BUFFER_SIZE = 256 * 1024
+
+
+class FileWrapper:
+    """wsgi.file_wrapper of the proxy; the proxy sendfile()s what it wraps"""
+
+    def __init__(self, filelike, block_size=8192):
+        self.filelike = filelike
+        self.block_size = block_size
+
+    def __iter__(self):
+        return iter(lambda: self.filelike.read(self.block_size), b'')
+
+    def close(self):
+        self.filelike.close()
+
+
+class ProxyHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for Nginx in front of a threaded WSGI server: runs the request
+    through Django and sends the body itself, following X-Accel-Redirect
+    to MEDIA_ROOT (ranges included) and sendfile()ing wrapped files.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': unquote(url.path), 'QUERY_STRING': url.query,
+            'SCRIPT_NAME': '', 'SERVER_NAME': HOST, 'SERVER_PORT': '443', 'HTTP_HOST': HOST,
+            'SERVER_PROTOCOL': 'HTTP/1.1', 'REMOTE_ADDR': '127.0.0.1', 'wsgi.input': io.BytesIO(),
+            'wsgi.url_scheme': 'https', 'wsgi.errors': io.StringIO(), 'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+        }
+        for name in ('Range', 'If-Range', 'If-None-Match', 'If-Modified-Since'):
+            if name in self.headers:
+                environ['HTTP_' + name.upper().replace('-', '_')] = self.headers[name]
+        if self.server.file_wrapper:
+            environ['wsgi.file_wrapper'] = FileWrapper
+
+        started = []
+        start = time.perf_counter()
+        result = self.server.application(environ, lambda status, headers, exc_info=None: started.append(
+            (int(status.split()[0]), headers)
+        ))
+        status, headers = started[0]
+        headers = dict(headers)
+        try:
+            accel = headers.pop('X-Accel-Redirect', None)
+            if accel is not None:
+                # Django is done once the headers are out
+                self.server.worker_ms.append((time.perf_counter() - start) * 1000)
+                self.send_internal(unquote(accel))
+                return
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            if 'Content-Length' not in headers:
+                self.send_header('Connection', 'close')
+            self.end_headers()
+            if isinstance(result, FileWrapper) and hasattr(result.filelike, 'fileno'):
+                fileno = result.filelike.fileno()
+                self.sendfile(fileno, os.lseek(fileno, 0, os.SEEK_CUR), int(headers['Content-Length']))
+            else:
+                for chunk in result:
+                    self.wfile.write(chunk)
+            self.server.worker_ms.append((time.perf_counter() - start) * 1000)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+    def send_internal(self, location):
+        """What the internal location of Nginx does with the redirect"""
+        path = location[len(settings.MEDIA_ACCEL_PREFIX.rstrip('/')) + 1:]
+        fullpath = os.path.join(settings.MEDIA_ROOT, path)
+        size = os.path.getsize(fullpath)
+        try:
+            byte_range = media.parse_range(self.headers.get('Range'), size)
+        except media.RangeNotSatisfiable:
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{size}')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        start, end = byte_range or (0, size - 1)
+        self.send_response(206 if byte_range else 200)
+        self.send_header('Content-Length', str(end - start + 1))
+        if byte_range:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.end_headers()
+        with open(fullpath, 'rb') as f:
+            self.sendfile(f.fileno(), start, end - start + 1)
+
+    def sendfile(self, fileno, offset, count):
+        while count > 0:
+            sent = os.sendfile(self.connection.fileno(), fileno, offset, count)
+            if sent == 0:
+                break
+            offset += sent
+            count -= sent
+
+
+class Command(BaseCommand):
+    help = (
+        'Media download throughput through a local proxy stand-in: Django streaming the '
+        'file, sendfile() through wsgi.file_wrapper, and X-Accel-Redirect hand-off'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--files', type=int, default=8, help='Distinct media files')
+        parser.add_argument('--size-mb', type=float, default=4, help='Size of each file in MB')
+        parser.add_argument('--requests', type=int, default=400, help='Requests per mode')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients')
+        parser.add_argument(
+            '--range-share', type=float, default=0.25,
+            help=f'Share of requests asking for a {RANGE_LENGTH // 1024} KB byte range'
+        )
+        parser.add_argument(
+            '--modes', default=','.join(MODES),
+            help=f'Comma separated modes to run: {", ".join(MODES)}'
+        )
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        modes = [mode for mode in options['modes'].split(',') if mode]
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f'Unknown modes: {", ".join(sorted(unknown))}')
+        try:
+            resolve(f'/{settings.MEDIA_URL.strip("/")}/x')
+        except Resolver404:
+            raise CommandError('Media is not routed through Django, set SERVE_MEDIA=True')
+
+        media_root = tempfile.mkdtemp(prefix='benchmark_media_')
+        try:
+            names = self.write_files(media_root, options['files'], int(options['size_mb'] * 1024 * 1024))
+            rng = random.Random('benchmark_media')
+            requests = [
+                (rng.choice(names), rng.random() < options['range_share'])
+                for _ in range(options['requests'])
+            ]
+            results = {}
+            for mode in modes:
+                accel, file_wrapper = MODES[mode]
+                with override_settings(ALLOWED_HOSTS=[HOST], MEDIA_ROOT=media_root, MEDIA_ACCEL=accel):
+                    results[mode] = self.run(requests, options['concurrency'], file_wrapper)
+                self.stdout.write(f'{mode}: {len(requests)} requests in {results[mode]["elapsed"]:.1f}s')
+        finally:
+            shutil.rmtree(media_root)
+
+        self.stdout.write(
+            f'\n{"Mode":<10} {"req/s":>8} {"MB/s":>8} {"p50":>8} {"p99":>8} {"worker p50":>11} {"errors":>7}'
+        )
+        for mode, metrics in results.items():
+            self.stdout.write(
+                f'{mode:<10} {metrics["requests_per_second"]:>8.1f} {metrics["mb_per_second"]:>8.1f} '
+                f'{metrics["p50"]:>8.2f} {metrics["p99"]:>8.2f} {metrics["worker"]["p50"]:>11.2f} '
+                f'{metrics["errors"]:>7}'
+            )
+        self.stdout.write('Latencies in ms; "worker" is the time a Django thread spends on a request')
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'options': {k: options[k] for k in (
+                    'files', 'size_mb', 'requests', 'concurrency', 'range_share'
+                )}, 'results': results}, f, indent=2)
+            self.stdout.write(f'Results written to {options["output"]}')
+
+    def write_files(self, media_root, count, size):
+        """Incompressible files laid out like uploads"""
+        rng = random.Random(size)
+        directory = os.path.join(media_root, 'properties', '2024', '01', '01')
+        os.makedirs(directory)
+        names = []
+        for number in range(count):
+            name = f'benchmark_{number}.jpg'
+            with open(os.path.join(directory, name), 'wb') as f:
+                f.write(rng.randbytes(size))
+            names.append(f'properties/2024/01/01/{name}')
+        return names
+
+    def run(self, requests, concurrency, file_wrapper):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), ProxyHandler)
+        server.daemon_threads = True
+        server.application = WSGIHandler()
+        server.file_wrapper = file_wrapper
+        server.worker_ms = []
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        local = threading.local()
+        port = server.server_address[1]
+
+        def fetch(request):
+            name, partial = request
+            if not hasattr(local, 'connection'):
+                local.connection = http.client.HTTPConnection('127.0.0.1', port)
+            headers = {'Range': f'bytes={RANGE_LENGTH}-{2 * RANGE_LENGTH - 1}'} if partial else {}
+            start = time.perf_counter()
+            local.connection.request('GET', f'/{settings.MEDIA_URL.strip("/")}/{name}', headers=headers)
+            response = local.connection.getresponse()
+            received = 0
+            while chunk := response.read(BUFFER_SIZE):
+                received += len(chunk)
+            ok = response.status == (206 if partial else 200) and received == int(response.headers['Content-Length'])
+            return (time.perf_counter() - start) * 1000, received, ok
+
+        try:
+            # Warm up the URL resolver and middleware
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                list(executor.map(fetch, requests[:concurrency]))
+            server.worker_ms.clear()
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                results = list(executor.map(fetch, requests))
+            elapsed = time.perf_counter() - start
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        received = sum(size for _, size, _ in results)
+        return {
+            **summarize([ms for ms, _, _ in results]),
+            'requests_per_second': len(results) / elapsed,
+            'mb_per_second': received / elapsed / (1024 * 1024),
+            'worker': summarize(server.worker_ms),
+            'errors': sum(not ok for _, _, ok in results),
+            'elapsed': elapsed,
+        }
+
@@ -0,0 +1,104 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.http import QueryDict
+from django.utils import timezone
+
+from properties import geo
+from properties.benchmarks import LISTING_SCENARIOS, measure, summarize
+from properties.filters import filter_properties
+from properties.models import Property
+from properties.pagination import KeysetPaginator
+
+PER_PAGE = 12
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed listings in a rolled-back transaction and print query plans and '
+        'p50/p99 latencies of the listing query for each filter combination'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listings', type=int, default=20000, help='Number of listings to seed')
+        parser.add_argument('--repeat', type=int, default=50, help='Timed runs per scenario')
+        parser.add_argument('--no-plans', action='store_true', help='Do not print EXPLAIN output')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self._seed(options['listings'])
+            self._run(options['repeat'], not options['no_plans'])
+            # Leave the database as it was
+            transaction.set_rollback(True)
+
+    def _seed(self, count):
+        rng = random.Random(42)
+        owner = User.objects.create(username='benchmark_queries_owner')
+        types = [value for value, _ in Property.PROPERTY_TYPE_CHOICES]
+        sale_types = [value for value, _ in Property.SALE_TYPE_CHOICES]
+        now = timezone.now()
+
+        batch = []
+        for i in range(count):
+            batch.append(Property(
+                owner=owner,
+                title_en=f'Listing {i}', title_ar=f'عقار {i}',
+                description_en='Benchmark listing ' * 20, description_ar='عقار للاختبار ' * 20,
+                location_en=f'District {i % 50}', location_ar=f'حي {i % 50}',
+                price=rng.randrange(5000, 10000000),
+                property_type=rng.choice(types),
+                sale_type=rng.choice(sale_types),
+                phone='+20 100 000 0000',
+                # Most rows are live, as in production
+                is_active=rng.random() < 0.9,
+                # Around Greater Cairo
+                latitude=rng.uniform(29.8, 30.3),
+                longitude=rng.uniform(30.8, 31.8),
+            ))
+            batch[-1].geo_cell = geo.geo_cell(batch[-1])
+            if len(batch) == 2000 or i == count - 1:
+                created = Property.objects.bulk_create(batch)
+                # auto_now_add overrides given values, spread the dates afterwards
+                for j, property_obj in enumerate(created):
+                    property_obj.created_at = now - timedelta(minutes=i - j)
+                Property.objects.bulk_update(created, ['created_at'])
+                batch = []
+
+        geo.rebuild_index(Property.objects.all())
+
+        if connection.vendor in ('sqlite', 'postgresql'):
+            # Give the planner statistics for the fresh rows
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        self.stdout.write(f'Seeded {count} listings ({connection.vendor})\n')
+
+    def _run(self, repeat, plans):
+        base = Property.objects.filter(is_active=True).order_by('-created_at')
+        rows = []
+        for name, query in LISTING_SCENARIOS:
+            queryset = filter_properties(base, QueryDict(query))
+            paginator = KeysetPaginator(queryset, PER_PAGE)
+            first = paginator.get_page()
+            # Second page exercises the keyset seek condition
+            second_cursor = first.next_cursor
+
+            if plans:
+                self.stdout.write(self.style.MIGRATE_HEADING(f'{name}: ?{query}'))
+                self.stdout.write(paginator.page_queryset(None).explain())
+                if second_cursor:
+                    self.stdout.write('-- next page')
+                    self.stdout.write(paginator.page_queryset(second_cursor).explain())
+                self.stdout.write('')
+
+            samples = measure(lambda: paginator.get_page(), repeat)
+            rows.append((name, 'first', summarize(samples)))
+            if second_cursor:
+                samples = measure(lambda: paginator.get_page(second_cursor), repeat)
+                rows.append((name, 'next', summarize(samples)))
+
+        self.stdout.write(f'{"Scenario":<20} {"Page":<6} {"p50 ms":>8} {"p99 ms":>8}')
+        for name, page, stats in rows:
+            self.stdout.write(f'{name:<20} {page:<6} {stats["p50"]:>8.2f} {stats["p99"]:>8.2f}')
@@ -0,0 +1,207 @@
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import closing, nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.utils import ConnectionHandler, OperationalError
+from django.utils import timezone
+
+from properties.benchmarks import summarize
+from properties.models import Property
+
+# mode -> ENGINE; the stock backend runs on a rollback journal with deferred BEGIN
+MODES = {
+    'stock': 'django.db.backends.sqlite3',
+    'tuned': 'estate_project.sqlite_backend',
+}
+LISTING_SQL = (
+    'SELECT id, title_en, price, location_en, cover_image FROM properties_property '
+    'WHERE is_active AND property_type = %s ORDER BY created_at DESC LIMIT 12'
+)
+DETAIL_SQL = 'SELECT * FROM properties_property WHERE id = %s'
+SESSION_SQL = (
+    'INSERT INTO django_session (session_key, session_data, expire_date) VALUES (%s, %s, %s) '
+    'ON CONFLICT(session_key) DO UPDATE SET session_data = excluded.session_data, expire_date = excluded.expire_date'
+)
+
+
+def _copy_database(source, target, journal_mode):
+    """Online copy of the database, so the benchmark never writes to it"""
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(target)
+    try:
+        src.backup(dst)
+        dst.execute(f'PRAGMA journal_mode = {journal_mode}')
+    finally:
+        src.close()
+        dst.close()
+
+
+def _reader(connection, rng, property_ids):
+    with connection.cursor() as cursor:
+        if rng.random() < 0.5:
+            cursor.execute(LISTING_SQL, [rng.choice(Property.PROPERTY_TYPE_CHOICES)[0]])
+        else:
+            cursor.execute(DETAIL_SQL, [rng.choice(property_ids)])
+        cursor.fetchall()
+
+
+def _writer(connection, rng, property_ids):
+    """
+    Alternates the two write shapes of the site: a transaction reading and
+    then updating rows (view count flush, form saves) and an autocommit
+    upsert (session save)
+    """
+    if rng.random() < 0.5:
+        # What atomic_write() does; the stock backend always begins deferred
+        with getattr(connection, 'begin_immediate', nullcontext)():
+            connection.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+        try:
+            with connection.cursor() as cursor:
+                pks = rng.sample(property_ids, min(3, len(property_ids)))
+                cursor.execute(
+                    f'SELECT id, views FROM properties_property WHERE id IN ({", ".join(["%s"] * len(pks))})', pks
+                )
+                for pk, views in cursor.fetchall():
+                    cursor.execute('UPDATE properties_property SET views = %s WHERE id = %s', [views + 1, pk])
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.set_autocommit(True)
+    else:
+        with connection.cursor() as cursor:
+            cursor.execute(SESSION_SQL, [
+                f'benchmark{rng.randrange(10000):05d}', 'e30:benchmark',
+                timezone.now() + timedelta(days=14),
+            ])
+
+
+def _worker(database, readers, writers, seconds, property_ids, seed, results):
+    """One server process: reader and writer threads on their own connections"""
+    handler = ConnectionHandler({'default': database})
+    deadline = time.perf_counter() + seconds
+    samples = []
+
+    def run(kind, operation, number):
+        rng = random.Random(f'{seed}-{kind}-{number}')
+        connection = handler['default']
+        latencies, errors = [], 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                operation(connection, rng, property_ids)
+            except OperationalError:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+        connection.close()
+        samples.append((kind, latencies, errors))
+
+    threads = [
+        threading.Thread(target=run, args=('read', _reader, number)) for number in range(readers)
+    ] + [
+        threading.Thread(target=run, args=('write', _writer, number)) for number in range(writers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put(samples)
+
+
+class Command(BaseCommand):
+    help = (
+        'Reader and writer throughput of several worker processes on a copy of the SQLite '
+        'database, stock backend (rollback journal) against the tuned one (WAL, pragmas, queued writers)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4, help='Worker processes')
+        parser.add_argument('--readers', type=int, default=4, help='Reader threads per process')
+        parser.add_argument('--writers', type=int, default=2, help='Writer threads per process')
+        parser.add_argument('--seconds', type=float, default=5, help='Duration of each mode')
+        parser.add_argument('--timeout', type=float, default=5, help='Lock timeout (OPTIONS timeout)')
+        parser.add_argument(
+            '--modes', default=','.join(MODES),
+            help=f'Comma separated modes to run: {", ".join(MODES)}'
+        )
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        modes = [mode for mode in options['modes'].split(',') if mode]
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f'Unknown modes: {", ".join(sorted(unknown))}')
+        source = settings.DATABASES['default']
+        if source['ENGINE'] not in MODES.values():
+            raise CommandError('The default database is not SQLite')
+        with closing(sqlite3.connect(source['NAME'])) as db:
+            property_ids = [pk for pk, in db.execute('SELECT id FROM properties_property LIMIT 100000')]
+        if not property_ids:
+            raise CommandError('No listings, run generate_synthetic_data first')
+
+        # Forked workers must not inherit open connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        results = {}
+        with tempfile.TemporaryDirectory(prefix='benchmark_sqlite_') as directory:
+            for mode in modes:
+                name = os.path.join(directory, f'{mode}.sqlite3')
+                _copy_database(source['NAME'], name, 'DELETE' if mode == 'stock' else 'WAL')
+                database = {'ENGINE': MODES[mode], 'NAME': name, 'OPTIONS': {'timeout': options['timeout']}}
+
+                queue = context.Queue()
+                processes = [
+                    context.Process(target=_worker, args=(
+                        database, options['readers'], options['writers'], options['seconds'],
+                        property_ids, f'{mode}-{number}', queue,
+                    ))
+                    for number in range(options['processes'])
+                ]
+                for process in processes:
+                    process.start()
+                samples = [sample for _ in processes for sample in queue.get()]
+                for process in processes:
+                    process.join()
+
+                results[mode] = {}
+                for kind in ('read', 'write'):
+                    latencies = [ms for sample_kind, values, _ in samples if sample_kind == kind for ms in values]
+                    results[mode][kind] = {
+                        **summarize(latencies),
+                        'per_second': len(latencies) / options['seconds'],
+                        'errors': sum(errors for sample_kind, _, errors in samples if sample_kind == kind),
+                    }
+                self.stdout.write(f'{mode}: done')
+
+        self.stdout.write(
+            f'\n{"Mode":<7} {"reads/s":>9} {"read p99":>9} {"writes/s":>9} {"write p99":>10} {"locked":>7}'
+        )
+        for mode, metrics in results.items():
+            read, write = metrics['read'], metrics['write']
+            self.stdout.write(
+                f'{mode:<7} {read["per_second"]:>9.0f} {read["p99"]:>9.2f} {write["per_second"]:>9.0f} '
+                f'{write["p99"]:>10.2f} {read["errors"] + write["errors"]:>7}'
+            )
+        self.stdout.write(
+            f'{options["processes"]} processes x ({options["readers"]} readers + {options["writers"]} writers); '
+            'latencies in ms; "locked" counts failed operations'
+        )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'options': {k: options[k] for k in (
+                    'processes', 'readers', 'writers', 'seconds', 'timeout'
+                )}, 'results': results}, f, indent=2)
+            self.stdout.write(f'Results written to {options["output"]}')
@@ -0,0 +1,82 @@
+import random
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.template import engines
+from django.template.backends.django import Template
+from django.test import RequestFactory
+from django.utils import timezone
+
+from estate_project.template_backends import language_conditionals, language_variant
+from properties import synthetic
+from properties.benchmarks import measure, summarize
+from properties.models import Property
+from properties.pagination import KeysetPage
+
+TEMPLATE = 'properties/index.html'
+PER_PAGE = 12
+
+
+def _page(language):
+    """Context of a full 12-card listing page, without touching the database"""
+    rng = random.Random('benchmark_templates')
+    now = timezone.now()
+    properties = []
+    for pk in range(1, PER_PAGE + 1):
+        property_obj = Property(pk=pk, **synthetic.random_property(rng, 1, now))
+        property_obj.cover_image = f'properties/synthetic/benchmark_{pk}.jpg'
+        property_obj.display_language = language
+        properties.append(property_obj)
+    page = KeysetPage(properties, next_cursor='next-cursor', previous_cursor='previous-cursor')
+    return {
+        'properties': page,
+        'page_obj': page,
+        'total_count': 4321,
+        'query_string': 'type=Apartment&sale_type=Rent',
+        'language': language,
+        'locations': [(location[1] if language == 'ar' else location[0], 100) for location in synthetic.LOCATIONS],
+        'property_types': [(value, label, 100) for value, label in Property.PROPERTY_TYPE_CHOICES],
+        'sale_types': [(value, label, 100) for value, label in Property.SALE_TYPE_CHOICES],
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Render time of a 12-card listing page per language, generic template '
+        'against its precompiled language variant'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=300, help='Timed renders per case')
+
+    def handle(self, *args, **options):
+        backend = engines.all()[0]
+        compiled = backend.engine.get_template(TEMPLATE)
+        request = RequestFactory().get('/', secure=True)
+        request.user = AnonymousUser()
+
+        cases = []
+        for language in ('en', 'ar'):
+            context = _page(language)
+            variant = language_variant(compiled, language)
+            for name, template in (('generic', compiled), ('specialized', variant)):
+                # Plain backend Template: no variant selection and no timing
+                cases.append((f'{language} {name}', Template(template, backend), context))
+
+        # Interleaved rounds so drift (CPU frequency, other load) hits every case alike
+        samples = {name: [] for name, _, _ in cases}
+        rounds = 10
+        for _ in range(rounds):
+            for name, template, context in cases:
+                samples[name] += measure(
+                    lambda: template.render(context, request), max(1, options['repeat'] // rounds)
+                )
+
+        self.stdout.write(f'{"Case":<22} {"p50":>8} {"p95":>8} {"mean":>8} {"if":>4}')
+        for name, template, _ in cases:
+            metrics = summarize(samples[name])
+            self.stdout.write(
+                f'{name:<22} {metrics["p50"]:>8.3f} {metrics["p95"]:>8.3f} '
+                f'{metrics["mean"]:>8.3f} {language_conditionals(template.template):>4}'
+            )
+        self.stdout.write('Times in ms; "if" counts the language conditionals left in the page template')
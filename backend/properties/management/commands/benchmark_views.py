@@ -0,0 +1,222 @@
+import io
+import json
+import os
+import platform
+import tempfile
+import tracemalloc
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.http import QueryDict
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import urlencode
+from PIL import Image
+
+from properties import facets, geo, search, synthetic
+from properties.benchmarks import LISTING_SCENARIOS, QueryCounter, compare, measure, summarize
+from properties.filters import filter_properties
+from properties.models import Property
+from properties.pagination import KeysetPaginator
+from users.models import UserProfile
+
+# Seed of the synthetic data, distinct from `generate_synthetic_data` runs
+SEED = 'benchmark'
+# Cursor depth of the deep page scenarios
+DEEP_PAGES = 20
+# Page size of property_list
+PER_PAGE = 12
+
+
+def _upload(index):
+    buffer = io.BytesIO()
+    Image.new('RGB', (1200, 900), (40 * index % 256, 120, 200)).save(buffer, 'JPEG', quality=85)
+    return SimpleUploadedFile(f'upload_{index}.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+
+def _rendition_pool(size):
+    """
+    Image entries with rendition names only: rendering just builds URLs,
+    so no files have to be generated for the seeded listings.
+    """
+    return [
+        (
+            f'properties/synthetic/{SEED}_{index}.jpg',
+            {alias: f'properties/synthetic/{SEED}_{index}.jpg.{alias}.jpg' for alias in ('small', 'medium', 'large')},
+            {
+                fmt: {alias: f'properties/synthetic/{SEED}_{index}.jpg.{alias}.{fmt}' for alias in ('small', 'medium', 'large')}
+                for fmt in ('avif', 'webp')
+            },
+        )
+        for index in range(size)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the property and profile views end to end on seeded datasets '
+        '(latency percentiles, query counts, allocated memory) and compare with a baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='1000,10000',
+            help='Comma separated dataset sizes (listings), each seeded in a rolled-back transaction'
+        )
+        parser.add_argument('--repeat', type=int, default=30, help='Timed requests per scenario')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--compare', help='Baseline JSON file, fail when a metric regresses')
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Allowed latency/memory growth against the baseline (0.2 = 20%%)'
+        )
+        parser.add_argument(
+            '--with-cache', action='store_true',
+            help='Keep the configured cache (by default a dummy cache measures full renders)'
+        )
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',') if size]
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)['results']
+
+        directory = tempfile.TemporaryDirectory(prefix='benchmark_views_')
+        overrides = {
+            'ALLOWED_HOSTS': ['testserver'],
+            # Uploads of the create scenario must not end up in the real media
+            'MEDIA_ROOT': os.path.join(directory.name, 'media'),
+            # Views of the rolled back listings must not reach `flush_view_counts`
+            'VIEW_COUNTER_SPOOL_DIR': os.path.join(directory.name, 'spool'),
+        }
+        if not options['with_cache']:
+            overrides['CACHES'] = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+        results = {}
+        with directory, override_settings(**overrides):
+            for size in sizes:
+                with transaction.atomic():
+                    self._seed(size)
+                    results.update(self._run(size, options['repeat']))
+                    # Leave the database as it was
+                    transaction.set_rollback(True)
+
+        self.stdout.write(f'\n{"Scenario":<38} {"p50":>8} {"p95":>8} {"p99":>8} {"queries":>8} {"KB":>8}')
+        for name, metrics in results.items():
+            self.stdout.write(
+                f'{name:<38} {metrics["p50"]:>8.2f} {metrics["p95"]:>8.2f} {metrics["p99"]:>8.2f} '
+                f'{metrics["queries"]:>8} {metrics["memory_kb"]:>8.0f}'
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({
+                    'meta': {
+                        'date': timezone.now().isoformat(),
+                        'python': platform.python_version(),
+                        'django': django.get_version(),
+                        'database': connection.vendor,
+                        'repeat': options['repeat'],
+                        'cache': options['with_cache'],
+                    },
+                    'results': results,
+                }, f, indent=2)
+            self.stdout.write(f'Results written to {options["output"]}')
+
+        if baseline is not None:
+            regressions = compare(baseline, results, options['threshold'])
+            if regressions:
+                raise CommandError('Performance regressions:\n  ' + '\n  '.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
+
+    def _seed(self, size):
+        password = make_password('benchmark')
+        synthetic.generate_users(SEED, 0, 200, password)
+        self.seller = User.objects.create(username='benchmark_views_seller', password=password)
+        UserProfile.objects.create(user=self.seller, user_type='seller')
+        owner_ids = list(
+            UserProfile.objects.filter(user_type='seller', user__username__startswith=f'synthetic_{SEED}_')
+            .values_list('user_id', flat=True)
+        )
+        pool = _rendition_pool(8)
+        now = timezone.now()
+        for first in range(0, size, 2000):
+            synthetic.generate_properties(SEED, first, min(2000, size - first), owner_ids, pool, 3, now)
+        search.rebuild_index(Property.objects.all())
+        geo.rebuild_index(Property.objects.all())
+        facets.rebuild()
+        self.stdout.write(f'Seeded {size} listings')
+
+    def _run(self, size, repeat):
+        anonymous = Client()
+        seller = Client()
+        seller.force_login(self.seller)
+        list_url = reverse('property_list')
+
+        requests = []
+        for name, query in [*LISTING_SCENARIOS, ('search', 'search=villa')]:
+            requests.append((f'list {name}', anonymous, 'get', f'{list_url}?{query}', None))
+
+        # Deep pages: walk the cursors the way the "Next" link does
+        for name, query in [('all', ''), ('type + sale type', 'type=Apartment&sale_type=Rent')]:
+            params = QueryDict(query)
+            paginator = KeysetPaginator(
+                filter_properties(Property.objects.filter(is_active=True).order_by('-created_at'), params),
+                PER_PAGE
+            )
+            page = paginator.get_page()
+            cursor = None
+            for _ in range(DEEP_PAGES - 1):
+                if not page.has_next():
+                    break
+                cursor = page.next_cursor
+                page = paginator.get_page(cursor)
+            # Small datasets may have a single page
+            query = {**params.dict(), 'cursor': cursor} if cursor else params.dict()
+            url = f'{list_url}?{urlencode(query)}'
+            requests.append((f'list {name} deep page', anonymous, 'get', url, None))
+
+        detail_pk = Property.objects.filter(is_active=True).order_by('-views').values_list('pk', flat=True).first()
+        requests.append(('detail', anonymous, 'get', reverse('property_detail', args=[detail_pk]), None))
+        requests.append(('profile', seller, 'get', reverse('profile'), None))
+        requests.append(('create with 3 images', seller, 'post', reverse('property_create'), self._create_data))
+
+        results = {}
+        for name, client, method, url, data in requests:
+            def request():
+                payload = data() if data else None
+                response = getattr(client, method)(url, payload, secure=True)
+                if response.status_code not in (200, 302):
+                    raise CommandError(f'{name}: HTTP {response.status_code}')
+
+            samples = measure(request, repeat)
+            queries = QueryCounter()
+            with connection.execute_wrapper(queries):
+                request()
+            tracemalloc.start()
+            request()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            results[f'{size}/{name}'] = {**summarize(samples), 'queries': queries.count, 'memory_kb': peak / 1024}
+        return results
+
+    def _create_data(self):
+        data = {
+            'title_en': 'Benchmark Villa', 'title_ar': 'فيلا للاختبار',
+            'description_en': 'Benchmark listing', 'description_ar': 'عقار للاختبار',
+            'location_en': 'New Cairo', 'location_ar': 'القاهرة الجديدة',
+            'price': '2500000', 'property_type': 'Villa', 'sale_type': 'Sale', 'phone': '+20 100 000 0000',
+            'images-TOTAL_FORMS': '3', 'images-INITIAL_FORMS': '0',
+            'images-MIN_NUM_FORMS': '0', 'images-MAX_NUM_FORMS': '1000',
+        }
+        for index in range(3):
+            data[f'images-{index}-image'] = _upload(index)
+            data[f'images-{index}-order'] = str(index)
+        return data
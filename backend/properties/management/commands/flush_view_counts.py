@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+from properties import counters
+
+
+class Command(BaseCommand):
+    help = 'Apply buffered property view counts to the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Keep running and flush every N seconds (default: flush once and exit)'
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            files, views = counters.flush()
+            if files or not interval:
+                self.stdout.write(f'Applied {views} views from {files} spool files')
+            if not interval:
+                break
+            time.sleep(interval)
@@ -0,0 +1,97 @@
+import datetime
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from properties import caching, facets, geo, search, synthetic
+from users.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate deterministic synthetic users, profiles, listings and images '
+        'offline for load and benchmark testing'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Number of users to create')
+        parser.add_argument('--properties', type=int, default=10000, help='Number of listings to create')
+        parser.add_argument('--max-images', type=int, default=3, help='Maximum images per listing')
+        parser.add_argument('--image-pool', type=int, default=24, help='Distinct placeholder images to draw')
+        parser.add_argument('--seed', type=int, default=1, help='Seed, the same seed gives the same data')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per chunk/transaction')
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='Worker processes inserting listing chunks (useful on PostgreSQL, SQLite serializes writers)'
+        )
+        parser.add_argument(
+            '--end-date', type=datetime.date.fromisoformat, default=synthetic.DEFAULT_END_DATE,
+            help=f'Listings are dated over the two years before this day (YYYY-MM-DD, default {synthetic.DEFAULT_END_DATE})'
+        )
+        parser.add_argument('--skip-index', action='store_true', help='Do not rebuild the search index')
+
+    def handle(self, *args, **options):
+        seed = options['seed']
+        batch_size = options['batch_size']
+        start = time.monotonic()
+
+        self.stdout.write(f'Creating {options["users"]} users...')
+        password = make_password(f'synthetic-{seed}')
+        for first in range(0, options['users'], batch_size):
+            synthetic.generate_users(seed, first, min(batch_size, options['users'] - first), password)
+        owner_ids = list(
+            UserProfile.objects.filter(user_type='seller', user__username__startswith=f'synthetic_{seed}_')
+            .order_by('user_id').values_list('user_id', flat=True)
+        )
+        if options['properties'] and not owner_ids:
+            raise CommandError('No synthetic sellers to own the listings, increase --users')
+
+        pool = []
+        if options['max_images']:
+            self.stdout.write(f'Drawing {options["image_pool"]} placeholder images and their renditions...')
+            pool = synthetic.placeholder_pool(seed, options['image_pool'])
+
+        now = timezone.make_aware(datetime.datetime.combine(options['end_date'], datetime.time()))
+        chunks = [
+            (seed, first, min(batch_size, options['properties'] - first), owner_ids, pool, options['max_images'], now)
+            for first in range(0, options['properties'], batch_size)
+        ]
+        self.stdout.write(f'Creating {options["properties"]} listings in {len(chunks)} chunks...')
+        done = 0
+        listing_start = time.monotonic()
+        if options['processes'] > 1:
+            # Children open their own connections
+            connections.close_all()
+            with ProcessPoolExecutor(
+                options['processes'], mp_context=multiprocessing.get_context('spawn'), initializer=django.setup
+            ) as executor:
+                futures = [executor.submit(synthetic.generate_properties_in_worker, *args) for args in chunks]
+                for future in as_completed(futures):
+                    done += future.result()
+                    self._progress(done, listing_start)
+        else:
+            for args in chunks:
+                done += synthetic.generate_properties(*args)
+                self._progress(done, listing_start)
+
+        # Bulk inserts bypass the signals that maintain these
+        if not options['skip_index']:
+            self.stdout.write('Rebuilding the search index...')
+            search.rebuild_index(synthetic.Property.objects.all())
+        geo.rebuild_index(synthetic.Property.objects.all())
+        facets.rebuild()
+        caching.bump_catalog_version()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {options["users"]} users and {done} listings in {time.monotonic() - start:.1f}s'
+        ))
+
+    def _progress(self, done, start):
+        elapsed = time.monotonic() - start
+        self.stdout.write(f'  {done} listings, {done / max(elapsed, 1e-9):.0f} rows/s')
@@ -0,0 +1,54 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from properties.models import PropertyImage
+from properties import thumbnails
+
+
+def _process(image_id):
+    try:
+        return thumbnails.process_image(image_id)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = 'Generate THUMBNAIL_ALIASES renditions for existing property images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.THUMBNAIL_PIPELINE_WORKERS,
+            help='Number of images processed in parallel'
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Regenerate renditions even if they are already up to date'
+        )
+
+    def handle(self, *args, **options):
+        queryset = PropertyImage.objects.only('id', 'image', 'renditions', 'modern_renditions').order_by('id')
+        image_ids = [
+            image.pk for image in queryset.iterator()
+            if options['force'] or not thumbnails.is_current(image)
+        ]
+        self.stdout.write(f'Generating renditions for {len(image_ids)} images...')
+
+        start = time.monotonic()
+        done = failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            futures = {executor.submit(_process, pk): pk for pk in image_ids}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                    done += 1
+                except Exception as e:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f'[WARN] Image {futures[future]}: {e}'))
+
+        elapsed = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated renditions for {done} images in {elapsed:.1f}s ({failed} failed)'
+        ))
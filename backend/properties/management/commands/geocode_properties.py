@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from properties import caching, geo
+from properties.models import Property
+
+
+class Command(BaseCommand):
+    help = 'Backfill property coordinates from a local gazetteer of place names'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--gazetteer', default=geo.GAZETTEER_PATH,
+            help='CSV with name_en,name_ar,latitude,longitude columns'
+        )
+        parser.add_argument('--force', action='store_true', help='Also re-geocode properties that have coordinates')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per update transaction')
+
+    def handle(self, *args, **options):
+        gazetteer = geo.load_gazetteer(options['gazetteer'])
+        queryset = Property.objects.only('pk', 'location_en', 'location_ar', 'latitude', 'longitude', 'geo_cell')
+        if not options['force']:
+            queryset = queryset.filter(latitude__isnull=True)
+
+        located = missed = 0
+        unknown = {}
+        batch = []
+        for property_obj in queryset.order_by('pk').iterator(chunk_size=options['batch_size']):
+            point = geo.geocode(property_obj.location_en, gazetteer) or geo.geocode(property_obj.location_ar, gazetteer)
+            if point is None:
+                missed += 1
+                unknown[property_obj.location_en] = unknown.get(property_obj.location_en, 0) + 1
+                continue
+            property_obj.latitude, property_obj.longitude = point
+            property_obj.geo_cell = geo.geo_cell(property_obj)
+            batch.append(property_obj)
+            if len(batch) >= options['batch_size']:
+                located += self._save(batch)
+                batch = []
+        located += self._save(batch)
+
+        if located:
+            caching.bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f'Located {located} properties, {missed} not found in the gazetteer'))
+        for location, count in sorted(unknown.items(), key=lambda item: -item[1])[:20]:
+            self.stdout.write(f'  {count:>6}  {location}')
+
+    def _save(self, batch):
+        if not batch:
+            return 0
+        # Bulk updates bypass the signals that maintain the spatial index
+        with transaction.atomic():
+            Property.objects.bulk_update(batch, ['latitude', 'longitude', 'geo_cell'])
+            geo.index_properties(batch)
+        return len(batch)
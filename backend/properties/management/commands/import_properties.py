@@ -0,0 +1,112 @@
+import json
+import os
+import time
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from properties import caching, facets
+from properties.importer import ImageFetcher, read_rows, upsert_batch, validate_row
+
+
+def write_checkpoint(path, rows):
+    with open(path, 'w') as f:
+        json.dump({'rows': rows}, f)
+
+
+class Command(BaseCommand):
+    help = (
+        'Import or update listings from a partner feed (CSV or JSON lines), '
+        'keyed on external_id. Interrupted imports continue with --resume'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Feed file (.csv or .jsonl)')
+        parser.add_argument('--owner', required=True, help='Username that owns the imported listings')
+        parser.add_argument('--source', help='Feed name used with external_id as the upsert key (default: file name)')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Feed format (default: from the extension)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per transaction')
+        parser.add_argument('--image-workers', type=int, default=8, help='Concurrent image downloads/copies')
+        parser.add_argument('--images-dir', help='Base directory for relative image paths')
+        parser.add_argument('--resume', action='store_true', help='Skip the rows committed by a previous run')
+        parser.add_argument('--checkpoint', help='Checkpoint file (default: <path>.checkpoint)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'{path} does not exist')
+        try:
+            owner = User.objects.get(username=options['owner'])
+        except User.DoesNotExist:
+            raise CommandError(f'User {options["owner"]} does not exist')
+        source = options['source'] or os.path.splitext(os.path.basename(path))[0]
+        checkpoint_path = options['checkpoint'] or f'{path}.checkpoint'
+
+        skip = 0
+        if options['resume'] and os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as f:
+                skip = json.load(f)['rows']
+            self.stdout.write(f'Resuming after row {skip}')
+
+        rows = read_rows(path, options['format'])
+        if skip:
+            rows = islice(rows, skip, None)
+
+        fetcher = ImageFetcher(
+            options['image_workers'], options['images_dir'],
+            on_error=lambda location, e: self.stdout.write(self.style.WARNING(f'[WARN] Image {location}: {e}'))
+        )
+        start = time.monotonic()
+        done = checkpoint = skip
+        created = updated = invalid = 0
+        try:
+            while True:
+                chunk = list(islice(rows, options['batch_size']))
+                if not chunk:
+                    break
+                valid = []
+                for number, row in chunk:
+                    try:
+                        valid.append(validate_row(row))
+                    except ValueError as e:
+                        invalid += 1
+                        self.stdout.write(self.style.WARNING(f'[WARN] Row {number}: {e}'))
+                if valid:
+                    batch_created, batch_updated, jobs = upsert_batch(valid, source, owner)
+                    created += batch_created
+                    updated += batch_updated
+                else:
+                    jobs = []
+                done += len(chunk)
+                fetcher.submit(jobs, done)
+
+                # A rerun with --resume starts after the last batch that is
+                # committed with all its images (later batches are upserted again)
+                if fetcher.checkpoint != checkpoint:
+                    checkpoint = fetcher.checkpoint
+                    write_checkpoint(checkpoint_path, checkpoint)
+
+                elapsed = time.monotonic() - start
+                self.stdout.write(
+                    f'{done} rows ({created} created, {updated} updated, {invalid} invalid), '
+                    f'{(done - skip) / elapsed:.0f} rows/s'
+                )
+        finally:
+            fetcher.close()
+            if fetcher.checkpoint is not None:
+                write_checkpoint(checkpoint_path, fetcher.checkpoint)
+            # Bulk writes bypass the signals that maintain these
+            facets.rebuild()
+            caching.bump_catalog_version()
+
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        elapsed = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {done - skip} rows in {elapsed:.1f}s ({(done - skip) / max(elapsed, 1e-9):.0f} rows/s): '
+            f'{created} created, {updated} updated, {invalid} invalid, '
+            f'{fetcher.stored} images stored ({fetcher.failed} failed)'
+        ))
+        if fetcher.stored:
+            self.stdout.write('Run `generate_thumbnails` to create renditions for the new images')
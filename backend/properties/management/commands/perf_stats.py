@@ -0,0 +1,41 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from estate_project import perf
+
+
+class Command(BaseCommand):
+    help = 'Dump the rolling per-URL request histograms collected by PerformanceMiddleware'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help='Print the raw histograms as JSON')
+
+    def handle(self, *args, **options):
+        stats = perf.snapshot()
+        if options['json']:
+            self.stdout.write(json.dumps(stats, indent=2, default=str))
+            return
+        if not stats:
+            self.stdout.write(self.style.WARNING(
+                'No samples yet (PERF_SAMPLE_RATE is %s; a per-process cache only sees this process)'
+                % settings.PERF_SAMPLE_RATE
+            ))
+            return
+
+        self.stdout.write(
+            f'Last {settings.PERF_WINDOW_SECONDS * settings.PERF_WINDOWS // 60} minutes, '
+            f'sample rate {settings.PERF_SAMPLE_RATE}; times in ms, percentiles are bucket bounds\n'
+        )
+        self.stdout.write(
+            f'{"URL name":<28} {"samples":>8} {"total p50":>10} {"p95":>7} {"p99":>7} '
+            f'{"db mean":>8} {"queries":>8} {"tpl mean":>9} {"session":>8}'
+        )
+        for name, entry in sorted(stats.items(), key=lambda item: -item[1]['total']['mean']):
+            total = entry['total']
+            self.stdout.write(
+                f'{name:<28} {entry["count"]:>8} {total["p50"]!s:>10} {total["p95"]!s:>7} {total["p99"]!s:>7} '
+                f'{entry["db"]["mean"]:>8.1f} {entry["queries"]["mean"]:>8.1f} '
+                f'{entry["tpl"]["mean"]:>9.1f} {entry["session"]["mean"]:>8.1f}'
+            )
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from properties import facets
+
+
+class Command(BaseCommand):
+    help = 'Recompute the location/type facet counts used by the listing filters'
+
+    def handle(self, *args, **options):
+        total = facets.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {total} facet rows'))
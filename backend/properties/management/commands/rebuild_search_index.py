@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from properties.models import Property
+from properties import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for all properties'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if not search.fts_available():
+            self.stdout.write(self.style.WARNING(
+                'Full-text index is not available on this database, search uses icontains filters.'
+            ))
+            return
+
+        total = search.rebuild_index(Property.objects.all(), batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} properties'))
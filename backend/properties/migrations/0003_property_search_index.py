@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:12
+
+from django.db import migrations
+
+from properties import search
+
+
+def create_search_index(apps, schema_editor):
+    if not search.create_index(schema_editor):
+        return
+    Property = apps.get_model('properties', 'Property')
+    rows = [
+        (
+            p.pk,
+            search.normalize(f'{p.title_en} {p.title_ar}'),
+            search.normalize(f'{p.location_en} {p.location_ar}'),
+            search.normalize(f'{p.description_en} {p.description_ar}'),
+        )
+        for p in Property.objects.using(schema_editor.connection.alias).iterator()
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {search.FTS_TABLE} (rowid, title, location, description) VALUES (%s, %s, %s, %s)',
+            rows
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {search.FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0002_property_views'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
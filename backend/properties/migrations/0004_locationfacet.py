@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:07
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_facets(apps, schema_editor):
+    Property = apps.get_model('properties', 'Property')
+    LocationFacet = apps.get_model('properties', 'LocationFacet')
+    db_alias = schema_editor.connection.alias
+    rows = (
+        Property.objects.using(db_alias).filter(is_active=True)
+        .values('location_en', 'location_ar', 'property_type', 'sale_type')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    LocationFacet.objects.using(db_alias).bulk_create(
+        [LocationFacet(count=row.pop('total'), **row) for row in rows]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0003_property_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location_en', models.CharField(max_length=200)),
+                ('location_ar', models.CharField(max_length=200)),
+                ('property_type', models.CharField(choices=[('Apartment', 'Apartment'), ('Villa', 'Villa'), ('Land', 'Land'), ('Office', 'Office')], max_length=20)),
+                ('sale_type', models.CharField(choices=[('Sale', 'For Sale'), ('Rent', 'For Rent')], max_length=10)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Location Facet',
+                'verbose_name_plural': 'Location Facets',
+                'constraints': [models.UniqueConstraint(fields=('location_en', 'location_ar', 'property_type', 'sale_type'), name='unique_location_facet')],
+            },
+        ),
+        migrations.RunPython(populate_facets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0004_locationfacet'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ViewCountBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('applied_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'View Count Batch',
+                'verbose_name_plural': 'View Count Batches',
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:09
+
+from django.db import migrations, models
+
+
+def populate_cover_images(apps, schema_editor):
+    Property = apps.get_model('properties', 'Property')
+    PropertyImage = apps.get_model('properties', 'PropertyImage')
+    db_alias = schema_editor.connection.alias
+    covers = {}
+    for property_id, image in (
+        PropertyImage.objects.using(db_alias)
+        .order_by('property_id', 'order', '-created_at')
+        .values_list('property_id', 'image')
+    ):
+        covers.setdefault(property_id, image)
+    for property_id, image in covers.items():
+        Property.objects.using(db_alias).filter(pk=property_id).update(cover_image=image)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0005_viewcountbatch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='cover_image',
+            field=models.ImageField(blank=True, editable=False, upload_to='properties/%Y/%m/%d/'),
+        ),
+        migrations.RunPython(populate_cover_images, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0007_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='cover_modern_renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='propertyimage',
+            name='modern_renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
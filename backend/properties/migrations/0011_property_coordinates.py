@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:25
+
+import django.core.validators
+from django.conf import settings
+from django.db import migrations, models
+
+from properties import geo
+
+
+def create_spatial_index(apps, schema_editor):
+    # Empty until coordinates are added (see `geocode_properties`)
+    geo.create_index(schema_editor)
+
+
+def drop_spatial_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {geo.RTREE_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0010_property_external_id'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create_spatial_index, drop_spatial_index),
+        migrations.AddField(
+            model_name='property',
+            name='geo_cell',
+            field=models.CharField(blank=True, editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-90), django.core.validators.MaxValueValidator(90)]),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-180), django.core.validators.MaxValueValidator(180)]),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['geo_cell'], name='property_active_geo_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0011_property_coordinates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedProperty',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('property_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Deleted Property',
+                'verbose_name_plural': 'Deleted Properties',
+            },
+        ),
+    ]
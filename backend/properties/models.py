@@ -1,6 +1,25 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.core.validators import MinValueValidator
+from django.core.validators import MaxValueValidator, MinValueValidator
+
+class PropertyQuerySet(models.QuerySet):
+    # Columns a listing card reads, besides the per-language title/location
+    CARD_FIELDS = (
+        'id', 'owner_id', 'price', 'property_type', 'sale_type', 'views',
+        'cover_image', 'cover_renditions', 'cover_modern_renditions', 'created_at',
+    )
+
+    def for_listing(self, language='en'):
+        """
+        Load only the card columns for one language. The descriptions and
+        the other language's text are deferred, and ``display_language``
+        makes get_title()/get_location() default to the loaded language.
+        """
+        suffix = 'ar' if language == 'ar' else 'en'
+        return self.only(
+            *self.CARD_FIELDS, f'title_{suffix}', f'location_{suffix}'
+        ).annotate(display_language=models.Value(suffix, output_field=models.CharField()))
+
 
 class Property(models.Model):
     """
@@ -35,6 +54,22 @@ class Property(models.Model):
     sale_type = models.CharField(max_length=10, choices=SALE_TYPE_CHOICES)
     phone = models.CharField(max_length=20)
     
+    # Coordinates; geo_cell is their geohash, maintained from the signals
+    # (see geo.py) for bounding box lookups
+    latitude = models.FloatField(null=True, blank=True, validators=[MinValueValidator(-90), MaxValueValidator(90)])
+    longitude = models.FloatField(null=True, blank=True, validators=[MinValueValidator(-180), MaxValueValidator(180)])
+    geo_cell = models.CharField(max_length=12, blank=True, editable=False)
+    
+    # First image by order, maintained from the PropertyImage signals so
+    # listings can show it without querying the images table
+    cover_image = models.ImageField(upload_to='properties/%Y/%m/%d/', blank=True, editable=False)
+    cover_renditions = models.JSONField(default=dict, blank=True, editable=False)
+    cover_modern_renditions = models.JSONField(default=dict, blank=True, editable=False)
+    
+    # Feed identity of imported listings (see `import_properties`)
+    source = models.CharField(max_length=50, blank=True, editable=False)
+    external_id = models.CharField(max_length=100, blank=True, editable=False)
+    
     # Statistics
     views = models.PositiveIntegerField(default=0, help_text='Number of times this property was viewed')
     
@@ -43,6 +78,7 @@ class Property(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PropertyQuerySet.as_manager()
     
     def __str__(self):
         return f"{self.title_en} - {self.property_type}"
@@ -51,18 +87,73 @@ class Property(models.Model):
         verbose_name = 'Property'
         verbose_name_plural = 'Properties'
         ordering = ['-created_at']
+        # The listing only reads active rows ordered by (-created_at, -id),
+        # so the filter indexes are partial on is_active and end with the
+        # keyset pagination keys. Backends without partial indexes skip them.
+        indexes = [
+            models.Index(
+                fields=['created_at', 'id'],
+                condition=models.Q(is_active=True),
+                name='property_active_recent_idx',
+            ),
+            models.Index(
+                fields=['property_type', 'sale_type', 'created_at', 'id'],
+                condition=models.Q(is_active=True),
+                name='property_active_type_idx',
+            ),
+            models.Index(
+                fields=['sale_type', 'created_at', 'id'],
+                condition=models.Q(is_active=True),
+                name='property_active_sale_idx',
+            ),
+            models.Index(
+                fields=['location_en', 'created_at', 'id'],
+                condition=models.Q(is_active=True),
+                name='property_active_loc_en_idx',
+            ),
+            models.Index(
+                fields=['location_ar', 'created_at', 'id'],
+                condition=models.Q(is_active=True),
+                name='property_active_loc_ar_idx',
+            ),
+            models.Index(
+                fields=['price'],
+                condition=models.Q(is_active=True),
+                name='property_active_price_idx',
+            ),
+            models.Index(
+                fields=['geo_cell'],
+                condition=models.Q(is_active=True),
+                name='property_active_geo_idx',
+            ),
+            # Profile page counts an owner's active listings
+            models.Index(fields=['owner', 'is_active'], name='property_owner_active_idx'),
+        ]
+        constraints = [
+            # Imports upsert on the partner's id, listings from the form have none
+            models.UniqueConstraint(
+                fields=['source', 'external_id'],
+                condition=~models.Q(external_id=''),
+                name='unique_property_external_id',
+            ),
+        ]
     
-    def get_title(self, language='en'):
+    def _language(self, language):
+        # Templates call these without arguments, fall back to the language
+        # the object was loaded/rendered for
+        return language or getattr(self, 'display_language', 'en')
+    
+    def get_title(self, language=None):
         """Get title in specified language"""
-        return self.title_ar if language == 'ar' else self.title_en
+        return self.title_ar if self._language(language) == 'ar' else self.title_en
     
-    def get_description(self, language='en'):
+    def get_description(self, language=None):
         """Get description in specified language"""
-        return self.description_ar if language == 'ar' else self.description_en
+        return self.description_ar if self._language(language) == 'ar' else self.description_en
     
-    def get_location(self, language='en'):
+    def get_location(self, language=None):
         """Get location in specified language"""
-        return self.location_ar if language == 'ar' else self.location_en
+        return self.location_ar if self._language(language) == 'ar' else self.location_en
 
 
 class PropertyImage(models.Model):
@@ -72,6 +163,10 @@ class PropertyImage(models.Model):
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='properties/%Y/%m/%d/')
     order = models.PositiveIntegerField(default=0)
+    # Pre-generated THUMBNAIL_ALIASES renditions as {alias: file name}
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
+    # The same renditions in WebP/AVIF as {format: {alias: file name}}
+    modern_renditions = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
@@ -81,3 +176,69 @@ class PropertyImage(models.Model):
         verbose_name = 'Property Image'
         verbose_name_plural = 'Property Images'
         ordering = ['order', '-created_at']
+        indexes = [
+            # Gallery prefetch and cover lookup: images of a property by ordering
+            models.Index(fields=['property', 'order', '-created_at'], name='property_image_order_idx'),
+        ]
+
+
+class LocationFacet(models.Model):
+    """
+    Materialized count of active properties per location, type and sale type.
+    Maintained incrementally from the Property signals (see facets.py) and
+    used to build the filter sidebar without scanning the properties table.
+    """
+    location_en = models.CharField(max_length=200)
+    location_ar = models.CharField(max_length=200)
+    property_type = models.CharField(max_length=20, choices=Property.PROPERTY_TYPE_CHOICES)
+    sale_type = models.CharField(max_length=10, choices=Property.SALE_TYPE_CHOICES)
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.location_en} / {self.property_type} / {self.sale_type}: {self.count}"
+
+    class Meta:
+        verbose_name = 'Location Facet'
+        verbose_name_plural = 'Location Facets'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['location_en', 'location_ar', 'property_type', 'sale_type'],
+                name='unique_location_facet',
+            ),
+        ]
+
+
+class ViewCountBatch(models.Model):
+    """
+    Ledger of view counter spool files already applied to Property.views.
+    Written in the same transaction as the counter update so a flush that
+    crashes half way is never applied twice (see counters.py).
+    """
+    name = models.CharField(max_length=255, unique=True)
+    views = models.PositiveIntegerField(default=0)
+    applied_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.views} views)"
+
+    class Meta:
+        verbose_name = 'View Count Batch'
+        verbose_name_plural = 'View Count Batches'
+
+
+class DeletedProperty(models.Model):
+    """
+    Tombstones of deleted properties, written by the post_delete signal.
+    Processes holding an in-memory copy of the catalog (the autocomplete
+    index) read the recent ones to drop deleted rows without rescanning
+    the properties table (see autocomplete.py).
+    """
+    property_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Property {self.property_id} deleted at {self.deleted_at}"
+
+    class Meta:
+        verbose_name = 'Deleted Property'
+        verbose_name_plural = 'Deleted Properties'
@@ -0,0 +1,155 @@
+"""
+Keyset (cursor) pagination for the property listing.
+
+Unlike ``django.core.paginator.Paginator`` this never runs ``COUNT(*)`` or
+``OFFSET``: each page is fetched with a ``WHERE`` on the ordering keys of
+the last/first row seen, so deep pages cost the same as the first one.
+Cursors are signed, opaque tokens.
+"""
+import datetime
+from decimal import Decimal
+
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+CURSOR_SALT = 'properties.pagination.cursor'
+
+
+class KeysetPage:
+    """A page of results with opaque next/previous cursors"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset on its ordering keys.
+
+    The queryset ordering is used as the key (``-created_at`` for the
+    listing, ``search_rank`` first for searches) with the primary key
+    appended as a tie-breaker so the key is unique.
+    """
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = per_page
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        if not {'pk', '-pk', 'id', '-id'} & set(ordering):
+            # Tie-breaker follows the direction of the first key
+            ordering.append('-id' if ordering and ordering[0].startswith('-') else 'id')
+        self.keys = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+
+    def get_page(self, cursor=None):
+        """Return the page for a cursor, invalid cursors give the first page"""
+        position = self._decode(cursor) if cursor else None
+        rows = list(self._page_queryset(position))
+        if position is None:
+            return self._page(rows, None, forward=True)
+        values, direction = position
+        return self._page(rows, values, direction == 'next')
+
+    async def aget_page(self, cursor=None):
+        """Async get_page, for the ASGI views"""
+        position = self._decode(cursor) if cursor else None
+        rows = [row async for row in self._page_queryset(position)]
+        if position is None:
+            return self._page(rows, None, forward=True)
+        values, direction = position
+        return self._page(rows, values, direction == 'next')
+
+    def page_queryset(self, cursor=None):
+        """The unevaluated query fetching a page (e.g. for EXPLAIN)"""
+        return self._page_queryset(self._decode(cursor) if cursor else None)
+
+    def _page_queryset(self, position):
+        if position is None:
+            return self._ordered(self.queryset, reverse=False)
+        values, direction = position
+        forward = direction == 'next'
+        return self._ordered(self.queryset.filter(self._seek(values, forward)), reverse=not forward)
+
+    def _ordered(self, queryset, reverse):
+        ordering = [
+            ('-' if descending != reverse else '') + name
+            for name, descending in self.keys
+        ]
+        return queryset.order_by(*ordering)[:self.per_page + 1]
+
+    def _page(self, rows, values, forward):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or not forward:
+                next_cursor = self._encode(rows[-1], 'next')
+            if values is not None and (has_more or forward):
+                previous_cursor = self._encode(rows[0], 'prev')
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+    def _seek(self, values, forward):
+        """
+        Lexicographic comparison on the keys, e.g. for (-created_at, -id):
+        created_at < v0 OR (created_at = v0 AND id < v1)
+        """
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self.keys, values):
+            lookup = 'lt' if descending == forward else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def _encode(self, obj, direction):
+        values = []
+        for name, _ in self.keys:
+            value = getattr(obj, name)
+            if isinstance(value, (datetime.date, datetime.datetime)):
+                value = value.isoformat()
+            elif isinstance(value, Decimal):
+                value = str(value)
+            values.append(value)
+        return signing.dumps({'k': values, 'd': direction}, salt=CURSOR_SALT, compress=True)
+
+    def _decode(self, cursor):
+        try:
+            data = signing.loads(cursor, salt=CURSOR_SALT)
+            values, direction = data['k'], data['d']
+        except (signing.BadSignature, KeyError, TypeError):
+            return None
+        if direction not in ('next', 'prev') or len(values) != len(self.keys):
+            return None
+
+        opts = self.queryset.model._meta
+        decoded = []
+        for (name, _), value in zip(self.keys, values):
+            try:
+                value = opts.get_field(name).to_python(value)
+            except FieldDoesNotExist:
+                # Annotations such as search_rank are stored as-is
+                pass
+            except ValidationError:
+                return None
+            decoded.append(value)
+        return decoded, direction
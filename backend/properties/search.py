@@ -0,0 +1,186 @@
+"""
+Full-text search index for properties.
+
+On SQLite the index is an FTS5 virtual table keyed by the property id and
+kept in sync from the Property signals. Other backends (or SQLite builds
+without FTS5) fall back to the old icontains filters.
+"""
+import re
+
+from django.db import connection, DatabaseError, DEFAULT_DB_ALIAS
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'properties_property_fts'
+
+# Column weights for bm25(): title, location, description
+RANK_WEIGHTS = (10.0, 5.0, 1.0)
+
+ARABIC_DIACRITICS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+ARABIC_FOLDING = str.maketrans({
+    'أ': 'ا',
+    'إ': 'ا',
+    'آ': 'ا',
+    'ٱ': 'ا',
+    'ى': 'ي',
+    'ة': 'ه',
+    'ؤ': 'و',
+    'ئ': 'ي',
+})
+TOKEN_RE = re.compile(r'\w+')
+
+_fts_available = None
+
+
+def normalize(text):
+    """
+    Normalize text for indexing and querying: strip Arabic diacritics and
+    tatweel, fold alef/yaa/taa-marbuta variants and lowercase.
+    """
+    if not text:
+        return ''
+    text = ARABIC_DIACRITICS.sub('', text)
+    return text.translate(ARABIC_FOLDING).lower()
+
+
+def tokenize(text):
+    """Split normalized text into search tokens"""
+    return TOKEN_RE.findall(normalize(text))
+
+
+def fts_available():
+    """Check (once per process) whether the FTS5 index table exists"""
+    global _fts_available
+    if _fts_available is None:
+        if connection.vendor != 'sqlite':
+            _fts_available = False
+        else:
+            _fts_available = FTS_TABLE in connection.introspection.table_names()
+    return _fts_available
+
+
+def create_index(schema_editor):
+    """Create the FTS5 table, returns False if FTS5 is not compiled in"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return False
+    try:
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"title, location, description, tokenize='unicode61 remove_diacritics 2')"
+        )
+    except DatabaseError:
+        return False
+    return True
+
+
+def _document(property_obj):
+    return (
+        property_obj.pk,
+        normalize(f'{property_obj.title_en} {property_obj.title_ar}'),
+        normalize(f'{property_obj.location_en} {property_obj.location_ar}'),
+        normalize(f'{property_obj.description_en} {property_obj.description_ar}'),
+    )
+
+
+def index_properties(properties):
+    """
+    Add or replace index entries for the given properties.
+    Used by the save signal and by bulk loaders that bypass signals.
+    """
+    if not fts_available():
+        return
+    documents = [_document(p) for p in properties]
+    if not documents:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+            [(doc[0],) for doc in documents]
+        )
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, location, description) VALUES (%s, %s, %s, %s)',
+            documents
+        )
+
+
+def remove_properties(pks):
+    """Drop index entries for deleted properties"""
+    if not fts_available() or not pks:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk in pks])
+
+
+def rebuild_index(queryset, batch_size=2000):
+    """Rebuild the whole index from the given Property queryset"""
+    if not fts_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+    total = 0
+    batch = []
+    # The index lives on the primary, so does its source
+    queryset = queryset.using(DEFAULT_DB_ALIAS)
+    fields = ('pk', 'title_en', 'title_ar', 'location_en', 'location_ar', 'description_en', 'description_ar')
+    for property_obj in queryset.only(*fields).iterator(chunk_size=batch_size):
+        batch.append(property_obj)
+        if len(batch) >= batch_size:
+            index_properties(batch)
+            total += len(batch)
+            batch = []
+    index_properties(batch)
+    return total + len(batch)
+
+
+def _match_expression(search=None, location=None):
+    """Build an FTS5 MATCH expression of quoted prefix terms"""
+    terms = [f'"{token}"*' for token in tokenize(search)]
+    terms += [f'location : "{token}"*' for token in tokenize(location)]
+    return ' '.join(terms)
+
+
+def apply_search(queryset, search=None, location=None):
+    """
+    Filter a Property queryset by free-text search and location.
+
+    With the FTS index the queryset is joined to the index rows matching
+    the query (the MATCH runs once, not per property) and, when a
+    free-text search is given, annotated with ``search_rank`` (bm25,
+    lower is better) and ordered by it; the existing ordering is kept as
+    a tie-breaker.
+    """
+    if not (search or location):
+        return queryset
+
+    if not fts_available():
+        if location:
+            queryset = queryset.filter(
+                Q(location_en__icontains=location) | Q(location_ar__icontains=location)
+            )
+        if search:
+            queryset = queryset.filter(
+                Q(title_en__icontains=search) |
+                Q(title_ar__icontains=search) |
+                Q(description_en__icontains=search) |
+                Q(description_ar__icontains=search)
+            )
+        return queryset
+
+    expression = _match_expression(search, location)
+    if not expression:
+        # Only punctuation was given, nothing can match
+        return queryset.none()
+
+    table = queryset.model._meta.db_table
+    # FTS5 drives the join: matching rows first, then the properties by primary key
+    queryset = queryset.extra(
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE}.rowid = "{table}"."id"', f'{FTS_TABLE} MATCH %s'],
+        params=[expression],
+    )
+    if search:
+        weights = ', '.join(str(w) for w in RANK_WEIGHTS)
+        queryset = queryset.annotate(
+            search_rank=RawSQL(f'bm25({FTS_TABLE}, {weights})', ())
+        ).order_by('search_rank', *queryset.query.order_by)
+    return queryset
@@ -0,0 +1,86 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Property, PropertyImage
+from . import autocomplete, caching, facets, geo, images, search, snapshots, thumbnails
+
+# Fields that feed the full-text index
+SEARCH_FIELDS = {'title_en', 'title_ar', 'description_en', 'description_ar', 'location_en', 'location_ar'}
+
+# Fields that feed the autocomplete index
+AUTOCOMPLETE_FIELDS = {'is_active', 'title_en', 'title_ar', 'location_en', 'location_ar'}
+
+# Fields that feed the geohash and the spatial index
+GEO_FIELDS = {'latitude', 'longitude'}
+
+# Fields that move a property between facet rows
+FACET_FIELDS = {'is_active', *facets.FACET_FIELDS}
+
+
+def _touches(update_fields, fields):
+    return update_fields is None or bool(fields & set(update_fields))
+
+
+@receiver(pre_save, sender=Property)
+def property_pre_save(sender, instance, update_fields=None, **kwargs):
+    """Remember the stored facet key so post_save can move the counts"""
+    if instance.pk and _touches(update_fields, FACET_FIELDS):
+        instance._previous_facet_key = facets.stored_facet_key(instance.pk)
+
+
+@receiver(post_save, sender=Property)
+def property_saved(sender, instance, created, update_fields=None, **kwargs):
+    """Keep the search/spatial indexes and facet counts in sync with the saved property"""
+    if _touches(update_fields, SEARCH_FIELDS):
+        search.index_properties([instance])
+
+    if _touches(update_fields, GEO_FIELDS):
+        cell = geo.geo_cell(instance)
+        if cell != instance.geo_cell:
+            instance.geo_cell = cell
+            Property.objects.filter(pk=instance.pk).update(geo_cell=cell)
+        geo.index_properties([instance])
+
+    if _touches(update_fields, AUTOCOMPLETE_FIELDS):
+        # In-process index: only updated once the row is committed
+        transaction.on_commit(lambda: autocomplete.update_properties([instance]))
+
+    if created:
+        facets.adjust(facets.facet_key(instance), 1)
+    elif _touches(update_fields, FACET_FIELDS):
+        facets.move(getattr(instance, '_previous_facet_key', None), facets.facet_key(instance))
+
+    snapshots.invalidate([instance.pk])
+    caching.bump_catalog_version()
+
+
+@receiver(post_delete, sender=Property)
+def property_deleted(sender, instance, **kwargs):
+    """Remove the deleted property from the indexes and facet counts"""
+    search.remove_properties([instance.pk])
+    geo.remove_properties([instance.pk])
+    pk = instance.pk
+    autocomplete.record_deletions([pk])
+    transaction.on_commit(lambda: autocomplete.remove_properties([pk]))
+    facets.adjust(facets.facet_key(instance), -1)
+    snapshots.invalidate([pk])
+    caching.bump_catalog_version()
+
+
+@receiver(post_save, sender=PropertyImage)
+def property_image_saved(sender, instance, **kwargs):
+    """Schedule thumbnails for new files and keep the cover image in sync"""
+    if instance.image and not thumbnails.is_current(instance):
+        if instance.renditions or instance.modern_renditions:
+            # Renditions of the replaced file must not be served
+            instance.renditions = instance.modern_renditions = {}
+            PropertyImage.objects.filter(pk=instance.pk).update(renditions={}, modern_renditions={})
+        thumbnails.schedule([instance.pk])
+    images.refresh_cover([instance.property_id])
+
+
+@receiver(post_delete, sender=PropertyImage)
+def property_image_deleted(sender, instance, **kwargs):
+    """Keep the property's cover image in sync with its first image"""
+    images.refresh_cover([instance.property_id])
@@ -0,0 +1,129 @@
+"""
+Cache-aside snapshots of a property and its gallery for the detail page.
+
+A snapshot is the raw column values of the property and of its images
+(in gallery order), rebuilt into model instances with the images already
+prefetched. Snapshots live in the shared cache next to a version per
+property; the version is moved (after the commit) by every write the
+detail page can show, and a snapshot is only used while its version is
+current. Both keys are read in one round trip.
+
+In front of the shared cache, each process keeps an LRU of recent
+snapshots that is trusted for PROPERTY_SNAPSHOT_LOCAL_SECONDS, so hot
+listings are served without touching the cache or the database. Writes
+in this process drop their entries at once; writes elsewhere are seen
+when the local entry expires.
+"""
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .models import Property, PropertyImage
+
+PROPERTY_FIELDS = tuple(field.attname for field in Property._meta.concrete_fields)
+# Model.from_db maps a full row by position, so both follow the field order
+IMAGE_FIELDS = tuple(field.attname for field in PropertyImage._meta.concrete_fields)
+# Snapshots of another field layout (before a deploy) are never read back
+SCHEMA = zlib.crc32(','.join(PROPERTY_FIELDS + IMAGE_FIELDS).encode())
+
+VERSION_KEY = 'property:version:{}'
+SNAPSHOT_KEY = f'property:snapshot:{SCHEMA}:{{}}'
+
+_lock = threading.Lock()
+_local = OrderedDict()
+
+
+def _local_get(pk):
+    with _lock:
+        entry = _local.get(pk)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del _local[pk]
+            return None
+        _local.move_to_end(pk)
+        return entry[1]
+
+
+def _local_set(pk, snapshot):
+    with _lock:
+        _local[pk] = (time.monotonic() + settings.PROPERTY_SNAPSHOT_LOCAL_SECONDS, snapshot)
+        _local.move_to_end(pk)
+        while len(_local) > settings.PROPERTY_SNAPSHOT_LOCAL_SIZE:
+            _local.popitem(last=False)
+
+
+def _load(pk):
+    """(property values, image rows) from the primary, None if there is no such property"""
+    # A lagging replica must not be cached under the new version
+    values = Property.objects.using(DEFAULT_DB_ALIAS).filter(pk=pk).values_list(*PROPERTY_FIELDS).first()
+    if values is None:
+        return None
+    images = tuple(PropertyImage.objects.using(DEFAULT_DB_ALIAS).filter(property_id=pk).values_list(*IMAGE_FIELDS))
+    return values, images
+
+
+def _build(snapshot):
+    """Fresh instances for one request: the property with its images prefetched"""
+    values, image_rows = snapshot
+    property_obj = Property.from_db(DEFAULT_DB_ALIAS, PROPERTY_FIELDS, values)
+    images = []
+    for row in image_rows:
+        image = PropertyImage.from_db(DEFAULT_DB_ALIAS, IMAGE_FIELDS, row)
+        PropertyImage.property.field.set_cached_value(image, property_obj)
+        images.append(image)
+    # What prefetch_related('images') leaves on the instance
+    queryset = property_obj.images.all()
+    queryset._result_cache = images
+    queryset._prefetch_done = True
+    property_obj._prefetched_objects_cache = {'images': queryset}
+    return property_obj
+
+
+def get_property(pk):
+    """The property with its gallery prefetched, None if it does not exist"""
+    snapshot = _local_get(pk)
+    if snapshot is None:
+        version_key, snapshot_key = VERSION_KEY.format(pk), SNAPSHOT_KEY.format(pk)
+        cached = cache.get_many([version_key, snapshot_key])
+        version = cached.get(version_key)
+        if version is None:
+            version = time.time_ns()
+            if not cache.add(version_key, version, settings.PROPERTY_SNAPSHOT_TIMEOUT):
+                version = cache.get(version_key, version)
+        entry = cached.get(snapshot_key)
+        if entry is not None and entry[0] == version:
+            snapshot = entry[1]
+        else:
+            snapshot = _load(pk)
+            if snapshot is None:
+                return None
+            cache.set(snapshot_key, (version, snapshot), settings.PROPERTY_SNAPSHOT_TIMEOUT)
+        _local_set(pk, snapshot)
+    return _build(snapshot)
+
+
+def local_property(pk):
+    """get_property from the local LRU only (no I/O), None on a miss"""
+    snapshot = _local_get(pk)
+    return None if snapshot is None else _build(snapshot)
+
+
+def invalidate(pks):
+    """Move the versions of the given properties once the transaction commits"""
+    pks = list(pks)
+
+    def bump():
+        version = time.time_ns()
+        cache.set_many({VERSION_KEY.format(pk): version for pk in pks}, settings.PROPERTY_SNAPSHOT_TIMEOUT)
+        with _lock:
+            for pk in pks:
+                _local.pop(pk, None)
+
+    if pks:
+        transaction.on_commit(bump)
@@ -0,0 +1,274 @@
+"""
+Deterministic synthetic listings for load and benchmark testing.
+
+Everything is derived from a seed and the end date: each row uses its own
+``random.Random(f'{seed}:{kind}:{number}')``, so the output depends neither
+on the chunk size nor on how many processes generate the chunks. Images
+come from a small pool of locally drawn placeholders whose renditions are
+generated once and shared by every PropertyImage that uses them.
+"""
+import datetime
+import io
+import math
+import random
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image, ImageDraw
+
+from users.models import UserProfile
+
+from . import geo
+from .models import Property, PropertyImage
+
+# (English, Arabic, weight) - weighted towards Greater Cairo like the real feed
+LOCATIONS = [
+    ('New Cairo', 'القاهرة الجديدة', 12),
+    ('5th Settlement, New Cairo', 'التجمع الخامس، القاهرة الجديدة', 8),
+    ('Zamalek, Cairo', 'الزمالك، القاهرة', 4),
+    ('Maadi, Cairo', 'المعادي، القاهرة', 7),
+    ('Heliopolis, Cairo', 'مصر الجديدة، القاهرة', 7),
+    ('Nasr City, Cairo', 'مدينة نصر، القاهرة', 8),
+    ('Downtown Cairo', 'وسط القاهرة', 4),
+    ('Dokki, Giza', 'الدقي، الجيزة', 4),
+    ('Mohandessin, Giza', 'المهندسين، الجيزة', 4),
+    ('Sheikh Zayed City', 'مدينة الشيخ زايد', 6),
+    ('6th October City', 'مدينة 6 أكتوبر', 7),
+    ('Smart Village, Giza', 'القرية الذكية، الجيزة', 1),
+    ('New Administrative Capital', 'العاصمة الإدارية الجديدة', 5),
+    ('Alexandria', 'الإسكندرية', 8),
+    ('North Coast', 'الساحل الشمالي', 4),
+    ('Hurghada', 'الغردقة', 3),
+    ('Sharm El Sheikh', 'شرم الشيخ', 2),
+    ('Fayoum', 'الفيوم', 1),
+    ('Mansoura', 'المنصورة', 2),
+    ('Tanta', 'طنطا', 1),
+]
+
+# property_type: (English noun, Arabic noun, weight)
+TYPES = {
+    'Apartment': ('Apartment', 'شقة', 60),
+    'Villa': ('Villa', 'فيلا', 15),
+    'Land': ('Land', 'أرض', 10),
+    'Office': ('Office', 'مكتب', 15),
+}
+
+# Median price and log-normal spread per (property_type, sale_type)
+PRICES = {
+    ('Apartment', 'Sale'): (3500000, 0.6),
+    ('Apartment', 'Rent'): (18000, 0.5),
+    ('Villa', 'Sale'): (9000000, 0.6),
+    ('Villa', 'Rent'): (60000, 0.5),
+    ('Land', 'Sale'): (4000000, 0.9),
+    ('Land', 'Rent'): (25000, 0.7),
+    ('Office', 'Sale'): (5000000, 0.7),
+    ('Office', 'Rent'): (35000, 0.6),
+}
+
+# (English, Arabic) pairs so both languages describe the same listing
+ADJECTIVES = [
+    ('Luxury', 'فاخرة'), ('Modern', 'حديثة'), ('Spacious', 'واسعة'), ('Cozy', 'مريحة'),
+    ('Renovated', 'مجددة'), ('Furnished', 'مفروشة'), ('Bright', 'مشمسة'), ('Quiet', 'هادئة'),
+]
+FEATURES = [
+    ('Close to schools and shopping centers.', 'بالقرب من المدارس ومراكز التسوق.'),
+    ('Walking distance to the metro.', 'على بعد خطوات من المترو.'),
+    ('Private parking and 24/7 security.', 'موقف خاص وأمن على مدار الساعة.'),
+    ('Open view over a landscaped garden.', 'إطلالة مفتوحة على حديقة منسقة.'),
+    ('Fully finished with modern fittings.', 'تشطيب كامل بتجهيزات حديثة.'),
+    ('Gated community with pool and gym.', 'مجمع مغلق مع حمام سباحة وصالة رياضية.'),
+    ('High-speed internet ready.', 'مجهز بإنترنت عالي السرعة.'),
+    ('Flexible payment plans available.', 'أنظمة سداد مرنة متاحة.'),
+    ('Ready to move in.', 'جاهز للسكن فوراً.'),
+    ('Excellent investment opportunity.', 'فرصة استثمارية ممتازة.'),
+]
+
+PLACEHOLDER_SIZE = (800, 600)
+# Listings are scattered this many degrees (~2km) around their place
+COORDINATE_JITTER = 0.02
+
+# Listings are dated over the two years before this day unless told otherwise
+DEFAULT_END_DATE = datetime.date(2026, 1, 1)
+
+_gazetteer = None
+
+
+def row_rng(seed, kind, number):
+    return random.Random(f'{seed}:{kind}:{number}')
+
+
+@contextmanager
+def generated_created_at():
+    """Let bulk_create store the generated created_at instead of auto_now_add"""
+    field = Property._meta.get_field('created_at')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def _weighted(rng, items, weights):
+    return rng.choices(items, weights=weights)[0]
+
+
+def gazetteer():
+    global _gazetteer
+    if _gazetteer is None:
+        _gazetteer = geo.load_gazetteer()
+    return _gazetteer
+
+
+def random_property(rng, owner_id, now):
+    """Field values of one synthetic listing"""
+    location_en, location_ar, _ = _weighted(rng, LOCATIONS, [l[2] for l in LOCATIONS])
+    property_type = _weighted(rng, list(TYPES), [t[2] for t in TYPES.values()])
+    type_en, type_ar, _ = TYPES[property_type]
+    # Land and villas are mostly sold, apartments and offices often rented
+    sale_type = 'Sale' if rng.random() < (0.85 if property_type in ('Land', 'Villa') else 0.55) else 'Rent'
+    adjective_en, adjective_ar = rng.choice(ADJECTIVES)
+
+    median, sigma = PRICES[property_type, sale_type]
+    step = 500 if sale_type == 'Rent' else 10000
+    price = max(step, round(rng.lognormvariate(math.log(median), sigma) / step) * step)
+
+    features = rng.sample(FEATURES, rng.randint(2, 4))
+    values = {
+        'owner_id': owner_id,
+        'title_en': f'{adjective_en} {type_en} in {location_en}',
+        'title_ar': f'{type_ar} {adjective_ar} في {location_ar}',
+        'description_en': ' '.join(en for en, _ in features),
+        'description_ar': ' '.join(ar for _, ar in features),
+        'location_en': location_en,
+        'location_ar': location_ar,
+        'price': price,
+        'property_type': property_type,
+        'sale_type': sale_type,
+        'phone': f'+20 1{rng.randint(0, 2)}{rng.randint(0, 9)} {rng.randint(100, 999)} {rng.randint(1000, 9999)}',
+        # Long-tailed popularity
+        'views': int(rng.paretovariate(1.5) * 10) - 10,
+        'is_active': rng.random() < 0.92,
+        'created_at': now - datetime.timedelta(seconds=rng.randrange(2 * 365 * 86400)),
+    }
+    point = geo.geocode(location_en, gazetteer())
+    if point:
+        values['latitude'] = point[0] + rng.uniform(-COORDINATE_JITTER, COORDINATE_JITTER)
+        values['longitude'] = point[1] + rng.uniform(-COORDINATE_JITTER, COORDINATE_JITTER)
+        values['geo_cell'] = geo.encode_geohash(values['latitude'], values['longitude'])
+    return values
+
+
+def generate_users(seed, start, count, password, seller_ratio=0.3):
+    """
+    Insert users ``start .. start + count`` with their profiles. All share
+    one pre-hashed password so no hashing happens per row.
+    """
+    users = [
+        User(
+            username=f'synthetic_{seed}_{number}',
+            email=f'synthetic_{seed}_{number}@example.com',
+            password=password,
+        )
+        for number in range(start, start + count)
+    ]
+    with transaction.atomic():
+        User.objects.bulk_create(users)
+        if users and users[0].pk is None:
+            # Backends without RETURNING: reload, in the order of the numbers
+            by_name = {user.username: user for user in User.objects.filter(username__in=[u.username for u in users])}
+            users = [by_name[user.username] for user in users]
+        profiles = []
+        for number, user in enumerate(users, start):
+            rng = row_rng(seed, 'user', number)
+            profiles.append(UserProfile(
+                user_id=user.pk,
+                user_type='seller' if rng.random() < seller_ratio else 'buyer',
+                phone=f'+20 1{rng.randint(0, 2)}{rng.randint(0, 9)} {rng.randint(100, 999)} {rng.randint(1000, 9999)}',
+            ))
+        UserProfile.objects.bulk_create(profiles)
+
+
+def placeholder_image(seed, index):
+    """Draw a JPEG placeholder: sky gradient, a house outline and a label"""
+    rng = row_rng(seed, 'image', index)
+    width, height = PLACEHOLDER_SIZE
+    image = Image.linear_gradient('L').resize(PLACEHOLDER_SIZE).convert('RGB')
+    tint = tuple(rng.randrange(120, 256) for _ in range(3))
+    image = Image.merge('RGB', [
+        band.point(lambda v, k=k: int(255 - (255 - v) * k / 255))
+        for band, k in zip(image.split(), tint)
+    ])
+    draw = ImageDraw.Draw(image)
+    ground = int(height * rng.uniform(0.65, 0.8))
+    draw.rectangle([0, ground, width, height], fill=(90, rng.randrange(110, 160), 70))
+    left = rng.randrange(80, width // 2)
+    right = left + rng.randrange(220, 380)
+    top = ground - rng.randrange(150, 260)
+    draw.rectangle([left, top, right, ground], fill=tuple(rng.randrange(150, 240) for _ in range(3)))
+    draw.polygon([(left - 20, top), (right + 20, top), ((left + right) // 2, top - 90)], fill=(150, 60, 50))
+    draw.text((20, 20), f'EstateHub placeholder #{index}', fill=(40, 40, 40))
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=85)
+    return buffer.getvalue()
+
+
+def placeholder_pool(seed, size):
+    """
+    Store ``size`` placeholder images (once) and generate their renditions.
+    Returns [(name, renditions, modern_renditions)].
+    """
+    from . import thumbnails
+
+    pool = []
+    for index in range(size):
+        name = f'properties/synthetic/{seed}_{index}.jpg'
+        if not default_storage.exists(name):
+            name = default_storage.save(name, ContentFile(placeholder_image(seed, index)))
+        image_file = PropertyImage(image=name).image
+        renditions = thumbnails.generate_renditions(image_file)
+        pool.append((name, renditions, thumbnails.generate_modern_renditions(image_file, renditions)))
+    return pool
+
+
+def generate_properties(seed, start, count, owner_ids, pool, max_images, now):
+    """
+    Insert listings ``start .. start + count`` with their images and cover
+    fields, returns the number of listings inserted.
+    """
+    properties = []
+    galleries = []
+    for number in range(start, start + count):
+        rng = row_rng(seed, 'property', number)
+        values = random_property(rng, rng.choice(owner_ids), now)
+        gallery = rng.sample(pool, min(len(pool), rng.randint(0, max_images))) if pool else []
+        if gallery:
+            name, renditions, modern_renditions = gallery[0]
+            values.update(
+                cover_image=name, cover_renditions=renditions, cover_modern_renditions=modern_renditions
+            )
+        properties.append(Property(**values))
+        galleries.append(gallery)
+
+    with transaction.atomic():
+        with generated_created_at():
+            Property.objects.bulk_create(properties)
+        PropertyImage.objects.bulk_create([
+            PropertyImage(
+                property_id=property_obj.pk, image=name, order=order,
+                renditions=renditions, modern_renditions=modern_renditions
+            )
+            for property_obj, gallery in zip(properties, galleries)
+            for order, (name, renditions, modern_renditions) in enumerate(gallery)
+        ], batch_size=1000)
+    return count
+
+
+def generate_properties_in_worker(*args):
+    """generate_properties for process pool workers"""
+    try:
+        return generate_properties(*args)
+    finally:
+        connections.close_all()
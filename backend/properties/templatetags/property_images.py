@@ -0,0 +1,80 @@
+import mimetypes
+
+from django import template
+from django.conf import settings
+from django.utils.html import format_html, format_html_join
+from easy_thumbnails.storage import thumbnail_default_storage
+
+from properties.encoders import FORMATS
+
+register = template.Library()
+
+
+def _alias_widths():
+    return {
+        alias: options['size'][0]
+        for alias, options in settings.THUMBNAIL_ALIASES.get('', {}).items()
+    }
+
+
+@register.filter
+def rendition_url(renditions, alias):
+    """URL of one pre-generated rendition, empty if it is not ready yet"""
+    name = (renditions or {}).get(alias)
+    return thumbnail_default_storage.url(name) if name else ''
+
+
+@register.filter
+def srcset(renditions):
+    """``srcset`` value listing every pre-generated rendition by width"""
+    if not renditions:
+        return ''
+    widths = _alias_widths()
+    candidates = sorted(
+        (widths[alias], thumbnail_default_storage.url(name))
+        for alias, name in renditions.items()
+        if alias in widths
+    )
+    return ', '.join(f'{url} {width}w' for width, url in candidates)
+
+
+@register.simple_tag
+def picture(renditions, modern_renditions, alias, sizes, alt='', css_class='', fallback=''):
+    """
+    ``<picture>`` with AVIF/WebP sources ahead of the default srcset; the
+    browser picks the first type it supports. Falls back to a plain
+    ``<img>`` of the original while renditions are being generated.
+    """
+    if not renditions:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="lazy">', fallback, alt, css_class
+        )
+
+    modern_renditions = modern_renditions or {}
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (mime, srcset(modern_renditions[fmt]), sizes)
+            for fmt, (_, mime, _) in FORMATS.items()
+            if modern_renditions.get(fmt)
+        )
+    )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="lazy"></picture>',
+        sources, rendition_url(renditions, alias), srcset(renditions), sizes, alt, css_class
+    )
+
+
+@register.simple_tag
+def image_set(renditions, modern_renditions, alias='large'):
+    """CSS ``image-set()`` offering AVIF/WebP before the default rendition"""
+    modern_renditions = modern_renditions or {}
+    candidates = [
+        (rendition_url(modern_renditions[fmt], alias), mime)
+        for fmt, (_, mime, _) in FORMATS.items()
+        if (modern_renditions.get(fmt) or {}).get(alias)
+    ]
+    default = (renditions or {}).get(alias)
+    if default:
+        candidates.append((rendition_url(renditions, alias), mimetypes.guess_type(default)[0] or 'image/jpeg'))
+    return ', '.join(f'url("{url}") type("{mime}")' for url, mime in candidates)
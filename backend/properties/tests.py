@@ -1,3 +1,1505 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import datetime
+from datetime import timedelta
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from PIL import Image
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.contrib.sessions.models import Session
+from django.core import signing
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.db.utils import ConnectionHandler, OperationalError
+from django.http import Http404, HttpResponse
+from django.template import engines
+from django.template.backends.django import Template
+from django.test import AsyncRequestFactory, Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from estate_project import media, perf, routers, staticfiles
+from estate_project.middleware import ReplicaPinMiddleware
+from estate_project.sqlite_backend.base import atomic_write
+from estate_project.template_backends import language_conditionals, language_variant
+
+from . import autocomplete, caching, counters, encoders, facets, geo, images, search, snapshots, synthetic, thumbnails, views
+from .filters import filter_properties
+from .importer import ImageFetcher, upsert_batch, validate_row
+from .models import DeletedProperty, Property, PropertyImage
+from .pagination import KeysetPaginator
+from .templatetags.property_images import image_set, rendition_url, srcset
+
+
+def create_property(owner, **kwargs):
+    data = {
+        'title_en': 'Luxury Villa',
+        'title_ar': 'فيلا فاخرة',
+        'description_en': 'A beautiful villa',
+        'description_ar': 'فيلا جميلة',
+        'location_en': 'New Cairo',
+        'location_ar': 'القاهرة الجديدة',
+        'price': 8500000,
+        'property_type': 'Villa',
+        'sale_type': 'Sale',
+        'phone': '+20 100 123 4567',
+    }
+    data.update(kwargs)
+    return Property.objects.create(owner=owner, **data)
+
+
+class CoverImageTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('seller', password='demo1234')
+        self.property = create_property(self.owner)
+
+    def test_cover_follows_first_image(self):
+        second = PropertyImage.objects.create(property=self.property, image='properties/b.jpg', order=1)
+        self.property.refresh_from_db()
+        self.assertEqual(self.property.cover_image.name, 'properties/b.jpg')
+
+        first = PropertyImage.objects.create(property=self.property, image='properties/a.jpg', order=0)
+        self.property.refresh_from_db()
+        self.assertEqual(self.property.cover_image.name, 'properties/a.jpg')
+
+        first.order = 2
+        first.save()
+        self.property.refresh_from_db()
+        self.assertEqual(self.property.cover_image.name, 'properties/b.jpg')
+
+        second.delete()
+        first.delete()
+        self.property.refresh_from_db()
+        self.assertEqual(self.property.cover_image.name, '')
+
+
+class ThumbnailTests(TestCase):
+    # Rendition sizes of the 1000x600 upload
+    sizes = (('small', (150, 150)), ('medium', (400, 400)), ('large', (800, 600)))
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=directory.name, MEDIA_URL='/media/')
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        # Encode in a thread instead of spawning worker processes
+        pool = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(pool.shutdown)
+        patcher = mock.patch.object(thumbnails, 'get_process_pool', return_value=pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.owner = User.objects.create_user('seller', password='demo1234')
+        self.property = create_property(self.owner)
+        self.image = PropertyImage.objects.create(
+            property=self.property, image=self.upload('house.jpg'), order=0
+        )
+
+    def upload(self, name, size=(1000, 600)):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, (200, 120, 40)).save(buffer, 'JPEG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+    def open_rendition(self, name):
+        return Image.open(os.path.join(settings.MEDIA_ROOT, name))
+
+    def render_picture(self, image):
+        return engines.all()[0].from_string(
+            "{% load property_images %}"
+            "{% picture image.renditions image.modern_renditions 'medium' '50vw' alt='Villa' %}"
+        ).render({'image': image})
+
+    def test_process_image_generates_every_alias(self):
+        with mock.patch.object(encoders, 'available_formats', return_value=[]):
+            renditions = thumbnails.process_image(self.image.pk)
+        self.image.refresh_from_db()
+        self.property.refresh_from_db()
+
+        self.assertEqual(self.image.renditions, renditions)
+        self.assertEqual(self.property.cover_renditions, renditions)
+        for alias, size in self.sizes:
+            self.assertTrue(renditions[alias].startswith(self.image.image.name))
+            with self.open_rendition(renditions[alias]) as rendition:
+                self.assertEqual((rendition.format, rendition.size), ('JPEG', size))
+
+    def test_modern_renditions_match_the_default_sizes(self):
+        with mock.patch.object(encoders, 'available_formats', return_value=['avif', 'webp']):
+            renditions = thumbnails.process_image(self.image.pk)
+        self.image.refresh_from_db()
+
+        self.assertEqual(set(self.image.modern_renditions), {'avif', 'webp'})
+        # The source is smaller than 'large', which is cropped rather than upscaled
+        for alias, size in self.sizes:
+            for fmt, pil_format in (('avif', 'AVIF'), ('webp', 'WEBP')):
+                name = self.image.modern_renditions[fmt][alias]
+                self.assertEqual(name, f'{os.path.splitext(renditions[alias])[0]}.{fmt}')
+                with self.open_rendition(name) as rendition:
+                    self.assertEqual((rendition.format, rendition.size), (pil_format, size))
+
+    def test_picture_markup_lists_modern_sources_first(self):
+        with mock.patch.object(encoders, 'available_formats', return_value=['avif', 'webp']):
+            thumbnails.process_image(self.image.pk)
+        self.image.refresh_from_db()
+
+        def srcset(names):
+            return f"/media/{names['small']} 150w, /media/{names['medium']} 400w, /media/{names['large']} 800w"
+
+        modern = self.image.modern_renditions
+        self.assertHTMLEqual(
+            self.render_picture(self.image),
+            '<picture>'
+            f'<source type="image/avif" srcset="{srcset(modern["avif"])}" sizes="50vw">'
+            f'<source type="image/webp" srcset="{srcset(modern["webp"])}" sizes="50vw">'
+            f'<img src="/media/{self.image.renditions["medium"]}" srcset="{srcset(self.image.renditions)}"'
+            ' sizes="50vw" alt="Villa" class="" loading="lazy">'
+            '</picture>'
+        )
+
+    def test_picture_falls_back_to_the_original_until_renditions_exist(self):
+        html = engines.all()[0].from_string(
+            "{% load property_images %}"
+            "{% picture image.renditions image.modern_renditions 'small' '150px' alt='Villa' fallback=image.image.url %}"
+        ).render({'image': self.image})
+        self.assertHTMLEqual(
+            html, f'<img src="/media/{self.image.image.name}" alt="Villa" class="" loading="lazy">'
+        )
+
+    def test_is_current_detects_stale_renditions(self):
+        with mock.patch.object(encoders, 'available_formats', return_value=['webp']):
+            self.assertFalse(thumbnails.is_current(self.image))
+            thumbnails.process_image(self.image.pk)
+            self.image.refresh_from_db()
+            self.assertTrue(thumbnails.is_current(self.image))
+
+            # Renditions generated before WebP/AVIF support was installed
+            self.image.modern_renditions = {}
+            self.assertFalse(thumbnails.is_current(self.image))
+
+            # A replaced file keeps the old renditions until it is processed
+            self.image.refresh_from_db()
+            self.image.image = self.upload('garden.jpg')
+            self.image.save()
+            self.assertFalse(thumbnails.is_current(self.image))
+
+    def test_renditions_without_modern_encoders(self):
+        with mock.patch.object(encoders.features, 'check', return_value=False):
+            self.assertEqual(encoders.available_formats(), [])
+            renditions = thumbnails.process_image(self.image.pk)
+            self.image.refresh_from_db()
+            self.assertTrue(thumbnails.is_current(self.image))
+
+        self.assertEqual(set(renditions), {'small', 'medium', 'large'})
+        self.assertEqual(self.image.modern_renditions, {})
+        html = self.render_picture(self.image)
+        self.assertNotIn('<source', html)
+        self.assertIn(f'src="/media/{renditions["medium"]}"', html)
+
+    def test_webp_only_when_avif_is_unavailable(self):
+        with mock.patch.object(encoders.features, 'check', side_effect=lambda name: name == 'webp'):
+            self.assertEqual(encoders.available_formats(), ['webp'])
+            thumbnails.process_image(self.image.pk)
+        self.image.refresh_from_db()
+
+        self.assertEqual(set(self.image.modern_renditions), {'webp'})
+        html = self.render_picture(self.image)
+        self.assertNotIn('image/avif', html)
+        self.assertEqual(html.count('<source'), 1)
+        self.assertIn('<source type="image/webp"', html)
+
+
+class PropertyImageTagTests(TestCase):
+    renditions = {
+        'large': 'properties/a.jpg.800x800.jpg',
+        'small': 'properties/a.jpg.150x150.jpg',
+        'medium': 'properties/a.jpg.400x400.jpg',
+    }
+
+    def test_srcset_is_ordered_by_width(self):
+        self.assertEqual(
+            srcset(self.renditions),
+            '/media/properties/a.jpg.150x150.jpg 150w, /media/properties/a.jpg.400x400.jpg 400w, '
+            '/media/properties/a.jpg.800x800.jpg 800w'
+        )
+        self.assertEqual(srcset({}), '')
+        self.assertEqual(srcset({'unknown': 'properties/a.jpg.1x1.jpg'}), '')
+
+    def test_rendition_url(self):
+        self.assertEqual(rendition_url(self.renditions, 'large'), '/media/properties/a.jpg.800x800.jpg')
+        self.assertEqual(rendition_url(self.renditions, 'huge'), '')
+        self.assertEqual(rendition_url(None, 'large'), '')
+
+    def test_image_set_offers_modern_formats_first(self):
+        modern = {'webp': {'large': 'properties/a.jpg.800x800.webp'}}
+        self.assertEqual(
+            image_set(self.renditions, modern),
+            'url("/media/properties/a.jpg.800x800.webp") type("image/webp"), '
+            'url("/media/properties/a.jpg.800x800.jpg") type("image/jpeg")'
+        )
+
+
+class PropertyListQueryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('seller', password='demo1234')
+
+    def add_properties(self, count):
+        for i in range(count):
+            property_obj = create_property(self.owner, title_en=f'Villa {i}')
+            for order in range(3):
+                PropertyImage.objects.create(
+                    property=property_obj, image=f'properties/{i}_{order}.jpg', order=order
+                )
+
+    def test_listing_query_count_is_constant(self):
+        self.add_properties(1)
+        # Page rows, cached total count and facets
+        with self.assertNumQueries(3):
+            self.client.get(reverse('property_list'), secure=True)
+
+        self.add_properties(14)
+        cache.clear()
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('property_list'), secure=True)
+        self.assertEqual(len(response.context['properties']), 12)
+        self.assertContains(response, 'properties/13_0.jpg')
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user('seller', password='demo1234')
+        self.properties = [create_property(owner, title_en=f'Villa {i}') for i in range(5)]
+        # Pairs share created_at, the id breaks the tie
+        now = timezone.now()
+        for i, property_obj in enumerate(self.properties):
+            Property.objects.filter(pk=property_obj.pk).update(created_at=now + timedelta(days=i // 2))
+        self.paginator = KeysetPaginator(Property.objects.order_by('-created_at'), 2)
+
+    def pks(self, page):
+        return [property_obj.pk for property_obj in page]
+
+    def test_pages_forward_and_back(self):
+        expected = [property_obj.pk for property_obj in reversed(self.properties)]
+        first = self.paginator.get_page()
+        self.assertEqual(self.pks(first), expected[:2])
+        self.assertFalse(first.has_previous())
+
+        second = self.paginator.get_page(first.next_cursor)
+        last = self.paginator.get_page(second.next_cursor)
+        self.assertEqual(self.pks(second), expected[2:4])
+        self.assertEqual(self.pks(last), expected[4:])
+        self.assertFalse(last.has_next())
+
+        back = self.paginator.get_page(last.previous_cursor)
+        self.assertEqual(self.pks(back), expected[2:4])
+        self.assertEqual(back.next_cursor, second.next_cursor)
+        back = self.paginator.get_page(back.previous_cursor)
+        self.assertEqual(self.pks(back), expected[:2])
+        self.assertFalse(back.has_previous())
+
+    def test_invalid_cursors_give_the_first_page(self):
+        cursor = self.paginator.get_page().next_cursor
+        forged = [
+            cursor[:-1] + ('A' if cursor[-1] != 'A' else 'B'),
+            'garbage',
+            signing.dumps({'k': ['2020-01-01T00:00:00+00:00', 1], 'd': 'next'}),
+            signing.dumps({'k': [1], 'd': 'next'}, salt='properties.pagination.cursor'),
+            signing.dumps({'k': ['soon', 1], 'd': 'next'}, salt='properties.pagination.cursor'),
+            signing.dumps({'k': ['2020-01-01T00:00:00+00:00', 1], 'd': 'up'}, salt='properties.pagination.cursor'),
+        ]
+        first = self.pks(self.paginator.get_page())
+        for cursor in forged:
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.pks(self.paginator.get_page(cursor)), first)
+
+        cache.clear()
+        response = self.client.get(reverse('property_list'), {'cursor': 'garbage'}, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.pks(response.context['properties']), self.pks(
+            KeysetPaginator(Property.objects.order_by('-created_at'), 12).get_page()
+        ))
+
+
+class ListingPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('seller', password='demo1234')
+        self.property = create_property(self.owner, title_en='Garden Villa')
+        self.image = PropertyImage.objects.create(property=self.property, image='properties/a.jpg', order=0)
+
+    def get(self, **params):
+        return self.client.get(reverse('property_list'), params, secure=True)
+
+    def test_catalog_writes_invalidate_cached_pages(self):
+        self.assertEqual(self.get()['X-Cache'], 'MISS')
+        self.assertEqual(self.get()['X-Cache'], 'HIT')
+        # Filters and languages are cached apart
+        self.assertEqual(self.get(type='Villa')['X-Cache'], 'MISS')
+        self.client.get(reverse('set_language'), {'lang': 'ar'}, secure=True)
+        self.assertEqual(self.get()['X-Cache'], 'MISS')
+        self.client.cookies.clear()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.property.title_en = 'Rooftop Villa'
+            self.property.save()
+        response = self.get()
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertContains(response, 'Rooftop Villa')
+        self.assertEqual(self.get()['X-Cache'], 'HIT')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.image.delete()
+        self.assertEqual(self.get()['X-Cache'], 'MISS')
+
+    def test_stale_page_is_served_while_another_request_renders(self):
+        self.get()
+        later = time.time() + settings.LISTING_PAGE_CACHE_TIMEOUT + 1
+        with mock.patch('properties.caching.time.time', return_value=later):
+            key = caching.listing_cache_key(RequestFactory().get('/'), 'en')
+            cache.add(f'{key}:lock', 1)
+            self.assertEqual(self.get()['X-Cache'], 'STALE')
+            cache.delete(f'{key}:lock')
+            self.assertEqual(self.get()['X-Cache'], 'MISS')
+
+    def test_logged_in_pages_are_not_cached(self):
+        self.client.force_login(self.owner)
+        self.assertFalse(self.get().has_header('X-Cache'))
+        self.assertFalse(self.get().has_header('X-Cache'))
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        snapshots._local.clear()
+        self.owner = User.objects.create_user('seller', password='demo1234')
+        self.property = create_property(self.owner)
+
+    def get(self, url, **headers):
+        return self.client.get(url, secure=True, **headers)
+
+    def test_listing_revalidation(self):
+        url = reverse('property_list')
+        response = self.get(url)
+        etag = response['ETag']
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        # Answered from the catalog version, without touching the database
+        with self.assertNumQueries(0):
+            response = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        # Another filter or page is another representation
+        self.assertEqual(self.get(url + '?type=Villa', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.property.title_en = 'Rooftop Villa'
+            self.property.save()
+        response = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_detail_revalidation(self):
+        url = reverse('property_detail', args=[self.property.pk])
+        etag = self.get(url)['ETag']
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # The owner sees edit links: another ETag, private caching
+        self.client.force_login(self.owner)
+        response = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('private', response['Cache-Control'])
+        self.client.logout()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.property.price = 1
+            self.property.save()
+        response = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class ListingProjectionTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('seller', password='demo1234')
+        create_property(self.owner)
+
+    def test_only_active_language_columns_are_loaded(self):
+        property_obj = Property.objects.for_listing('ar').get()
+        deferred = property_obj.get_deferred_fields()
+        self.assertTrue({'description_en', 'description_ar', 'title_en', 'location_en'} <= deferred)
+        with self.assertNumQueries(0):
+            self.assertEqual(property_obj.get_title(), 'فيلا فاخرة')
+            self.assertEqual(property_obj.get_location(), 'القاهرة الجديدة')
+
+
+class FacetCountTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('seller', password='demo1234')
+
+    def counts(self, language='en'):
+        data = facets.get_facets(language)
+        return (
+            dict(data['locations']),
+            {value: count for value, _, count in data['property_types'] if count},
+            {value: count for value, _, count in data['sale_types'] if count},
+        )
+
+    def test_counts_follow_create_update_and_delete(self):
+        villa = create_property(self.owner)
+        apartment = create_property(self.owner, property_type='Apartment', sale_type='Rent')
+        create_property(self.owner, location_en='Maadi', location_ar='المعادي')
+        self.assertEqual(self.counts(), (
+            {'New Cairo': 2, 'Maadi': 1}, {'Villa': 2, 'Apartment': 1}, {'Sale': 2, 'Rent': 1},
+        ))
+        self.assertEqual(self.counts('ar')[0], {'القاهرة الجديدة': 2, 'المعادي': 1})
+
+        apartment.location_en, apartment.location_ar = 'Maadi', 'المعادي'
+        apartment.save()
+        villa.is_active = False
+        villa.save()
+        self.assertEqual(self.counts(), ({'Maadi': 2}, {'Villa': 1, 'Apartment': 1}, {'Sale': 1, 'Rent': 1}))
+
+        # Saves that do not move the property between rows leave the counts alone
+        apartment.price = 1
+        apartment.save()
+        villa.title_en = 'Hidden Villa'
+        villa.save()
+        self.assertEqual(self.counts()[0], {'Maadi': 2})
+
+        apartment.delete()
+        villa.delete()
+        self.assertEqual(self.counts(), ({'Maadi': 1}, {'Villa': 1}, {'Sale': 1}))
+
+        # The maintained rows match a full recount
+        maintained = self.counts()
+        facets.rebuild()
+        self.assertEqual(self.counts(), maintained)
+
+    def test_location_option_results_match_its_count(self):
+        create_property(self.owner, location_en='Cairo', location_ar='القاهرة')
+        create_property(self.owner, location_en='New Cairo', location_ar='القاهرة الجديدة')
+        create_property(self.owner, location_en='New Cairo', location_ar='القاهرة الجديدة')
+        cache.clear()
+        response = self.client.get(reverse('property_list'), secure=True)
+        self.assertContains(response, '<select name="location_exact">')
+        for language, name, count in (('en', 'Cairo', 1), ('en', 'New Cairo', 2), ('ar', 'القاهرة', 1)):
+            with self.subTest(name=name):
+                self.client.get(reverse('set_language'), {'lang': language}, secure=True)
+                self.assertEqual(dict(facets.get_facets(language)['locations'])[name], count)
+                response = self.client.get(reverse('property_list'), {'location_exact': name}, secure=True)
+                self.assertEqual(len(response.context['properties']), count)
+                self.assertContains(response, f'<option value="{name}" selected>')
+        # The free-text location search also matches "New Cairo"
+        response = self.client.get(reverse('property_list'), {'location': 'Cairo'}, secure=True)
+        self.assertEqual(len(response.context['properties']), 3)
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('seller', password='demo1234')
+
+    def search(self, **params):
+        queryset = filter_properties(Property.objects.filter(is_active=True).order_by('-created_at'), params)
+        return list(queryset.values_list('pk', flat=True))
+
+    def test_arabic_normalization(self):
+        self.assertEqual(search.normalize('فِيلّا'), 'فيلا')
+        self.assertEqual(search.normalize('إسكندريـــة'), 'اسكندريه')
+        self.assertEqual(search.normalize('مرسى'), 'مرسي')
+
+        property_obj = create_property(self.owner, location_ar='إسكندرية', title_ar='شَقة بحرية')
+        self.assertEqual(self.search(location='اسكندريه'), [property_obj.pk])
+        self.assertEqual(self.search(search='شقه'), [property_obj.pk])
+        # Diacritics in the query are stripped too (title_ar is 'فيلا فاخرة')
+        self.assertEqual(self.search(search='فِيلّا'), [property_obj.pk])
+        self.assertEqual(self.search(search='شقق'), [])
+
+    def test_ranked_by_title_then_newest(self):
+        described = create_property(self.owner, title_en='Apartment', description_en='Near the marina')
+        titled = create_property(self.owner, title_en='Marina Chalet')
+        older_titled = create_property(self.owner, title_en='Marina Loft')
+        Property.objects.filter(pk=older_titled.pk).update(created_at=titled.created_at - timedelta(days=1))
+        self.assertEqual(self.search(search='marina'), [titled.pk, older_titled.pk, described.pk])
+
+        # Keyset pages over the rank return every match once
+        queryset = filter_properties(Property.objects.order_by('-created_at'), {'search': 'marina'})
+        paginator = KeysetPaginator(queryset, 1)
+        page, seen = paginator.get_page(), []
+        while True:
+            seen += [p.pk for p in page]
+            if not page.has_next():
+                break
+            page = paginator.get_page(page.next_cursor)
+        self.assertEqual(seen, [titled.pk, older_titled.pk, described.pk])
+
+    def test_index_follows_saves_and_deletes(self):
+        property_obj = create_property(self.owner, title_en='Garden Villa')
+        self.assertEqual(self.search(search='garden'), [property_obj.pk])
+
+        property_obj.title_en = 'Rooftop Villa'
+        property_obj.save()
+        self.assertEqual(self.search(search='garden'), [])
+        self.assertEqual(self.search(search='rooftop'), [property_obj.pk])
+
+        # Fields outside the index do not rewrite it
+        property_obj.price = 1
+        property_obj.save(update_fields=['price'])
+        self.assertEqual(self.search(search='rooftop'), [property_obj.pk])
+
+        property_obj.delete()
+        self.assertEqual(self.search(search='rooftop'), [])
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {search.FTS_TABLE}')
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+
+class GeoSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('seller', password='demo1234')
+        self.downtown = create_property(self.owner, latitude=30.0444, longitude=31.2357)
+        # About 23 km east of downtown Cairo, and 180 km north-west
+        self.new_cairo = create_property(self.owner, latitude=30.03, longitude=31.47)
+        self.alexandria = create_property(self.owner, latitude=31.2001, longitude=29.9187)
+        self.unlocated = create_property(self.owner)
+
+    def search(self, **params):
+        queryset = filter_properties(Property.objects.order_by('-created_at'), params)
+        return list(queryset.values_list('pk', flat=True))
+
+    def test_geohash(self):
+        self.assertEqual(geo.encode_geohash(57.64911, 10.40744), 'u4pruydqq')
+        self.assertEqual(self.downtown.geo_cell, geo.encode_geohash(30.0444, 31.2357))
+        self.assertEqual(self.unlocated.geo_cell, '')
+
+    def test_radius_and_viewport_search(self):
+        cairo = '30.0444,31.2357'
+        # With the R*Tree when the build has it, and with the geohash ranges
+        for rtree in {geo.rtree_available(), False}:
+            with self.subTest(rtree=rtree), mock.patch.object(geo, '_rtree_available', rtree):
+                self.assertEqual(self.search(near=cairo, radius='5'), [self.downtown.pk])
+                # Nearest first
+                self.assertEqual(self.search(near=cairo, radius='30'), [self.downtown.pk, self.new_cairo.pk])
+                self.assertEqual(self.search(near='30.03,31.47', radius='30'), [self.new_cairo.pk, self.downtown.pk])
+                self.assertEqual(len(self.search(near=cairo, radius='500')), 3)
+                # 5 km by default
+                self.assertEqual(self.search(near=cairo), [self.downtown.pk])
+                self.assertEqual(self.search(bbox='29.9,31.1,30.1,31.5'), [self.new_cairo.pk, self.downtown.pk])
+                self.assertEqual(self.search(bbox='31,29,32,30'), [self.alexandria.pk])
+                # Invalid coordinates are ignored
+                self.assertEqual(len(self.search(near='95,31')), 4)
+                self.assertEqual(len(self.search(bbox='30.1,31,29.9,32')), 4)
+
+        self.new_cairo.latitude, self.new_cairo.longitude = 31.2, 29.92
+        self.new_cairo.save()
+        self.assertEqual(self.search(near=cairo, radius='30'), [self.downtown.pk])
+        # Viewport results keep the listing order, newest first
+        self.assertEqual(self.search(bbox='31,29,32,30'), [self.alexandria.pk, self.new_cairo.pk])
+
+    def test_listing_pages_by_distance(self):
+        response = self.client.get(reverse('property_list'), {'near': '31.2,29.92', 'radius': '300'}, secure=True)
+        self.assertEqual(
+            [property_obj.pk for property_obj in response.context['properties']],
+            [self.alexandria.pk, self.downtown.pk, self.new_cairo.pk],
+        )
+        queryset = filter_properties(Property.objects.order_by('-created_at'), {'near': '31.2,29.92', 'radius': '300'})
+        paginator = KeysetPaginator(queryset, 1)
+        page, seen = paginator.get_page(), []
+        while True:
+            seen += [property_obj.pk for property_obj in page]
+            if not page.has_next():
+                break
+            page = paginator.get_page(page.next_cursor)
+        self.assertEqual(seen, [self.alexandria.pk, self.downtown.pk, self.new_cairo.pk])
+
+
+class ViewCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        spool_settings = override_settings(VIEW_COUNTER_SPOOL_DIR=directory.name)
+        spool_settings.enable()
+        self.addCleanup(spool_settings.disable)
+        # The spool file of this process may be open in another directory
+        counters._spool = None
+        self.addCleanup(setattr, counters, '_spool', None)
+        counters._listing = None
+        self.addCleanup(setattr, counters, '_listing', None)
+        self.property = create_property(User.objects.create_user('seller', password='demo1234'))
+
+    def displayed_views(self):
+        property_obj = Property.objects.get(pk=self.property.pk)
+        return property_obj.views, counters.merge_pending([property_obj])[0].views
+
+    def flush(self):
+        return counters.flush(now=time.time() + 3600)
+
+    def test_flushed_views_are_not_counted_twice(self):
+        for _ in range(3):
+            counters.record_view(self.property.pk)
+        self.assertEqual(self.displayed_views(), (0, 3))
+
+        # flush_view_counts runs in another process, with its own local memory cache
+        with mock.patch.object(counters, 'cache', LocMemCache('flush_view_counts', {})):
+            self.assertEqual(self.flush(), (1, 3))
+        self.assertEqual(sum(counters.pending_views([self.property.pk]).values()), 0)
+        self.assertEqual(self.displayed_views(), (3, 3))
+
+    def test_crash_before_the_spool_files_are_deleted(self):
+        counters.record_view(self.property.pk)
+        counters.record_view(self.property.pk)
+        with mock.patch.object(Path, 'unlink', side_effect=OSError('crash')):
+            with self.assertRaises(OSError):
+                self.flush()
+        # Committed; shown twice only until the next flush
+        self.assertEqual(self.displayed_views(), (2, 4))
+
+        self.assertEqual(self.flush(), (0, 0))
+        self.assertEqual(self.displayed_views(), (2, 2))
+        self.assertEqual(os.listdir(settings.VIEW_COUNTER_SPOOL_DIR), [])
+
+    def test_pending_lookups_stay_bounded_when_flushing_falls_behind(self):
+        now = time.time()
+        current = counters._bucket(now)
+        expired = counters._bucket(now - settings.VIEW_COUNTER_PENDING_TIMEOUT) - 1
+        # Spool files left behind by a flush job that stopped running
+        for bucket in [expired - 5, expired, *range(current - 30, current)]:
+            Path(settings.VIEW_COUNTER_SPOOL_DIR, f'{bucket}-1.spool').write_text(f'{self.property.pk}\n')
+            cache.set(counters.PENDING_KEY.format(bucket, self.property.pk), 1)
+
+        buckets = counters.unflushed_buckets(now)
+        self.assertEqual(buckets, list(range(current - 1, current - 1 - counters.MAX_PENDING_BUCKETS, -1)))
+        with mock.patch.object(counters.cache, 'get_many', wraps=counters.cache.get_many) as get_many:
+            self.assertEqual(counters.pending_views([self.property.pk, 0]), {self.property.pk: counters.MAX_PENDING_BUCKETS})
+        self.assertEqual(len(get_many.call_args[0][0]), 2 * counters.MAX_PENDING_BUCKETS)
+
+        # The directory listing is reused briefly, flushes in this process drop it
+        with mock.patch.object(os, 'scandir', wraps=os.scandir) as scandir:
+            counters.pending_views([self.property.pk])
+            counters.pending_views([self.property.pk])
+        self.assertEqual(scandir.call_count, 0)
+        self.flush()
+        self.assertEqual(counters.pending_views([self.property.pk]), {})
+
+
+class ImportPropertiesTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('partner', password='demo1234')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        media_settings = override_settings(MEDIA_ROOT=os.path.join(self.directory, 'media'))
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        with open(os.path.join(self.directory, 'photo.jpg'), 'wb') as f:
+            f.write(b'jpeg')
+
+    def row(self, number, **kwargs):
+        return json.dumps({
+            'external_id': f'ext-{number}',
+            'title_en': f'Feed Villa {number}',
+            'title_ar': 'فيلا',
+            'description_en': 'A villa from the feed',
+            'description_ar': 'فيلا',
+            'location_en': 'Maadi',
+            'location_ar': 'المعادي',
+            'price': 1000 + number,
+            'property_type': 'Villa',
+            'sale_type': 'Sale',
+            'phone': '+20 100 000 0000',
+            'images': ['photo.jpg'],
+            **kwargs,
+        })
+
+    def run_import(self, lines, *args):
+        path = os.path.join(self.directory, 'partner.jsonl')
+        if not os.path.exists(path):
+            with open(path, 'w') as f:
+                f.write('\n'.join(lines) + '\n')
+        out = io.StringIO()
+        call_command(
+            'import_properties', path, '--owner', 'partner', '--batch-size', '2',
+            '--images-dir', self.directory, *args, stdout=out,
+        )
+        return out.getvalue()
+
+    def test_bad_rows_are_reported_and_skipped(self):
+        output = self.run_import([
+            self.row(1),
+            '{"external_id": "ext-2", "title_en": ',
+            '[1, 2]',
+            self.row(4, images=5),
+            self.row(5, price='cheap'),
+            self.row(6),
+        ])
+        self.assertIn('Row 2: invalid JSON', output)
+        self.assertIn('Row 3: a row must be a JSON object', output)
+        self.assertIn('Row 4: images must be a list', output)
+        self.assertIn('Row 5: price:', output)
+        self.assertIn('2 created, 0 updated, 4 invalid', output)
+        self.assertEqual(
+            sorted(Property.objects.filter(source='partner').values_list('external_id', flat=True)),
+            ['ext-1', 'ext-6'],
+        )
+        self.assertEqual(PropertyImage.objects.count(), 2)
+        self.assertFalse(os.path.exists(os.path.join(self.directory, 'partner.jsonl.checkpoint')))
+
+    def test_resume_after_a_failed_batch(self):
+        lines = [self.row(number) for number in range(1, 6)]
+        calls = []
+
+        def failing_upsert(*args):
+            calls.append(args)
+            if len(calls) == 3:
+                raise RuntimeError('connection lost')
+            return upsert_batch(*args)
+
+        with mock.patch('properties.management.commands.import_properties.upsert_batch', failing_upsert):
+            with self.assertRaises(RuntimeError):
+                self.run_import(lines)
+        with open(os.path.join(self.directory, 'partner.jsonl.checkpoint')) as f:
+            self.assertEqual(json.load(f), {'rows': 4})
+        self.assertEqual(Property.objects.filter(source='partner').count(), 4)
+
+        output = self.run_import(lines, '--resume')
+        self.assertIn('Resuming after row 4', output)
+        self.assertIn('1 created, 0 updated', output)
+        self.assertEqual(Property.objects.filter(source='partner').count(), 5)
+        # One gallery image each, none lost or duplicated
+        self.assertEqual(
+            sorted(PropertyImage.objects.values_list('property__external_id', flat=True)),
+            [f'ext-{number}' for number in range(1, 6)],
+        )
+
+    def test_checkpoint_waits_for_pending_images(self):
+        property_obj = create_property(self.owner)
+        release = threading.Event()
+
+        def store(property_id, order, location, base_dir):
+            release.wait(5)
+            return PropertyImage(property_id=property_id, order=order, image=location)
+
+        with mock.patch('properties.importer._store_image', store):
+            fetcher = ImageFetcher(2)
+            fetcher.submit([(property_obj.pk, 0, 'properties/a.jpg')], 2)
+            fetcher.submit([], 4)
+            # The rows of the second batch are in, the image of the first is not
+            self.assertIsNone(fetcher.checkpoint)
+            release.set()
+            fetcher.close()
+        self.assertEqual(fetcher.checkpoint, 4)
+        self.assertEqual(property_obj.images.count(), 1)
+
+
+class SyntheticDataTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=directory.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+    def generate(self, *args):
+        call_command(
+            'generate_synthetic_data', '--users', '12', '--properties', '25', '--image-pool', '2',
+            '--seed', '7', '--skip-index', *args, stdout=io.StringIO(),
+        )
+        rows = list(
+            Property.objects.order_by('owner__username', 'created_at', 'title_en').values_list(
+                'owner__username', 'title_en', 'title_ar', 'location_en', 'price', 'property_type', 'sale_type',
+                'views', 'is_active', 'created_at', 'latitude', 'longitude', 'geo_cell', 'cover_image',
+            )
+        )
+        galleries = sorted(
+            PropertyImage.objects.values_list('property__title_en', 'property__created_at', 'order', 'image')
+        )
+        profiles = list(User.objects.order_by('username').values_list('username', 'profile__user_type', 'profile__phone'))
+        User.objects.all().delete()
+        return rows, galleries, profiles
+
+    def test_same_seed_and_end_date_give_the_same_rows(self):
+        rows, galleries, profiles = self.generate('--batch-size', '100')
+        self.assertEqual(len(rows), 25)
+        self.assertTrue(galleries)
+        # Dated over the two years before the default end date, not today
+        end = timezone.make_aware(datetime.datetime.combine(synthetic.DEFAULT_END_DATE, datetime.time()))
+        self.assertTrue(all(end - timedelta(days=731) <= row[9] < end for row in rows))
+
+        # Chunks of any size, and the default end date spelled out, give the same data
+        end_date = synthetic.DEFAULT_END_DATE.isoformat()
+        self.assertEqual(self.generate('--batch-size', '4', '--end-date', end_date), (rows, galleries, profiles))
+        self.assertNotEqual(self.generate('--end-date', '2025-06-01')[0], rows)
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        snapshots._local.clear()
+        self.owner = User.objects.create_user('seller', password='demo1234')
+        self.property = create_property(self.owner, title_en='Sea View Villa')
+        create_property(self.owner, title_en='City Office', property_type='Office')
+
+    def prepare(self, request):
+        request.language = 'en'
+        request.user = AnonymousUser()
+        return request
+
+    async def test_async_listing_renders_like_sync_view(self):
+        request = self.prepare(AsyncRequestFactory().get('/', {'type': 'Villa'}, secure=True))
+        response = await views.property_list_async(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Sea View Villa')
+        self.assertNotContains(response, 'City Office')
+
+        cache.clear()
+        sync_request = self.prepare(RequestFactory().get('/', {'type': 'Villa'}, secure=True))
+        sync_response = await sync_to_async(views.property_list)(sync_request)
+        self.assertEqual(response.content, sync_response.content)
+
+    async def test_async_detail(self):
+        request = self.prepare(AsyncRequestFactory().get('/', secure=True))
+        response = await views.property_detail_async(request, self.property.pk)
+        self.assertContains(response, 'Sea View Villa')
+
+
+class PropertySnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        snapshots._local.clear()
+        self.owner = User.objects.create_user('seller', password='demo1234')
+        self.property = create_property(self.owner)
+        PropertyImage.objects.create(property=self.property, image='properties/b.jpg', order=1)
+        PropertyImage.objects.create(property=self.property, image='properties/a.jpg', order=0)
+
+    def test_snapshot_is_served_without_queries(self):
+        with self.assertNumQueries(2):
+            property_obj = snapshots.get_property(self.property.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(property_obj.title_en, 'Luxury Villa')
+            self.assertEqual(
+                [image.image.name for image in property_obj.images.all()],
+                ['properties/a.jpg', 'properties/b.jpg'],
+            )
+        # Another process: nothing local, the shared cache still answers
+        snapshots._local.clear()
+        with self.assertNumQueries(0):
+            snapshots.get_property(self.property.pk)
+        self.assertIsNone(snapshots.get_property(self.property.pk + 1000))
+
+    def test_writes_move_the_version(self):
+        snapshots.get_property(self.property.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.property.title_en = 'Garden Villa'
+            self.property.save()
+        self.assertEqual(snapshots.get_property(self.property.pk).title_en, 'Garden Villa')
+
+        # Other processes only see the new version in the shared cache
+        snapshots._local.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            PropertyImage.objects.filter(image='properties/b.jpg').get().delete()
+        self.assertEqual(
+            [image.image.name for image in snapshots.get_property(self.property.pk).images.all()],
+            ['properties/a.jpg'],
+        )
+
+    def test_detail_renders_gallery_renditions(self):
+        for image in PropertyImage.objects.filter(property=self.property):
+            PropertyImage.objects.filter(pk=image.pk).update(
+                renditions={'small': f'thumbs/{image.order}.jpg'},
+                modern_renditions={'avif': {'small': f'thumbs/{image.order}.avif'}},
+            )
+        property_obj = snapshots.get_property(self.property.pk)
+        self.assertEqual([image.order for image in property_obj.images.all()], [0, 1])
+        self.assertEqual(
+            [image.modern_renditions for image in property_obj.images.all()],
+            [{'avif': {'small': 'thumbs/0.avif'}}, {'avif': {'small': 'thumbs/1.avif'}}],
+        )
+
+        response = self.client.get(reverse('property_detail', args=[self.property.pk]), secure=True)
+        self.assertEqual(response.status_code, 200)
+        content = response.content.decode()
+        self.assertIn('<source type="image/avif" srcset="/media/thumbs/1.avif 150w"', content)
+        self.assertLess(content.index('thumbs/0.avif'), content.index('thumbs/1.avif'))
+
+    def test_detail_hides_inactive_property(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.property.is_active = False
+            self.property.save()
+        response = self.client.get(reverse('property_detail', args=[self.property.pk]), secure=True)
+        self.assertEqual(response.status_code, 404)
+
+
+class LanguageCookieTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def language(self, **headers):
+        response = self.client.get(reverse('property_list'), secure=True, **headers)
+        self.assertIn('Accept-Language', response['Vary'])
+        return response.wsgi_request.language
+
+    def test_signed_cookie_without_a_session(self):
+        response = self.client.get(
+            reverse('set_language'), {'lang': 'ar'}, secure=True, HTTP_REFERER='/property/1/'
+        )
+        self.assertRedirects(response, '/property/1/', fetch_redirect_response=False)
+        self.assertNotEqual(response.cookies['lang'].value, 'ar')
+        self.assertEqual(self.language(HTTP_ACCEPT_LANGUAGE='en'), 'ar')
+        self.assertEqual(Session.objects.count(), 0)
+
+        # Unsupported languages fall back to English
+        self.client.get(reverse('set_language'), {'lang': 'fr'}, secure=True)
+        self.assertEqual(self.language(HTTP_ACCEPT_LANGUAGE='ar'), 'en')
+
+    def test_tampered_cookie_falls_back_to_the_header(self):
+        self.client.cookies['lang'] = 'ar'
+        self.assertEqual(self.language(), 'en')
+        self.assertEqual(self.language(HTTP_ACCEPT_LANGUAGE='fr, ar;q=0.8, en;q=0.5'), 'ar')
+
+        self.client.get(reverse('set_language'), {'lang': 'ar'}, secure=True)
+        self.client.cookies['lang'] = self.client.cookies['lang'].value.replace('ar', 'en', 1)
+        self.assertEqual(self.language(), 'en')
+
+    def test_language_kept_in_the_session_moves_to_the_cookie(self):
+        session = self.client.session
+        session['lang'] = 'ar'
+        session.save()
+        response = self.client.get(reverse('property_list'), secure=True)
+        self.assertEqual(response.wsgi_request.language, 'ar')
+        self.assertIn('lang', response.cookies)
+
+        self.client.cookies.pop(settings.SESSION_COOKIE_NAME)
+        self.assertEqual(self.language(), 'ar')
+
+
+class LanguageVariantTests(TestCase):
+    def test_variant_renders_like_generic_template(self):
+        backend = engines.all()[0]
+        compiled = backend.engine.get_template('properties/detail.html')
+        property_obj = create_property(User.objects.create_user('seller'))
+        for language in ('en', 'ar'):
+            request = RequestFactory().get('/')
+            request.user = AnonymousUser()
+            context = {'property': property_obj, 'language': language}
+            variant = language_variant(compiled, language)
+            self.assertEqual(language_conditionals(variant), 0)
+            self.assertEqual(
+                Template(variant, backend).render(context, request),
+                Template(compiled, backend).render(context, request),
+            )
+
+
+class MediaServeTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        os.makedirs(os.path.join(self.media_root.name, 'properties'))
+        self.data = bytes(range(256)) * 8
+        with open(os.path.join(self.media_root.name, 'properties', 'cover.jpg'), 'wb') as f:
+            f.write(self.data)
+        self.factory = RequestFactory()
+
+    def serve(self, **headers):
+        with override_settings(MEDIA_ROOT=self.media_root.name):
+            return media.serve(self.factory.get('/media/properties/cover.jpg', **headers), 'properties/cover.jpg')
+
+    def test_byte_ranges(self):
+        response = self.serve(HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.data)}')
+        self.assertEqual(b''.join(response.streaming_content), self.data[100:200])
+
+        response = self.serve(HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(response.streaming_content), self.data[-10:])
+
+        self.assertEqual(self.serve(HTTP_RANGE=f'bytes={len(self.data)}-').status_code, 416)
+        # A stale If-Range gets the whole file
+        response = self.serve(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Length'], str(len(self.data)))
+
+    def test_conditional_and_accel(self):
+        etag = self.serve()['ETag']
+        self.assertEqual(self.serve(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with override_settings(MEDIA_ACCEL='x-accel-redirect', MEDIA_ACCEL_PREFIX='/protected-media/'):
+            response = self.serve()
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/properties/cover.jpg')
+        self.assertEqual(response.content, b'')
+
+
+class PerformanceStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def sample(self, name, total, queries=0):
+        values = dict.fromkeys(perf.METRICS, 0)
+        values.update(total=total, db=total / 2, queries=queries)
+        perf.record(name, values)
+
+    def test_histograms_and_quantiles(self):
+        timings = [0.5] * 49 + [1] + [15] * 45 + [300] * 4 + [9000]
+        for total in timings:
+            self.sample('property_list', total, queries=3)
+        for total in (1.01, 6000, 7000):
+            self.sample('property_detail', total)
+
+        stats = perf.snapshot()
+        entry = stats['property_list']
+        self.assertEqual(entry['count'], 100)
+        self.assertEqual(entry['total']['buckets'], {'1': 50, '20': 45, '500': 4, 'inf': 1})
+        self.assertEqual([entry['total'][q] for q in ('p50', 'p95', 'p99')], [1, 20, 500])
+        self.assertAlmostEqual(entry['total']['mean'], sum(timings) / 100, places=3)
+        self.assertAlmostEqual(entry['db']['mean'], sum(timings) / 200, places=3)
+        self.assertEqual(entry['queries']['buckets'], {'3': 100})
+        self.assertEqual(entry['queries']['mean'], 3)
+
+        # Past the last bound the quantile is 'inf', which JSON can carry
+        detail = stats['property_detail']['total']
+        self.assertEqual(detail['buckets'], {'2': 1, 'inf': 2})
+        self.assertEqual([detail[q] for q in ('p50', 'p95', 'p99')], ['inf', 'inf', 'inf'])
+        json.dumps(stats, allow_nan=False)
+        out = io.StringIO()
+        call_command('perf_stats', stdout=out)
+        self.assertIn('inf', out.getvalue())
+
+        # Samples older than PERF_WINDOWS windows drop out
+        later = time.time() + settings.PERF_WINDOW_SECONDS * settings.PERF_WINDOWS
+        self.assertEqual(perf.snapshot(later), {})
+
+    def test_middleware_samples_requests(self):
+        with override_settings(PERF_SAMPLE_RATE=1):
+            response = Client().get(reverse('property_list'), secure=True)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", tpl;dur=')
+        entry = perf.snapshot()['property_list']
+        self.assertEqual(entry['count'], 1)
+        self.assertGreater(entry['queries']['mean'], 0)
+        self.assertGreater(entry['tpl']['mean'], 0)
+
+        with override_settings(PERF_SAMPLE_RATE=0):
+            response = Client().get(reverse('property_list'), secure=True)
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(perf.snapshot()['property_list']['count'], 1)
+
+        self.sample('property_list', 9000)
+        User.objects.create_user('staff', password='demo1234', is_staff=True)
+        self.client.login(username='staff', password='demo1234')
+        response = self.client.get(reverse('performance_stats'), secure=True)
+
+        def reject(constant):
+            raise ValueError(constant)
+
+        views = json.loads(response.content, parse_constant=reject)['views']
+        self.assertEqual(views['property_list']['total']['p99'], 'inf')
+
+
+class StaticServeTests(TestCase):
+    def setUp(self):
+        static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(static_root.cleanup)
+        static_settings = override_settings(STATIC_ROOT=static_root.name)
+        static_settings.enable()
+        self.addCleanup(static_settings.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.addCleanup(setattr, staticfiles, '_immutable_names', None)
+        staticfiles._immutable_names = None
+        self.hashed = staticfiles_storage.stored_name('css/base.css')
+        with open(os.path.join(settings.BASE_DIR, 'static', 'css', 'base.css'), 'rb') as f:
+            self.data = f.read()
+
+    def serve(self, path, **headers):
+        response = staticfiles.serve(RequestFactory().get('/static/' + path, **headers), path)
+        if response.status_code == 200:
+            response.body = b''.join(response.streaming_content)
+            response.close()
+        return response
+
+    def test_hashed_names_are_immutable(self):
+        self.assertRegex(self.hashed, r'^css/base\.[0-9a-f]{12}\.css$')
+        self.assertIn(self.hashed, engines.all()[0].from_string('{% load static %}{% static "css/base.css" %}').render())
+
+        response = self.serve(self.hashed)
+        self.assertEqual(response.body, self.data)
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertNotIn('Content-Disposition', response)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+
+        # Unhashed names may change on deploy: short caching and revalidation
+        response = self.serve('css/base.css')
+        self.assertIn('max-age=3600', response['Cache-Control'])
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.serve('css/base.css', HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+        with self.assertRaises(Http404):
+            self.serve('../settings.py')
+
+    def test_precompressed_variants(self):
+        response = self.serve(self.hashed, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertLess(len(response.body), len(self.data))
+        self.assertEqual(gzip.decompress(response.body), self.data)
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertNotIn('Content-Disposition', response)
+
+        for header in ('', 'identity', 'gzip;q=0, deflate'):
+            with self.subTest(header=header):
+                response = self.serve(self.hashed, HTTP_ACCEPT_ENCODING=header)
+                self.assertFalse(response.has_header('Content-Encoding'))
+                self.assertEqual(response.body, self.data)
+
+        # Brotli is preferred when collectstatic wrote a .br variant
+        path = os.path.join(settings.STATIC_ROOT, self.hashed + '.br')
+        if not os.path.exists(path):
+            with open(path, 'wb') as f:
+                f.write(b'br')
+        self.assertEqual(self.serve(self.hashed, HTTP_ACCEPT_ENCODING='gzip, br')['Content-Encoding'], 'br')
+        self.assertEqual(self.serve(self.hashed, HTTP_ACCEPT_ENCODING='gzip')['Content-Encoding'], 'gzip')
+
+
+class SQLiteBackendTests(TransactionTestCase):
+    def test_pragmas_and_write_lock(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            # NORMAL
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+        # Atomic blocks, nested or read-only, leave the process lock free
+        with transaction.atomic():
+            self.assertFalse(connection.write_lock.locked())
+            with transaction.atomic():
+                Property.objects.exists()
+                self.assertFalse(connection.write_lock.locked())
+            User.objects.create_user(username='writer', password='x')
+            self.assertFalse(connection.write_lock.locked())
+        self.assertFalse(connection.write_lock.locked())
+
+        # Autocommit writes from other threads queue on it
+        connection.write_lock.acquire()
+        done = threading.Event()
+
+        def write():
+            User.objects.filter(username='writer').update(first_name='w')
+            connections.close_all()
+            done.set()
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        self.assertFalse(done.wait(0.2))
+        connection.write_lock.release()
+        self.assertTrue(done.wait(5))
+        thread.join()
+        self.assertEqual(User.objects.get(username='writer').first_name, 'w')
+
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                raise ValueError
+        self.assertFalse(connection.write_lock.locked())
+
+    def test_only_atomic_write_blocks_take_the_write_lock(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'locks.sqlite3')
+        database = {'ENGINE': 'estate_project.sqlite_backend', 'NAME': path, 'OPTIONS': {'timeout': 0.2}}
+        connections['locks'] = ConnectionHandler({'default': database, 'locks': database})['locks']
+
+        def remove():
+            connections['locks'].close()
+            del connections['locks']
+        self.addCleanup(remove)
+
+        with connections['locks'].cursor() as cursor:
+            cursor.execute('CREATE TABLE counter (n integer)')
+            cursor.execute('INSERT INTO counter VALUES (1)')
+        with CaptureQueriesContext(connections['locks']) as queries:
+            with transaction.atomic(using='locks'):
+                with transaction.atomic(using='locks'):
+                    pass
+            with atomic_write(using='locks'):
+                pass
+        self.assertEqual(
+            [query['sql'] for query in queries if query['sql'].startswith('BEGIN')],
+            ['BEGIN DEFERRED', 'BEGIN IMMEDIATE']
+        )
+
+        # Another process holds the write lock
+        writer = sqlite3.connect(path)
+        self.addCleanup(writer.close)
+        writer.execute('BEGIN IMMEDIATE')
+        writer.execute('UPDATE counter SET n = 2')
+
+        # WAL readers see the last commit without waiting
+        with transaction.atomic(using='locks'):
+            with connections['locks'].cursor() as cursor:
+                cursor.execute('SELECT n FROM counter')
+                self.assertEqual(cursor.fetchone()[0], 1)
+        # A read-then-write block waits for the lock before reading
+        with self.assertRaisesMessage(OperationalError, 'database is locked'):
+            with atomic_write(using='locks'):
+                self.fail('atomic_write() started without the write lock')
+
+        writer.commit()
+        with atomic_write(using='locks'):
+            with connections['locks'].cursor() as cursor:
+                cursor.execute('SELECT n FROM counter')
+                cursor.execute('UPDATE counter SET n = %s', [cursor.fetchone()[0] + 1])
+        self.assertFalse(connections['locks'].immediate)
+        with connections['locks'].cursor() as cursor:
+            cursor.execute('SELECT n FROM counter')
+            self.assertEqual(cursor.fetchone()[0], 3)
+
+
+def replica_connection(alias, path):
+    """Read-only connection to an SQLite copy, configured like settings.DATABASE_REPLICAS"""
+    database = {
+        'ENGINE': 'estate_project.sqlite_backend',
+        'NAME': f'file:{path}?mode=ro',
+        'OPTIONS': {'pragmas': {'journal_mode': None}, 'serialize_writes': False, 'transaction_mode': 'DEFERRED'},
+    }
+    # ConnectionHandler insists on a default alias
+    return ConnectionHandler({'default': database, alias: database})[alias]
+
+
+class ReplicaRouterTests(TransactionTestCase):
+    """Two local SQLite copies of the test database as replicas"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.owner = User.objects.create_user('replica_owner', password='pass12345')
+        self.first = create_property(self.owner)
+        self.replicas = ['replica1', 'replica2']
+        connection.ensure_connection()
+        for alias in self.replicas:
+            path = os.path.join(directory.name, f'{alias}.sqlite3')
+            target = sqlite3.connect(path)
+            connection.connection.backup(target)
+            target.close()
+            self.add_replica(alias, path)
+        replica_settings = override_settings(DATABASE_REPLICAS=self.replicas)
+        replica_settings.enable()
+        self.addCleanup(replica_settings.disable)
+        routers.health.reset()
+        self.addCleanup(routers.health.reset)
+
+    def add_replica(self, alias, path):
+        connections[alias] = replica_connection(alias, path)
+
+        def remove():
+            connections[alias].close()
+            del connections[alias]
+        self.addCleanup(remove)
+
+    def listed(self):
+        return set(Property.objects.values_list('pk', flat=True))
+
+    def test_reads_use_replicas_until_pinned(self):
+        self.assertIn(Property.objects.all().db, self.replicas)
+        second = create_property(self.owner)
+        # The copies lag behind the primary
+        self.assertEqual(self.listed(), {self.first.pk})
+        with routers.pin_to_primary():
+            self.assertEqual(self.listed(), {self.first.pk, second.pk})
+
+    def test_write_paths_read_the_primary(self):
+        second = create_property(self.owner, location_en='Zamalek')
+        PropertyImage.objects.bulk_create([PropertyImage(property=second, image='properties/new.jpg')])
+        # Neither the property nor its image are on the replicas yet
+        images.refresh_cover([second.pk])
+        self.assertEqual(Property.objects.using('default').get(pk=second.pk).cover_image.name, 'properties/new.jpg')
+        self.assertEqual(facets.stored_facet_key(second.pk), ('Zamalek', second.location_ar, 'Villa', 'Sale'))
+
+        row = validate_row({
+            'external_id': 'feed-1', 'title_en': 'Feed Villa', 'title_ar': 'فيلا', 'description_en': 'Villa',
+            'description_ar': 'فيلا', 'location_en': 'Maadi', 'location_ar': 'المعادي', 'price': 1000,
+            'property_type': 'Villa', 'sale_type': 'Sale', 'phone': '+20 100 000 0000',
+        })
+        self.assertEqual(upsert_batch([row], 'feed', self.owner)[:2], (1, 0))
+        self.assertEqual(upsert_batch([row], 'feed', self.owner)[:2], (0, 1))
+
+    def test_pin_inside_a_request_keeps_its_writes(self):
+        routers.start_request(pinned=False)
+        self.addCleanup(routers.finish_request)
+        with routers.pin_to_primary():
+            create_property(self.owner)
+        self.assertEqual(len(self.listed()), 2)
+        self.assertTrue(routers.finish_request().wrote)
+
+    def test_client_reads_its_writes(self):
+        factory = RequestFactory()
+
+        def create(request):
+            create_property(self.owner)
+            return HttpResponse(str(len(self.listed())))
+
+        response = ReplicaPinMiddleware(create)(factory.get('/'))
+        # The write pinned the rest of the request
+        self.assertEqual(response.content, b'2')
+        self.assertIn('db_pin', response.cookies)
+
+        read = ReplicaPinMiddleware(lambda request: HttpResponse(str(len(self.listed()))))
+        self.assertEqual(read(factory.get('/')).content, b'1')
+        factory.cookies['db_pin'] = '1'
+        self.assertEqual(read(factory.get('/')).content, b'2')
+
+    def test_unhealthy_replicas_fall_back(self):
+        connections['replica2'].close()
+        del connections['replica2']
+        connections['replica2'] = replica_connection('replica2', '/nonexistent/replica.sqlite3')
+        self.assertEqual({Property.objects.all().db for _ in range(20)}, {'replica1'})
+
+        routers.health.mark_down('replica1')
+        self.assertEqual(Property.objects.all().db, 'default')
+
+    def test_failed_replica_reads_are_retried_on_the_primary(self):
+        cache.clear()
+        second = create_property(self.owner, title_en='Fresh Villa')
+        # replica1 passes its probe, then becomes unreachable mid-interval
+        routers.health.mark_down('replica2')
+        self.assertEqual(self.listed(), {self.first.pk})
+        self.assertTrue(routers.health.healthy('replica1'))
+        connections['replica1'].close()
+        connections['replica1'].settings_dict['NAME'] = 'file:/nonexistent/replica.sqlite3?mode=ro'
+
+        client = Client(raise_request_exception=False)
+        # The failed attempt is still logged
+        with self.assertLogs('django.request', 'ERROR'):
+            response = client.get(reverse('property_list'), secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Fresh Villa')
+        self.assertNotIn('db_pin', response.cookies)
+        self.assertEqual(Property.objects.all().db, 'default')
+        self.assertEqual(self.listed(), {self.first.pk, second.pk})
+
+        # Errors that are not the replicas' are not retried
+        routers.health.reset()
+        routers.health.mark_down('replica2')
+        with mock.patch.object(routers.health, 'check', return_value=True):
+            with self.assertLogs('django.request', 'ERROR'):
+                response = client.get(reverse('property_list'), {'type': 'Villa'}, secure=True)
+        self.assertEqual(response.status_code, 500)
+
+
+@override_settings(AUTOCOMPLETE_REFRESH_SECONDS=0)
+class AutocompleteTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('seller', password='demo1234')
+        self.first = create_property(self.owner, location_en='New Cairo', title_en='Garden Villa')
+        self.index = autocomplete.PrefixIndex()
+
+    def settle(self):
+        """Wait for the background build or refresh the last lookup started"""
+        self.index.refresh_thread.join(5)
+
+    def suggest(self):
+        with mock.patch.object(autocomplete, 'index', self.index):
+            return self.client.get(reverse('property_autocomplete'), {'q': 'cai'}, secure=True)
+
+    def test_index_is_built_in_the_background(self):
+        release = threading.Event()
+        build = self.index.build
+
+        def slow_build():
+            release.wait(5)
+            build()
+
+        with mock.patch.object(self.index, 'build', slow_build):
+            with self.assertNumQueries(0):
+                self.assertEqual(self.index.lookup('cai'), [])
+            # Not reused by clients while the build runs
+            response = self.suggest()
+            self.assertEqual(response.json()['results'], [])
+            self.assertIn('no-cache', response['Cache-Control'])
+            release.set()
+            self.settle()
+        response = self.suggest()
+        self.assertEqual(response.json()['results'], [{'kind': 'location', 'text': 'New Cairo', 'count': 1}])
+        self.assertIn('max-age=60', response['Cache-Control'])
+
+    def test_other_processes_changes_are_loaded_in_the_background(self):
+        self.index.build()
+        self.assertEqual(self.index.lookup('gard'), [('title', 'Garden Villa', 1)])
+
+        # The signals of this process only update the module index
+        second = create_property(self.owner, location_en='Cairo Downtown', title_en='Nile Tower')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.index.lookup('cai'), [('location', 'New Cairo', 1)])
+        self.settle()
+        self.assertEqual(
+            self.index.lookup('cai'), [('location', 'Cairo Downtown', 1), ('location', 'New Cairo', 1)]
+        )
+
+        self.first.delete()
+        Property.objects.filter(pk=second.pk).update(title_en='Nile Heights', updated_at=timezone.now())
+        caching.bump_catalog_version()
+        with self.assertNumQueries(0):
+            self.index.lookup('nile')
+        self.settle()
+        self.assertEqual(self.index.lookup('cai'), [('location', 'Cairo Downtown', 1)])
+        self.assertEqual(self.index.lookup('nile'), [('title', 'Nile Heights', 1)])
+
+    def test_refresh_reads_changed_rows_and_tombstones_only(self):
+        self.index.build()
+        second = create_property(self.owner, location_en='Cairo Downtown')
+        self.first.delete()
+        caching.bump_catalog_version()
+        with CaptureQueriesContext(connection) as queries:
+            self.index.refresh()
+        self.assertEqual(len(queries), 2)
+        self.assertIn('"updated_at" >=', queries[0]['sql'])
+        self.assertIn('"deleted_at" >=', queries[1]['sql'])
+        self.assertEqual(set(self.index.by_property), {second.pk})
+
+        # Too long without a sync: the tombstones may be gone, rebuild
+        self.index.synced_at -= autocomplete.TOMBSTONE_RETENTION
+        caching.bump_catalog_version()
+        with mock.patch.object(self.index, 'build') as build:
+            self.index.refresh()
+        build.assert_called_once_with()
+
+    def test_refresh_checks_are_throttled(self):
+        self.index.build()
+        create_property(self.owner, location_en='Cairo Downtown')
+        with override_settings(AUTOCOMPLETE_REFRESH_SECONDS=60):
+            self.index.checked_at = time.monotonic()
+            self.assertEqual(self.index.lookup('cai'), [('location', 'New Cairo', 1)])
+            self.assertIsNone(self.index.refresh_thread)
+
+    def test_changes_made_during_a_refresh_are_kept(self):
+        self.index.build()
+        Property.objects.filter(pk=self.first.pk).update(location_en='Old Cairo', updated_at=timezone.now())
+        caching.bump_catalog_version()
+        real_filter = DeletedProperty.objects.filter
+
+        def filter_during_write(*args, **kwargs):
+            # A save in this process lands between the refresh reads and its update
+            self.first.location_en = 'Cairo Festival'
+            self.first.save()
+            self.index.update([self.first])
+            return real_filter(*args, **kwargs)
+
+        with mock.patch.object(DeletedProperty.objects, 'filter', filter_during_write):
+            self.index.refresh()
+        # The row read before the save does not undo it
+        self.assertEqual(self.index.lookup('cai'), [('location', 'Cairo Festival', 1)])
@@ -0,0 +1,140 @@
+"""
+Thumbnail pre-generation for property images.
+
+Every THUMBNAIL_ALIASES rendition is generated off the request path: saving
+a PropertyImage schedules it on a thread pool once the transaction commits,
+and the ``generate_thumbnails`` command backfills existing media. Generated
+file names are stored on PropertyImage.renditions (and copied to
+Property.cover_renditions) so templates can emit ``srcset`` without
+touching storage or the database.
+
+Each rendition is also encoded as WebP/AVIF (PropertyImage.modern_renditions).
+That encoding is CPU-bound, so it runs in a process pool
+(IMAGE_ENCODER_PROCESSES) rather than on the GIL-bound thread pool.
+"""
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from easy_thumbnails.alias import aliases
+from easy_thumbnails.files import get_thumbnailer
+from easy_thumbnails.storage import thumbnail_default_storage
+
+from estate_project.routers import pin_to_primary
+from .models import PropertyImage
+from . import encoders, images
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_process_pool = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_PIPELINE_WORKERS,
+            thread_name_prefix='thumbnails'
+        )
+    return _executor
+
+
+def get_process_pool():
+    global _process_pool
+    if _process_pool is None:
+        # spawn: workers must not inherit the web worker's threads and sockets
+        _process_pool = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_ENCODER_PROCESSES,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _process_pool
+
+
+def is_current(image):
+    """Whether the stored renditions were generated from the current file"""
+    if not image.renditions or (encoders.available_formats() and not image.modern_renditions):
+        return False
+    return all(name.startswith(image.image.name) for name in image.renditions.values())
+
+
+def generate_renditions(image_file):
+    """Generate every THUMBNAIL_ALIASES rendition, returns {alias: name}"""
+    thumbnailer = get_thumbnailer(image_file)
+    return {
+        alias: thumbnailer[alias].name
+        for alias in aliases.all(include_global=True)
+    }
+
+
+def alias_sizes():
+    """THUMBNAIL_ALIASES as {alias: (size, crop)} for the encoders"""
+    return {
+        alias: (tuple(options['size']), bool(options.get('crop')))
+        for alias, options in aliases.all(include_global=True).items()
+    }
+
+
+def generate_modern_renditions(image_file, renditions):
+    """
+    Encode every rendition as WebP/AVIF in the process pool, next to the
+    easy_thumbnails file. Returns {format: {alias: name}}.
+    """
+    formats = encoders.available_formats()
+    if not formats:
+        return {}
+    with image_file.open('rb') as source:
+        data = source.read()
+    variants = get_process_pool().submit(
+        encoders.encode_variants, data, alias_sizes(), formats
+    ).result()
+
+    storage = thumbnail_default_storage
+    modern_renditions = {}
+    for fmt, encoded in variants.items():
+        modern_renditions[fmt] = {}
+        for alias, content in encoded.items():
+            name = f'{os.path.splitext(renditions[alias])[0]}.{fmt}'
+            if storage.exists(name):
+                storage.delete(name)
+            modern_renditions[fmt][alias] = storage.save(name, ContentFile(content))
+    return modern_renditions
+
+
+def process_image(image_id):
+    """Generate and store the renditions of one PropertyImage"""
+    # Runs right after the image is committed, a replica may not have it yet
+    with pin_to_primary():
+        image = PropertyImage.objects.filter(pk=image_id).first()
+        if image is None:
+            return None
+        renditions = generate_renditions(image.image)
+        modern_renditions = generate_modern_renditions(image.image, renditions)
+        PropertyImage.objects.filter(pk=image_id, image=image.image.name).update(
+            renditions=renditions,
+            modern_renditions=modern_renditions
+        )
+        images.refresh_cover([image.property_id])
+    return renditions
+
+
+def _process_in_worker(image_id):
+    try:
+        process_image(image_id)
+    except Exception:
+        logger.exception('Could not generate thumbnails for property image %s', image_id)
+    finally:
+        # Worker threads get their own database connection
+        close_old_connections()
+
+
+def schedule(image_ids):
+    """Generate renditions in the background after the current transaction commits"""
+    image_ids = list(image_ids)
+    transaction.on_commit(
+        lambda: [get_executor().submit(_process_in_worker, pk) for pk in image_ids]
+    )
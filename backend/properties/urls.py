@@ -1,11 +1,19 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Async variants of the read-heavy views when served over ASGI
+if settings.ASYNC_VIEWS:
+    list_view, detail_view = views.property_list_async, views.property_detail_async
+else:
+    list_view, detail_view = views.property_list, views.property_detail
+
 urlpatterns = [
-    path('', views.property_list, name='property_list'),
-    path('property/<int:pk>/', views.property_detail, name='property_detail'),
+    path('', list_view, name='property_list'),
+    path('property/<int:pk>/', detail_view, name='property_detail'),
     path('property/add/', views.property_create, name='property_create'),
     path('property/<int:pk>/edit/', views.property_update, name='property_update'),
     path('property/<int:pk>/delete/', views.property_delete, name='property_delete'),
+    path('autocomplete/', views.autocomplete, name='property_autocomplete'),
     path('set-language/', views.set_language, name='set_language'),
 ]
@@ -1,95 +1,186 @@
+import asyncio
+import hashlib
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q
-from django.core.paginator import Paginator
-from .models import Property, PropertyImage
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404, JsonResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import urlencode
+from estate_project.middleware import set_language_cookie
+from .models import Property
+from . import autocomplete as autocomplete_index
+from . import snapshots
 from .forms import PropertyForm, PropertyImageFormSet
+from .caching import cache_listing_page, get_catalog_version
+from .conditional import add_validators, conditional_listing, not_modified, page_validators
+from .counters import merge_pending, record_view
+from .facets import aget_facets, get_facets
+from .filters import canonical_filters, filter_properties
+from .pagination import KeysetPaginator
 
-def property_list(request):
+
+def get_language(request):
+    """Page language, resolved by LanguageMiddleware (cookie or Accept-Language)"""
+    return getattr(request, 'language', 'en')
+
+
+def _listing_query(request):
     """
-    List all active properties with filtering and pagination
+    Language and filtered queryset of the listing. Synchronous: the first
+    index availability checks query the database.
     """
-    # Optimized query with prefetch_related
+    language = get_language(request)
+    
+    # Cards use the denormalized cover_image, so images are not prefetched,
+    # and only the card columns of the active language are loaded
     properties = Property.objects.filter(
         is_active=True
-    ).select_related('owner').prefetch_related('images').order_by('-created_at')
-    
-    # Language selection (from session or default to 'en')
-    language = request.session.get('lang', 'en')
-    
-    # Filtering
-    property_type = request.GET.get('type')
-    sale_type = request.GET.get('sale_type')
-    location = request.GET.get('location')
-    search = request.GET.get('search')
-    min_price = request.GET.get('min_price')
-    max_price = request.GET.get('max_price')
-    
-    if property_type:
-        properties = properties.filter(property_type=property_type)
-    if sale_type:
-        properties = properties.filter(sale_type=sale_type)
-    if location:
-        properties = properties.filter(
-            Q(location_en__icontains=location) | Q(location_ar__icontains=location)
-        )
-    if search:
-        properties = properties.filter(
-            Q(title_en__icontains=search) | 
-            Q(title_ar__icontains=search) |
-            Q(description_en__icontains=search) | 
-            Q(description_ar__icontains=search)
-        )
-    if min_price:
-        properties = properties.filter(price__gte=min_price)
-    if max_price:
-        properties = properties.filter(price__lte=max_price)
-    
-    # Pagination
-    paginator = Paginator(properties, 12)  # Show 12 properties per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
-    # Get unique locations for filter dropdown
-    locations_en = Property.objects.values_list('location_en', flat=True).distinct()
-    locations_ar = Property.objects.values_list('location_ar', flat=True).distinct()
+    ).for_listing(language).order_by('-created_at')
+    
+    return language, filter_properties(properties, request.GET)
+
+
+@conditional_listing(get_language)
+@cache_listing_page(get_language)
+def property_list(request):
+    """
+    List all active properties with filtering and pagination
+    """
+    language, properties = _listing_query(request)
+    
+    # Keyset pagination (no COUNT/OFFSET), the total is an approximate cached count
+    paginator = KeysetPaginator(properties, 12)  # Show 12 properties per page
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+    merge_pending(page_obj)
+    query_string = urlencode(canonical_filters(request.GET))
+    total_count = cache.get_or_set(
+        f'property_list:count:{get_catalog_version()}:' + hashlib.md5(query_string.encode()).hexdigest(),
+        properties.count,
+        settings.LISTING_COUNT_CACHE_TIMEOUT
+    )
+    
+    # Filter sidebar options with counts, read from the facet table
+    facets = get_facets(language)
     
     context = {
         'properties': page_obj,
         'page_obj': page_obj,
+        'total_count': total_count,
+        'query_string': query_string,
         'language': language,
-        'locations': set(list(locations_en) + list(locations_ar)),
-        'property_types': Property.PROPERTY_TYPE_CHOICES,
-        'sale_types': Property.SALE_TYPE_CHOICES,
+        'locations': facets['locations'],
+        'property_types': facets['property_types'],
+        'sale_types': facets['sale_types'],
     }
     
     return render(request, 'properties/index.html', context)
 
 
+def _detail_validators(request, property_obj):
+    language = get_language(request)
+    # updated_at also moves when the gallery changes (see images.refresh_cover)
+    etag = page_validators(request, property_obj.pk, property_obj.updated_at.isoformat(), language)
+    return language, etag, not_modified(request, etag, property_obj.updated_at)
+
 
 def property_detail(request, pk):
     """
     Display detailed view of a single property
     """
-    property_obj = get_object_or_404(
-        Property.objects.prefetch_related('images'),
-        pk=pk,
-        is_active=True
+    # Property and gallery from the snapshot cache (no queries when warm)
+    property_obj = snapshots.get_property(pk)
+    if property_obj is None or not property_obj.is_active:
+        raise Http404('No Property matches the given query.')
+    
+    # Buffered views counter, flushed by `flush_view_counts`.
+    # Recorded before revalidation so 304 responses count as views too
+    record_view(property_obj.pk)
+    
+    language, etag, response = _detail_validators(request, property_obj)
+    if response is not None:
+        return response
+    
+    property_obj.display_language = language
+    
+    context = {
+        'property': property_obj,
+        'language': language,
+    }
+    
+    response = render(request, 'properties/detail.html', context)
+    return add_validators(request, response, etag, property_obj.updated_at)
+
+
+async def _listing_count(properties, query_string):
+    version = await sync_to_async(get_catalog_version)()
+    key = f'property_list:count:{version}:' + hashlib.md5(query_string.encode()).hexdigest()
+    total_count = await cache.aget(key)
+    if total_count is None:
+        total_count = await properties.acount()
+        await cache.aset(key, total_count, settings.LISTING_COUNT_CACHE_TIMEOUT)
+    return total_count
+
+
+@conditional_listing(get_language)
+@cache_listing_page(get_language)
+async def property_list_async(request):
+    """
+    property_list for ASGI (settings.ASYNC_VIEWS): the page rows, the
+    count and the facets are independent queries awaited together
+    """
+    language, properties = await sync_to_async(_listing_query)(request)
+    
+    paginator = KeysetPaginator(properties, 12)
+    query_string = urlencode(canonical_filters(request.GET))
+    page_obj, total_count, facets = await asyncio.gather(
+        paginator.aget_page(request.GET.get('cursor')),
+        _listing_count(properties, query_string),
+        aget_facets(language),
     )
+    await sync_to_async(merge_pending)(page_obj)
     
-    # Increment views counter
-    property_obj.views += 1
-    property_obj.save(update_fields=['views'])
+    context = {
+        'properties': page_obj,
+        'page_obj': page_obj,
+        'total_count': total_count,
+        'query_string': query_string,
+        'language': language,
+        'locations': facets['locations'],
+        'property_types': facets['property_types'],
+        'sale_types': facets['sale_types'],
+    }
+    
+    return await sync_to_async(render)(request, 'properties/index.html', context)
+
+
+async def property_detail_async(request, pk):
+    """property_detail for ASGI (settings.ASYNC_VIEWS)"""
+    # Served from the local LRU without leaving the event loop when possible
+    property_obj = snapshots.local_property(pk) or await sync_to_async(snapshots.get_property)(pk)
+    if property_obj is None or not property_obj.is_active:
+        raise Http404('No Property matches the given query.')
+    
+    # The view is recorded while the validators are computed
+    _, (language, etag, response) = await asyncio.gather(
+        sync_to_async(record_view)(property_obj.pk),
+        sync_to_async(_detail_validators)(request, property_obj),
+    )
+    if response is not None:
+        return response
     
-    language = request.session.get('lang', 'en')
+    property_obj.display_language = language
     
     context = {
         'property': property_obj,
         'language': language,
     }
     
-    return render(request, 'properties/detail.html', context)
+    response = await sync_to_async(render)(request, 'properties/detail.html', context)
+    return add_validators(request, response, etag, property_obj.updated_at)
 
 
 
@@ -173,10 +264,37 @@ def property_delete(request, pk):
     return render(request, 'properties/delete_confirm.html', {'property': property_obj})
 
 
+def autocomplete(request):
+    """
+    Location and title suggestions for the search box, served from the
+    in-process prefix index (no database query per keystroke)
+    """
+    try:
+        limit = int(request.GET.get('limit', autocomplete_index.DEFAULT_LIMIT))
+    except ValueError:
+        limit = autocomplete_index.DEFAULT_LIMIT
+    query = request.GET.get('q', '')[:100]
+    results = [
+        {'kind': kind, 'text': text, 'count': count}
+        for kind, text, count in autocomplete_index.suggest(query, limit)
+    ]
+    response = JsonResponse({'query': query, 'results': results})
+    if autocomplete_index.is_ready():
+        patch_cache_control(response, public=True, max_age=60)
+    else:
+        # Empty while this process builds its index, must not be reused
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
 def set_language(request):
     """
     Switch language (en/ar)
     """
     lang = request.GET.get('lang', 'en')
-    request.session['lang'] = lang
-    return redirect(request.META.get('HTTP_REFERER', '/'))
+    if lang not in dict(settings.LANGUAGES):
+        lang = 'en'
+    # A cookie rather than the session, so anonymous visitors get no session row
+    response = redirect(request.META.get('HTTP_REFERER', '/'))
+    set_language_cookie(response, lang)
+    return response
@@ -2,6 +2,7 @@ from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect
 from django.contrib import messages
+from properties.views import get_language
 from .forms import UserRegistrationForm, UserProfileForm
 
 def register(request):
@@ -35,7 +36,7 @@ def profile(request):
     
     # Calculate active properties count
     active_properties_count = request.user.properties.filter(is_active=True).count()
-    language = request.session.get('lang', 'en')
+    language = get_language(request)
     
     return render(request, 'users/profile.html', {
         'form': form,